@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Audit the animated timeline's scene assets against per-scene payload budgets.
+
+Walks the three asset generations:
+  src/pages/AnimatedTimeline/assets/scenes/<event-id>/{bg,mid,fg}.webp   (v1)
+  src/pages/AnimatedTimeline/assets/scenes-v2/<event-id>/{bg,mid,fg}.svg (v2)
+  src/pages/AnimatedTimeline/assets/scenes-v3/<event-id>/scene.webp      (v3)
+
+Image sizes come from file headers, so nothing is decoded. Each event is
+charged for the version sceneSpecs.ts resolves it to, and files no spec
+references are flagged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ASSETS = Path('src/pages/AnimatedTimeline/assets')
+SPECS = Path('src/pages/AnimatedTimeline/data/sceneSpecs.ts')
+TREES = {'v1': ASSETS / 'scenes', 'v2': ASSETS / 'scenes-v2', 'v3': ASSETS / 'scenes-v3'}
+# Bookkeeping that lives in the trees but is never shipped.
+IGNORED = {'.gitkeep', 'README.md'}
+
+# Per-scene defaults: what the client downloads, and what it holds once every image is decoded to RGBA.
+BUDGET_BYTES = 400_000
+BUDGET_MEMORY = 24 << 20
+
+# Enough of any header this script reads; SVG roots and AVIF's ispe box sit near the start.
+HEAD_BYTES = 64 << 10
+
+IMPORT_RE = re.compile(r"""^import\s+\w+\s+from\s+['"](\.\./assets/[^'"]+)['"];""", re.MULTILINE)
+GLOB_RE = re.compile(r"""import\.meta\.glob\(\s*['"](\.\./assets/[^'"]+)['"]""")
+SVG_VIEWBOX_RE = re.compile(rb'viewBox\s*=\s*["\']\s*[-\d.]+[\s,]+[-\d.]+[\s,]+([\d.]+)[\s,]+([\d.]+)')
+SVG_SIZE_RE = re.compile(rb'\b(width|height)\s*=\s*["\']\s*([\d.]+)(?:px)?\s*["\']')
+
+
+@dataclass(frozen=True)
+class Asset:
+    """One file in a scene tree, measured from its header."""
+
+    path: str
+    version: str
+    event_id: str
+    kind: str
+    bytes: int
+    width: int | None
+    height: int | None
+
+    @property
+    def memory(self) -> int:
+        # Browsers decode every raster format to 4 bytes per pixel, and rasterize an SVG the same way; it is
+        # counted at its viewBox (or width and height) size, as drawn at 1x.
+        return (self.width or 0) * (self.height or 0) * 4
+
+
+def webp_size(head: bytes) -> tuple[int, int] | None:
+    if head[:4] != b'RIFF' or head[8:12] != b'WEBP':
+        return None
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        w, h = struct.unpack('<HH', head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b'VP8L' and head[20:21] == b'\x2f':
+        bits = int.from_bytes(head[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    return None
+
+
+def png_size(head: bytes) -> tuple[int, int] | None:
+    if head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', head[16:24])
+
+
+def jpeg_size(path: Path) -> tuple[int, int] | None:
+    # Walk the marker segments up to the first start-of-frame; it can sit past a large EXIF block.
+    with path.open('rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            kind = marker[1]
+            if kind == 0xFF:
+                f.seek(-1, 1)
+                continue
+            if kind in (0x01, *range(0xD0, 0xD8)):
+                continue
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            size = struct.unpack('>H', length)[0]
+            if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack('>xHH', f.read(5))
+                return w, h
+            f.seek(size - 2, 1)
+
+
+def avif_size(head: bytes) -> tuple[int, int] | None:
+    if head[4:8] != b'ftyp':
+        return None
+    # The image spatial extents property: version/flags, then width and height.
+    at = head.find(b'ispe')
+    if at < 0 or len(head) < at + 16:
+        return None
+    return struct.unpack('>II', head[at + 8:at + 16])
+
+
+def svg_size(head: bytes) -> tuple[int, int] | None:
+    root = head[head.find(b'<svg'):]
+    box = SVG_VIEWBOX_RE.search(root)
+    if box:
+        return round(float(box[1])), round(float(box[2]))
+    sizes = {name: value for name, value in SVG_SIZE_RE.findall(root[:root.find(b'>') + 1])}
+    if b'width' in sizes and b'height' in sizes:
+        return round(float(sizes[b'width'])), round(float(sizes[b'height']))
+    return None
+
+
+def probe(path: Path, version: str) -> Asset:
+    """Measure one file from its header; kinds this script cannot size keep their bytes only."""
+    kind = path.suffix.lower().lstrip('.')
+    if kind == 'jpg':
+        kind = 'jpeg'
+    size = None
+    if kind == 'jpeg':
+        size = jpeg_size(path)
+    elif kind in ('webp', 'png', 'avif', 'svg'):
+        with path.open('rb') as f:
+            head = f.read(HEAD_BYTES)
+        size = {'webp': webp_size, 'png': png_size, 'avif': avif_size, 'svg': svg_size}[kind](head)
+    parts = path.relative_to(TREES[version]).parts
+    event_id = parts[0] if len(parts) > 1 else ''
+    return Asset(path.as_posix(), version, event_id, kind, path.stat().st_size, *(size or (None, None)))
+
+
+def spec_references(specs: Path) -> tuple[set[str], list[str]]:
+    """Asset paths sceneSpecs.ts imports, and the glob patterns it loads, relative to the repo root."""
+    text = specs.read_text()
+    base = specs.parent
+
+    def resolve(ref: str) -> str:
+        return Path(os.path.normpath(base / ref)).as_posix()
+
+    imports = {resolve(ref) for ref in IMPORT_RE.findall(text)}
+    globs = [resolve(ref) for ref in GLOB_RE.findall(text)]
+    return imports, globs
+
+
+def referenced(asset: Asset, imports: set[str], globs: list[str]) -> bool:
+    return asset.path in imports or any(Path(asset.path).match(pattern) for pattern in globs)
+
+
+def selected_version(event_id: str, shipped: dict[str, set[str]], requested: str) -> str | None:
+    # resolveVersionedSpec: the requested version, then v3, v2, v1, whichever the event has first.
+    for version in dict.fromkeys((requested, 'v3', 'v2', 'v1')):
+        if event_id in shipped[version]:
+            return version
+    return None
+
+
+def load_budgets(path: Path | None, default_bytes: int, default_memory: int) -> tuple[dict[str, int], dict]:
+    """Default budget and per-event overrides: {"default": {"bytes", "memory"}, "events": {id: {...}}}."""
+    default = {'bytes': default_bytes, 'memory': default_memory}
+    if path is None:
+        return default, {}
+    budgets = json.loads(path.read_text())
+    default.update(budgets.get('default', {}))
+    return default, budgets.get('events', {})
+
+
+def human(n: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024 or unit == 'MB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+    return f'{n} B'
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Audit scene asset payloads across the v1, v2 and v3 trees')
+    parser.add_argument(
+        '--version',
+        choices=tuple(TREES),
+        default='v3',
+        help='Scene version the app requests; events without it fall back like sceneSpecs.ts does. Default: v3.',
+    )
+    parser.add_argument(
+        '--budget-bytes',
+        type=int,
+        default=BUDGET_BYTES,
+        metavar='BYTES',
+        help=f'Per-scene download budget for the selected version. Default: {BUDGET_BYTES}.',
+    )
+    parser.add_argument(
+        '--budget-memory-mb',
+        type=float,
+        default=BUDGET_MEMORY / (1 << 20),
+        metavar='MB',
+        help=f'Per-scene decoded RGBA budget for the selected version. Default: {BUDGET_MEMORY >> 20}.',
+    )
+    parser.add_argument(
+        '--budgets',
+        type=Path,
+        metavar='FILE',
+        help=(
+            'JSON budgets overriding the defaults: {"default": {"bytes": N, "memory": N}, '
+            '"events": {"<event-id>": {"bytes": N, "memory": N}}}.'
+        ),
+    )
+    parser.add_argument(
+        '--strict',
+        action='store_true',
+        help='Also fail when a tree holds files no scene spec references.',
+    )
+    parser.add_argument('--json', type=Path, metavar='FILE', help='Also write the full audit as JSON to FILE.')
+    parser.add_argument('--jobs', type=int, default=8, help='Threads reading file headers. Default: 8.')
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if not SPECS.exists():
+        print(f'Cannot find {SPECS}; run from the repository root', file=sys.stderr)
+        return 1
+
+    files = [
+        (path, version)
+        for version, tree in TREES.items()
+        if tree.is_dir()
+        for path in sorted(tree.rglob('*'))
+        if path.is_file() and path.name not in IGNORED
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        assets = list(pool.map(lambda item: probe(*item), files))
+
+    imports, globs = spec_references(SPECS)
+    unreferenced = [asset for asset in assets if not referenced(asset, imports, globs)]
+    shipped: dict[str, set[str]] = {version: set() for version in TREES}
+    by_event: dict[tuple[str, str], list[Asset]] = {}
+    for asset in assets:
+        if asset.event_id and referenced(asset, imports, globs):
+            shipped[asset.version].add(asset.event_id)
+            by_event.setdefault((asset.event_id, asset.version), []).append(asset)
+
+    for version, tree in TREES.items():
+        tree_assets = [asset for asset in assets if asset.version == version]
+        print(f'{tree}/: {len(tree_assets)} file(s), {human(sum(asset.bytes for asset in tree_assets))}')
+    print()
+
+    default, overrides = load_budgets(args.budgets, args.budget_bytes, round(args.budget_memory_mb * (1 << 20)))
+    events = sorted({event_id for event_id, _ in by_event})
+    over = 0
+    scenes = {}
+    for event_id in events:
+        version = selected_version(event_id, shipped, args.version)
+        chosen = by_event[(event_id, version)]
+        total = sum(asset.bytes for asset in chosen)
+        memory = sum(asset.memory for asset in chosen)
+        budget = {**default, **overrides.get(event_id, {})}
+        problems = []
+        if total > budget['bytes']:
+            problems.append(f'bytes over {human(budget["bytes"])}')
+        if memory > budget['memory']:
+            problems.append(f'memory over {human(budget["memory"])}')
+        unsized = [Path(asset.path).name for asset in chosen if asset.width is None]
+        if unsized:
+            problems.append(f'unsized {", ".join(unsized)}')
+        over += bool(problems)
+        scenes[event_id] = {'version': version, 'bytes': total, 'memory': memory, 'budget': budget, 'problems': problems}
+        print(
+            f'{event_id:<24} {version}  {len(chosen)} file(s)  {human(total):>9}  decoded {human(memory):>9}'
+            f'{"  " + "; ".join(problems) if problems else ""}'
+        )
+
+    if unreferenced:
+        print()
+        for asset in unreferenced:
+            size = f'{asset.width}x{asset.height}' if asset.width else 'unsized'
+            print(f'unreferenced: {asset.path} ({human(asset.bytes)}, {size})')
+
+    shipped_bytes = sum(scene['bytes'] for scene in scenes.values())
+    print()
+    print(
+        f'{len(scenes)} scene(s) at {args.version} (with fallback): {human(shipped_bytes)} shipped, '
+        f'{over} over budget, {len(unreferenced)} unreferenced file(s) '
+        f'({human(sum(asset.bytes for asset in unreferenced))}).'
+    )
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            'version': args.version,
+            'assets': [{**asdict(asset), 'memory': asset.memory} for asset in assets],
+            'scenes': scenes,
+            'unreferenced': [asset.path for asset in unreferenced],
+        }
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+        print(f'Wrote {args.json}')
+    return 1 if over or (args.strict and unreferenced) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
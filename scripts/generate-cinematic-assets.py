@@ -10,20 +10,64 @@ Outputs per event:
 from __future__ import annotations
 
 import argparse
+import ast
+import base64
+import contextlib
+import functools
+import hashlib
+import inspect
+import itertools
+import json
 import math
+import mmap
+import operator
 import os
+import platform
 import random
+import shutil
 import struct
 import subprocess
 import sys
+import tempfile
+import textwrap
+import time
 import zlib
-from dataclasses import dataclass
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import AbstractContextManager
+from itertools import repeat
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from typing import TextIO
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python engine is always available.
+    np = None
+
+try:
+    from PIL import Image, ImageChops, ImageStat, features as pil_features
+except ImportError:  # Pillow is optional; cwebp remains the default encoder.
+    Image = None
+    ImageChops = None
+    ImageStat = None
+    pil_features = None
+
+# Design space every scene is drawn in; rasters scale it to their own pixel size.
 W = 1600
 H = 900
 
 ROOT = Path('src/pages/AnimatedTimeline/assets/scenes')
+CACHE_MANIFEST = ROOT.parent / 'scenes-build-cache.json'
+SRCSET_MANIFEST = ROOT.parent / 'scenes-manifest.json'
+
+# Bump when a shared primitive changes output; scene branches are fingerprinted from source.
+GENERATOR_VERSION = 3
+CACHE_VERSION = 1
+FIELD_CACHE_VERSION = 1
+FIELD_CACHE_LIMIT = 256 << 20
 
 PROFILE_BATTLE = 'battle'
 PROFILE_CEREMONY = 'ceremony'
@@ -129,26 +173,120 @@ def chunk(tag: bytes, payload: bytes) -> bytes:
     )
 
 
-def write_png_rgba(path: Path, w: int, h: int, data: bytearray) -> None:
-    raw = bytearray()
+PNG_FILTERS = {'none': 0, 'sub': 1, 'up': 2, 'paeth': 4}
+PNG_FILTER_MODES = (*PNG_FILTERS, 'adaptive')
+PNG_IDAT_SIZE = 1 << 16
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def filter_row(kind: int, row: bytes, prev: bytes, bpp: int = 4) -> bytes:
+    if kind == 0:
+        return row
+    if np is not None:
+        cur = np.frombuffer(row, dtype=np.uint8).astype(np.int16)
+        up = np.frombuffer(prev, dtype=np.uint8).astype(np.int16)
+        left = np.concatenate((np.zeros(bpp, np.int16), cur[:-bpp]))
+        if kind == 1:
+            pred = left
+        elif kind == 2:
+            pred = up
+        else:
+            upleft = np.concatenate((np.zeros(bpp, np.int16), up[:-bpp]))
+            p = left + up - upleft
+            pa, pb, pc = np.abs(p - left), np.abs(p - up), np.abs(p - upleft)
+            pred = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upleft))
+        return ((cur - pred) & 0xFF).astype(np.uint8).tobytes()
+
+    left = bytes(bpp) + row[:-bpp]
+    if kind == 1:
+        return bytes([(x - a) & 0xFF for x, a in zip(row, left)])
+    if kind == 2:
+        return bytes([(x - b) & 0xFF for x, b in zip(row, prev)])
+    upleft = bytes(bpp) + prev[:-bpp]
+    return bytes([(x - _paeth(a, b, c)) & 0xFF for x, a, b, c in zip(row, left, prev, upleft)])
+
+
+def _filter_cost(filtered: bytes) -> int:
+    # libpng's heuristic: minimum sum of absolute values, reading bytes as signed.
+    if np is not None:
+        return int(np.abs(np.frombuffer(filtered, dtype=np.int8).astype(np.int32)).sum())
+    return sum(v if v < 128 else 256 - v for v in filtered)
+
+
+def write_png_rgba(
+    path: Path,
+    w: int,
+    h: int,
+    data: bytes | bytearray,
+    level: int = 9,
+    filter_mode: str = 'none',
+) -> None:
+    stride = w * 4
+    view = memoryview(data)
+    write_png_rows(path, w, h, (view[y * stride:(y + 1) * stride] for y in range(h)), level, filter_mode)
+
+
+def write_png_rows(
+    path: Path,
+    w: int,
+    h: int,
+    rows: Iterable[bytes | memoryview],
+    level: int = 9,
+    filter_mode: str = 'none',
+) -> None:
+    """Stream RGBA rows to a PNG.
+
+    Rows are filtered and deflated through a single compressobj and flushed as
+    IDAT chunks of about PNG_IDAT_SIZE bytes, so no second copy of the frame is
+    built. 'adaptive' picks the cheapest of None/Sub/Up/Paeth per row.
+    """
     stride = w * 4
-    for y in range(h):
-        raw.append(0)
-        raw.extend(data[y * stride:(y + 1) * stride])
+    compressor = zlib.compressobj(level)
+    kinds = tuple(PNG_FILTERS.values()) if filter_mode == 'adaptive' else (PNG_FILTERS[filter_mode],)
+    prev = bytes(stride)
+    pending = bytearray()
 
     ihdr = struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0)
-    payload = zlib.compress(bytes(raw), 9)
     with path.open('wb') as f:
         f.write(b'\x89PNG\r\n\x1a\n')
         f.write(chunk(b'IHDR', ihdr))
-        f.write(chunk(b'IDAT', payload))
+        for row in rows:
+            if kinds == (0,):
+                kind, filtered = 0, row
+            else:
+                row = bytes(row)
+                candidates = [(k, filter_row(k, row, prev)) for k in kinds]
+                kind, filtered = min(candidates, key=lambda c: _filter_cost(c[1])) if len(kinds) > 1 else candidates[0]
+                prev = row
+            pending += compressor.compress(bytes((kind,)))
+            pending += compressor.compress(filtered)
+            if len(pending) >= PNG_IDAT_SIZE:
+                f.write(chunk(b'IDAT', bytes(pending)))
+                pending.clear()
+        pending += compressor.flush()
+        f.write(chunk(b'IDAT', bytes(pending)))
         f.write(chunk(b'IEND', b''))
 
 
-def blend_at(data: bytearray, x: int, y: int, color: tuple[int, int, int], alpha: int) -> None:
-    if x < 0 or y < 0 or x >= W or y >= H or alpha <= 0:
+def png_bytes(w: int, h: int, data: bytes | bytearray, level: int = 9) -> bytes:
+    # A whole small PNG in memory, for thumbnails inlined as data URIs.
+    stride = w * 4
+    raw = b''.join(b'\0' + bytes(data[y * stride:(y + 1) * stride]) for y in range(h))
+    ihdr = struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(raw, level)) + chunk(b'IEND', b'')
+
+
+def blend_at(data: bytearray, w: int, h: int, x: int, y: int, color: tuple[int, int, int], alpha: int) -> None:
+    if x < 0 or y < 0 or x >= w or y >= h or alpha <= 0:
         return
-    i = (y * W + x) * 4
+    i = (y * w + x) * 4
     dr, dg, db, da = data[i], data[i + 1], data[i + 2], data[i + 3]
     sa = alpha
     oa = sa + (da * (255 - sa) // 255)
@@ -160,8 +298,45 @@ def blend_at(data: bytearray, x: int, y: int, color: tuple[int, int, int], alpha
     data[i + 3] = oa
 
 
+BLEND_MODES = ('over', 'legacy')
+
+# round(a * b / 255) for 8-bit a and b, indexed [a << 8 | b]; row b is a translate table.
+MUL_TABLE = bytes((a * b + 127) // 255 for a in range(256) for b in range(256))
+
+
+def blend_over(data: bytearray, w: int, h: int, x: int, y: int, color: tuple[int, int, int], alpha: int) -> None:
+    """Porter-Duff source-over on straight alpha.
+
+    blend_at mixes toward the destination colour without weighting it by the
+    destination alpha, so soft edges drawn on a transparent layer pull toward
+    black. Here the destination only contributes its own coverage:
+    dw = da * (1 - sa), out_a = sa + dw, out_c = (c * sa + d * dw) / out_a,
+    all rounded to nearest.
+    """
+    if x < 0 or y < 0 or x >= w or y >= h or alpha <= 0:
+        return
+    i = (y * w + x) * 4
+    da = data[i + 3]
+    if da == 0:
+        data[i:i + 4] = bytes((*color, alpha))
+        return
+    dw = MUL_TABLE[da << 8 | (255 - alpha)]
+    oa = alpha + dw
+    den = 2 * oa
+    data[i] = (2 * (color[0] * alpha + data[i] * dw) + oa) // den
+    data[i + 1] = (2 * (color[1] * alpha + data[i + 1] * dw) + oa) // den
+    data[i + 2] = (2 * (color[2] * alpha + data[i + 2] * dw) + oa) // den
+    data[i + 3] = oa
+
+
+Blender = Callable[[bytearray, int, int, int, int, tuple[int, int, int], int], None]
+BLENDERS: dict[str, Blender] = {'over': blend_over, 'legacy': blend_at}
+
+
 def draw_soft_ellipse(
     data: bytearray,
+    w: int,
+    h: int,
     cx: float,
     cy: float,
     rx: float,
@@ -169,11 +344,14 @@ def draw_soft_ellipse(
     color: tuple[int, int, int],
     alpha: int,
     feather: float = 0.24,
+    blend: Blender = blend_at,
+    rows: range | None = None,
 ) -> None:
+    rows = range(h) if rows is None else rows
     min_x = max(0, int(cx - rx * (1 + feather)))
-    max_x = min(W - 1, int(cx + rx * (1 + feather)))
-    min_y = max(0, int(cy - ry * (1 + feather)))
-    max_y = min(H - 1, int(cy + ry * (1 + feather)))
+    max_x = min(w - 1, int(cx + rx * (1 + feather)))
+    min_y = max(rows.start, int(cy - ry * (1 + feather)))
+    max_y = min(rows.stop - 1, int(cy + ry * (1 + feather)))
 
     for y in range(min_y, max_y + 1):
         ny = (y - cy) / ry
@@ -187,23 +365,28 @@ def draw_soft_ellipse(
             else:
                 t = (d - 1) / feather
                 a = int(alpha * max(0.0, 1.0 - t))
-            blend_at(data, x, y, color, a)
+            blend(data, w, len(rows), x, y - rows.start, color, a)
 
 
 def draw_soft_rect(
     data: bytearray,
+    w: int,
+    h: int,
     x0: float,
     y0: float,
     x1: float,
     y1: float,
     color: tuple[int, int, int],
     alpha: int,
-    feather: int = 10,
+    feather: float = 10,
+    blend: Blender = blend_at,
+    rows: range | None = None,
 ) -> None:
+    rows = range(h) if rows is None else rows
     min_x = max(0, int(x0 - feather))
-    max_x = min(W - 1, int(x1 + feather))
-    min_y = max(0, int(y0 - feather))
-    max_y = min(H - 1, int(y1 + feather))
+    max_x = min(w - 1, int(x1 + feather))
+    min_y = max(rows.start, int(y0 - feather))
+    max_y = min(rows.stop - 1, int(y1 + feather))
 
     for y in range(min_y, max_y + 1):
         for x in range(min_x, max_x + 1):
@@ -214,412 +397,4586 @@ def draw_soft_rect(
                 continue
             t = d / max(1, feather)
             a = int(alpha * (1 - t))
-            blend_at(data, x, y, color, a)
+            blend(data, w, len(rows), x, y - rows.start, color, a)
 
 
-def draw_soft_line(
+def draw_soft_segments(
     data: bytearray,
-    x0: float,
-    y0: float,
-    x1: float,
-    y1: float,
-    thickness: float,
+    w: int,
+    h: int,
+    segments: list[tuple[float, float, float, float]],
+    rx: float,
+    ry: float,
     color: tuple[int, int, int],
     alpha: int,
+    feather: float = 0.32,
+    blend: Blender = blend_at,
+    rows: range | None = None,
 ) -> None:
-    steps = int(max(abs(x1 - x0), abs(y1 - y0)) / 3) + 1
-    for i in range(steps + 1):
-        t = i / max(1, steps)
-        x = x0 * (1 - t) + x1 * t
-        y = y0 * (1 - t) + y1 * t
-        draw_soft_ellipse(data, x, y, thickness, thickness * 0.75, color, alpha, feather=0.32)
+    # Capsules: each (x0, y0, x1, y1) segment swept by an rx x ry ellipse, with
+    # the ellipse's falloff applied to the distance from the segment. Overlapping
+    # segments keep the strongest coverage so every pixel is blended once.
+    rows = range(h) if rows is None else rows
+    reach = math.sqrt(1 + feather)
+    coverage: dict[int, int] = {}
+    for x0, y0, x1, y1 in segments:
+        ux = (x1 - x0) / rx
+        uy = (y1 - y0) / ry
+        ll = ux * ux + uy * uy
+        min_x, min_y, end_x, end_y = segment_bounds(x0, y0, x1, y1, rx, ry, feather, w, h)
+        for y in range(max(min_y, rows.start), min(end_y, rows.stop)):
+            py = (y - y0) / ry
+            # Only the span of segment points within reach of this row can cover it.
+            if uy == 0:
+                if abs(py) > reach:
+                    continue
+                t_lo, t_hi = 0.0, 1.0
+            else:
+                t_lo, t_hi = sorted(((py - reach) / uy, (py + reach) / uy))
+                t_lo, t_hi = max(0.0, t_lo), min(1.0, t_hi)
+                if t_lo > t_hi:
+                    continue
+            span_lo = x0 + (min(t_lo * ux, t_hi * ux) - reach) * rx
+            span_hi = x0 + (max(t_lo * ux, t_hi * ux) + reach) * rx
+            row = (y - rows.start) * w
+            for x in range(max(min_x, int(span_lo) - 1), min(end_x, int(span_hi) + 2)):
+                px = (x - x0) / rx
+                t = min(1.0, max(0.0, (px * ux + py * uy) / ll)) if ll else 0.0
+                ex = px - t * ux
+                ey = py - t * uy
+                d = ex * ex + ey * ey
+                if d > 1 + feather:
+                    continue
+                if d <= 1:
+                    a = alpha
+                else:
+                    a = int(alpha * max(0.0, 1.0 - (d - 1) / feather))
+                if a > coverage.get(row + x, 0):
+                    coverage[row + x] = a
+    for i, a in coverage.items():
+        blend(data, w, len(rows), i % w, i // w, color, a)
 
 
-def fill_gradient(data: bytearray, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
-    for y in range(H):
-        t = y / (H - 1)
+def fill_gradient(
+    data: bytearray,
+    w: int,
+    h: int,
+    top: tuple[int, int, int],
+    bottom: tuple[int, int, int],
+    rows: range | None = None,
+) -> None:
+    rows = range(h) if rows is None else rows
+    for y in rows:
+        t = y / (h - 1)
         r = int(top[0] * (1 - t) + bottom[0] * t)
         g = int(top[1] * (1 - t) + bottom[1] * t)
         b = int(top[2] * (1 - t) + bottom[2] * t)
-        for x in range(W):
-            i = (y * W + x) * 4
+        for x in range(w):
+            i = ((y - rows.start) * w + x) * 4
             data[i] = r
             data[i + 1] = g
             data[i + 2] = b
             data[i + 3] = 255
 
 
-def add_grain(data: bytearray, amount: int, seed: int) -> None:
-    for y in range(H):
-        for x in range(W):
+def add_glow(data: bytearray, w: int, h: int, highlight: tuple[int, int, int], rows: range | None = None) -> None:
+    rows = range(h) if rows is None else rows
+    for y in rows:
+        ty = y / h
+        for x in range(w):
+            tx = x / w
+            i = ((y - rows.start) * w + x) * 4
+            glow = math.exp(-(((tx - 0.5) / 0.3) ** 2 + ((ty - 0.36) / 0.34) ** 2))
+            data[i] = clamp(data[i] + highlight[0] * glow * 0.18)
+            data[i + 1] = clamp(data[i + 1] + highlight[1] * glow * 0.12)
+            data[i + 2] = clamp(data[i + 2] + highlight[2] * glow * 0.1)
+
+
+def add_grain(data: bytearray, w: int, h: int, amount: int, seed: int, rows: range | None = None) -> None:
+    rows = range(h) if rows is None else rows
+    for y in rows:
+        for x in range(w):
             n = hash_noise(x, y, seed) - 0.5
-            i = (y * W + x) * 4
+            i = ((y - rows.start) * w + x) * 4
             delta = int(n * amount)
             data[i] = clamp(data[i] + delta)
             data[i + 1] = clamp(data[i + 1] + delta)
             data[i + 2] = clamp(data[i + 2] + delta)
 
 
-def add_vignette(data: bytearray, strength: float = 0.48) -> None:
-    cx = W * 0.5
-    cy = H * 0.52
-    max_d = math.sqrt((W * 0.62) ** 2 + (H * 0.62) ** 2)
-    for y in range(H):
-        for x in range(W):
+def add_vignette(data: bytearray, w: int, h: int, strength: float = 0.48, rows: range | None = None) -> None:
+    rows = range(h) if rows is None else rows
+    cx = w * 0.5
+    cy = h * 0.52
+    max_d = math.sqrt((w * 0.62) ** 2 + (h * 0.62) ** 2)
+    for y in rows:
+        for x in range(w):
             dx = x - cx
             dy = y - cy
             d = math.sqrt(dx * dx + dy * dy) / max_d
             f = max(0.0, min(1.0, (d - 0.34) / 0.66))
             dark = 1.0 - strength * (f ** 1.4)
-            i = (y * W + x) * 4
+            i = ((y - rows.start) * w + x) * 4
             data[i] = int(data[i] * dark)
             data[i + 1] = int(data[i + 1] * dark)
             data[i + 2] = int(data[i + 2] * dark)
 
 
-def make_background(event_id: str, visual: EventVisual) -> bytearray:
-    palette = PALETTES[visual.profile]
-    data = bytearray(W * H * 4)
-    fill_gradient(data, palette['top'], palette['bottom'])
+def add_ember_haze(data: bytearray, w: int, h: int, blend: Blender = blend_at, rows: range | None = None) -> None:
+    rows = range(h) if rows is None else rows
+    for y in range(max(int(h * 0.58), rows.start), rows.stop):
+        ny = (y - h * 0.78) / (h * 0.24)
+        for x in range(w):
+            nx = x / w
+            wave = math.sin(nx * 12 + ny * 5)
+            a = int(max(0.0, 62 * (1 - abs(ny)) + 18 * wave))
+            blend(data, w, len(rows), x, y - rows.start, (192, 104, 76), min(92, max(0, a)))
 
-    # Atmosphere glow
-    for y in range(H):
-        ty = y / H
-        for x in range(W):
-            tx = x / W
-            i = (y * W + x) * 4
-            glow = math.exp(-(((tx - 0.5) / 0.3) ** 2 + ((ty - 0.36) / 0.34) ** 2))
-            data[i] = clamp(data[i] + palette['highlight'][0] * glow * 0.18)
-            data[i + 1] = clamp(data[i + 1] + palette['highlight'][1] * glow * 0.12)
-            data[i + 2] = clamp(data[i + 2] + palette['highlight'][2] * glow * 0.1)
 
-    if visual.profile == PROFILE_BATTLE:
-        # Horizon + smoke layers
-        for band in range(4):
-            y0 = H * (0.58 + band * 0.07)
-            draw_soft_line(data, 0, y0, W, y0 + random.uniform(-25, 25), 7 + band * 2, palette['shadow'], 95 - band * 10)
-        # Subtle fire glows
-        for x in (180, 500, 920, 1320):
-            draw_soft_ellipse(data, x, H * 0.74, 200, 70, palette['highlight'], 45, 0.42)
+PARTICLE_MODES = ('sparse', 'scan')
 
-    elif visual.profile == PROFILE_CEREMONY:
-        # Column shafts
-        for cx in (220, 520, 820, 1120, 1420):
-            draw_soft_rect(data, cx - 36, 0, cx + 36, H, palette['shadow'], 80, feather=30)
-            draw_soft_rect(data, cx - 16, 0, cx + 16, H, palette['highlight'], 35, feather=20)
-        draw_soft_ellipse(data, W * 0.5, H * 0.24, 360, 180, palette['highlight'], 60, 0.35)
 
-    elif visual.profile == PROFILE_COLLAPSE:
-        # fractured walls
-        for i in range(7):
-            x = 100 + i * 220
-            draw_soft_rect(data, x, H * 0.56 + (i % 2) * 30, x + 120, H * 0.85, palette['shadow'], 90, 18)
-        # cracks
-        for i in range(8):
-            x0 = random.randint(120, W - 120)
-            y0 = random.randint(int(H * 0.55), int(H * 0.85))
-            draw_soft_line(data, x0, y0, x0 + random.randint(-90, 90), y0 + random.randint(60, 130), 2.2, (125, 84, 66), 110)
+def grid_rows(y_start: int, step: int, rows: range) -> range:
+    # The rows of the y_start + k * step grid that fall inside rows.
+    first = y_start + max(0, -(-(rows.start - y_start) // step)) * step
+    return range(min(first, rows.stop), rows.stop, step)
 
-    elif visual.profile == PROFILE_MAP:
-        # parchment bands + cartography lines
-        for y in range(140, H, 110):
-            draw_soft_line(data, 80, y, W - 80, y + random.randint(-24, 24), 2.2, (180, 122, 86), 65)
-        for _ in range(10):
-            x0 = random.randint(140, W - 140)
-            y0 = random.randint(120, H - 120)
-            x1 = x0 + random.randint(-240, 240)
-            y1 = y0 + random.randint(-160, 160)
-            draw_soft_line(data, x0, y0, x1, y1, 1.8, (160, 110, 78), 70)
 
-    add_grain(data, 10, abs(hash(event_id)) % 2000 + 17)
-    add_vignette(data, 0.5)
-    return data
+def scan_specks(
+    w: int,
+    h: int,
+    y_start: int,
+    step: int,
+    scale: tuple[int, int],
+    seed: int,
+    threshold: float,
+    rows: range | None = None,
+) -> tuple[list[int], list[int]]:
+    # The original placement: every grid cell whose hash_noise clears the threshold.
+    xs, ys = [], []
+    for y in grid_rows(y_start, step, range(h) if rows is None else rows):
+        for x in range(0, w, step):
+            if hash_noise(x * scale[0], y * scale[1], seed) > threshold:
+                xs.append(x)
+                ys.append(y)
+    return xs, ys
 
 
-def motif_shape(data: bytearray, motif: str) -> None:
-    clay = (188, 162, 136)
-    dark = (92, 70, 56)
-    warm = (206, 147, 99)
+def emit_specks(w: int, h: int, y_start: int, step: int, seed: int, threshold: float) -> tuple[list[int], list[int]]:
+    """Place specks with the density of a threshold scan, in time proportional to the speck count.
 
-    if motif == 'senate-oath':
-        for i in range(6):
-            x = 300 + i * 170
-            draw_soft_rect(data, x, 260, x + 74, 760, dark, 210, 16)
-        draw_soft_rect(data, 560, 560, 1040, 760, clay, 220, 16)
-        draw_soft_ellipse(data, 800, 460, 72, 92, clay, 230, 0.2)
-        draw_soft_line(data, 850, 505, 980, 430, 5, clay, 220)
+    Each grid cell clears the scan with probability 1 - threshold, so the
+    emitter draws that share of the cells uniformly, without replacement, from
+    a generator seeded like the scan. Specks come back in row-major order.
+    """
+    cols = len(range(0, w, step))
+    cells = cols * len(range(y_start, h, step))
+    if cells <= 0:
+        return [], []
+    picks = sorted(random.Random(seed).sample(range(cells), round(cells * (1.0 - threshold))))
+    return [c % cols * step for c in picks], [y_start + c // cols * step for c in picks]
 
-    elif motif == 'burning-city':
-        for i in range(7):
-            x = 130 + i * 190
-            h = random.randint(180, 280)
-            draw_soft_rect(data, x, 720 - h, x + 120, 720, dark, 215, 14)
-        for x in (280, 620, 980, 1280):
-            draw_soft_ellipse(data, x, 520, 90, 160, warm, 80, 0.45)
 
-    elif motif == 'elephant-line':
-        draw_soft_ellipse(data, 710, 560, 250, 110, clay, 220, 0.2)
-        draw_soft_ellipse(data, 500, 520, 92, 72, clay, 215, 0.2)
-        draw_soft_rect(data, 900, 520, 1180, 590, clay, 200, 12)
-        for lx in (620, 740, 850, 970):
-            draw_soft_rect(data, lx, 620, lx + 36, 790, dark, 215, 10)
-        for sx in range(1020, 1450, 70):
-            draw_soft_line(data, sx, 540, sx + 140, 520, 2.8, clay, 185)
+@functools.lru_cache(maxsize=None)
+def speck_sprite(size: int) -> tuple[tuple[int, int, float], ...]:
+    # (dx, dy, coverage) of a round speck size px across; size 1 is the single pixel the scan paints.
+    if size <= 1:
+        return ((0, 0, 1.0),)
+    r = size / 2
+    reach = math.ceil(r)
+    return tuple(
+        (dx, dy, min(1.0, r + 0.5 - math.hypot(dx, dy)))
+        for dy in range(-reach, reach + 1)
+        for dx in range(-reach, reach + 1)
+        if r + 0.5 - math.hypot(dx, dy) > 0
+    )
 
-    elif motif == 'alpine-march':
-        draw_soft_line(data, 80, 700, 520, 320, 22, dark, 180)
-        draw_soft_line(data, 460, 760, 980, 260, 30, dark, 190)
-        draw_soft_line(data, 920, 760, 1520, 360, 24, dark, 185)
-        for i in range(9):
-            x = 520 + i * 90
-            y = 650 - i * 30
-            draw_soft_rect(data, x, y, x + 26, y + 88, clay, 205, 8)
 
-    elif motif == 'encirclement':
-        draw_soft_ellipse(data, 780, 560, 200, 120, dark, 210, 0.22)
-        draw_soft_ellipse(data, 820, 560, 320, 200, clay, 120, 0.26)
-        draw_soft_ellipse(data, 820, 560, 420, 280, clay, 70, 0.28)
-        for a in range(0, 360, 18):
-            x = 820 + math.cos(math.radians(a)) * 420
-            y = 560 + math.sin(math.radians(a)) * 280
-            draw_soft_ellipse(data, x, y, 10, 10, warm, 120, 0.2)
+def ellipse_bounds(cx: float, cy: float, rx: float, ry: float, feather: float, w: int, h: int) -> tuple[int, int, int, int]:
+    # Same clipping as draw_soft_ellipse, as an exclusive (x0, y0, x1, y1) box.
+    return (
+        max(0, int(cx - rx * (1 + feather))),
+        max(0, int(cy - ry * (1 + feather))),
+        min(w - 1, int(cx + rx * (1 + feather))) + 1,
+        min(h - 1, int(cy + ry * (1 + feather))) + 1,
+    )
 
-    elif motif == 'carthage-ruin':
-        for i in range(6):
-            x = 180 + i * 210
-            draw_soft_rect(data, x, 420 + (i % 2) * 30, x + 130, 760, dark, 210, 14)
-        draw_soft_line(data, 180, 760, 1420, 760, 6, dark, 180)
-        for x in (300, 520, 760, 1040, 1300):
-            draw_soft_ellipse(data, x, 560, 95, 145, warm, 85, 0.44)
 
-    elif motif == 'rebel-camp':
-        for i in range(10):
-            x = 260 + i * 110
-            y = 600 + (i % 3) * 12
-            draw_soft_ellipse(data, x, y, 28, 44, dark, 220, 0.2)
-            draw_soft_line(data, x + 12, y - 22, x + 42, y - 90, 3, clay, 185)
-        draw_soft_line(data, 200, 760, 1420, 740, 7, dark, 170)
+def rect_bounds(x0: float, y0: float, x1: float, y1: float, feather: float, w: int, h: int) -> tuple[int, int, int, int]:
+    # Same clipping as draw_soft_rect, as an exclusive (x0, y0, x1, y1) box.
+    return (
+        max(0, int(x0 - feather)),
+        max(0, int(y0 - feather)),
+        min(w - 1, int(x1 + feather)) + 1,
+        min(h - 1, int(y1 + feather)) + 1,
+    )
 
-    elif motif == 'river-crossing':
-        draw_soft_line(data, 0, 700, 1600, 640, 18, dark, 175)
-        draw_soft_line(data, 0, 730, 1600, 670, 12, clay, 85)
-        draw_soft_ellipse(data, 740, 560, 120, 90, clay, 210, 0.2)
-        draw_soft_rect(data, 700, 620, 900, 670, dark, 200, 10)
-        draw_soft_line(data, 860, 560, 980, 520, 5, clay, 210)
 
-    elif motif == 'amphitheatre':
-        draw_soft_ellipse(data, 800, 610, 520, 220, dark, 200, 0.2)
-        draw_soft_ellipse(data, 800, 610, 410, 150, clay, 150, 0.25)
-        for i in range(16):
-            x = 370 + i * 55
-            draw_soft_rect(data, x, 470, x + 34, 690, clay, 180, 8)
+def segment_bounds(
+    x0: float, y0: float, x1: float, y1: float, rx: float, ry: float, feather: float, w: int, h: int
+) -> tuple[int, int, int, int]:
+    # A capsule fits in the union of the ellipse boxes at its two ends.
+    a = ellipse_bounds(x0, y0, rx, ry, feather, w, h)
+    b = ellipse_bounds(x1, y1, rx, ry, feather, w, h)
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
 
-    elif motif == 'imperial-map':
-        draw_soft_rect(data, 320, 500, 1280, 760, dark, 185, 16)
-        draw_soft_rect(data, 380, 530, 1220, 720, clay, 210, 12)
-        for _ in range(16):
-            x0 = random.randint(420, 1160)
-            y0 = random.randint(560, 690)
-            x1 = x0 + random.randint(-140, 140)
-            y1 = y0 + random.randint(-90, 90)
-            draw_soft_line(data, x0, y0, x1, y1, 1.8, warm, 130)
 
-    elif motif == 'statue-frontier':
-        draw_soft_rect(data, 650, 360, 940, 760, clay, 225, 16)
-        draw_soft_ellipse(data, 790, 300, 84, 98, clay, 235, 0.22)
-        draw_soft_line(data, 930, 460, 1080, 420, 5, clay, 210)
-        draw_soft_line(data, 160, 760, 1440, 730, 8, dark, 165)
+@dataclass(frozen=True)
+class Frame:
+    """Layer pixels cropped to the occupied bounding box of a w x h canvas.
 
-    elif motif == 'fractured-city':
-        for i in range(7):
-            x = 140 + i * 200
-            h = random.randint(220, 350)
-            draw_soft_rect(data, x, 760 - h, x + 120, 760, dark, 210, 12)
-        for _ in range(10):
-            x = random.randint(180, 1420)
-            y = random.randint(430, 760)
-            draw_soft_line(data, x, y, x + random.randint(-120, 120), y + random.randint(40, 130), 2.2, warm, 145)
+    bbox is (x0, y0, x1, y1), exclusive; everything outside it is transparent
+    black. Encoders stream rows from here so empty canvas is never copied.
+    """
 
-    elif motif == 'bridge-battle':
-        draw_soft_line(data, 220, 700, 1380, 700, 16, dark, 185)
-        for i in range(8):
-            x = 280 + i * 140
-            draw_soft_rect(data, x, 700, x + 26, 810, dark, 195, 8)
-        for i in range(10):
-            x = 340 + i * 100
-            draw_soft_ellipse(data, x, 610 + (i % 2) * 20, 24, 40, clay, 210, 0.2)
+    w: int
+    h: int
+    bbox: tuple[int, int, int, int]
+    pixels: bytes
 
-    elif motif == 'breach-gates':
-        draw_soft_rect(data, 420, 360, 1180, 760, dark, 205, 14)
-        draw_soft_rect(data, 730, 500, 880, 760, (20, 12, 9), 255, 8)
-        for x in (540, 660, 980, 1080):
-            draw_soft_ellipse(data, x, 520, 85, 130, warm, 85, 0.4)
+    def rows(self) -> Iterator[bytes]:
+        x0, y0, x1, y1 = self.bbox
+        blank = bytes(self.w * 4)
+        left = bytes(x0 * 4)
+        right = bytes((self.w - x1) * 4)
+        span = (x1 - x0) * 4
+        for y in range(self.h):
+            if y0 <= y < y1:
+                i = (y - y0) * span
+                yield left + self.pixels[i:i + span] + right
+            else:
+                yield blank
 
-    elif motif == 'throne-decline':
-        draw_soft_rect(data, 520, 560, 1080, 770, dark, 205, 14)
-        draw_soft_rect(data, 650, 400, 950, 610, clay, 210, 12)
-        draw_soft_line(data, 980, 440, 1120, 690, 8, dark, 190)
-        draw_soft_line(data, 640, 760, 1040, 760, 7, clay, 140)
+    def tobytes(self) -> bytes:
+        if self.bbox == (0, 0, self.w, self.h):
+            return self.pixels
+        return b''.join(self.rows())
 
-    elif motif == 'senate-fall':
-        for i in range(6):
-            x = 260 + i * 180
-            draw_soft_rect(data, x, 230, x + 80, 760, dark, 180, 16)
-        draw_soft_ellipse(data, 760, 630, 220, 90, clay, 185, 0.24)
+    def bands(self) -> Iterator[tuple[int, Frame]]:
+        # (first row, frame) pieces, for consumers that also accept a BandedFrame.
+        yield 0, self
 
-    elif motif == 'imperial-statue':
-        draw_soft_rect(data, 640, 320, 960, 770, clay, 220, 16)
-        draw_soft_ellipse(data, 800, 260, 84, 100, clay, 230, 0.2)
+    def coverage(self, tile: int = 64) -> dict[str, object]:
+        x0, y0, x1, y1 = self.bbox
+        span = x1 - x0
+        alpha = self.pixels[3::4]
+        covered = len(alpha) - alpha.count(0)
+        tiles: set[tuple[int, int]] = set()
+        for row in range(y1 - y0):
+            line = alpha[row * span:(row + 1) * span]
+            ty = (y0 + row) // tile
+            for tx in range(x0 // tile, -(-x1 // tile)):
+                if (ty, tx) in tiles:
+                    continue
+                if line[max(0, tx * tile - x0):(tx + 1) * tile - x0].strip(b'\0'):
+                    tiles.add((ty, tx))
+        area = self.w * self.h
+        return {
+            'bbox': list(self.bbox),
+            'bbox_fraction': round(span * (y1 - y0) / area, 4),
+            'covered_pixels': covered,
+            'coverage': round(covered / area, 4),
+            'tiles': len(tiles),
+            'tiles_total': -(-self.w // tile) * -(-self.h // tile),
+        }
 
-    elif motif == 'founding':
-        draw_soft_ellipse(data, 840, 565, 240, 95, dark, 220, 0.2)
-        draw_soft_ellipse(data, 640, 525, 95, 74, dark, 210, 0.2)
-        for lx in (760, 840, 930, 1010):
-            draw_soft_rect(data, lx, 630, lx + 32, 800, dark, 220, 10)
 
+def canvas_size(width: int) -> tuple[int, int]:
+    return width, round(width * H / W)
 
-def make_mid(event_id: str, visual: EventVisual) -> bytearray:
-    data = bytearray(W * H * 4)
-    motif_shape(data, visual.motif)
-    # Universal relief pass for legibility
-    draw_soft_ellipse(data, W * 0.5, H * 0.58, 420, 230, (230, 205, 180), 28, 0.36)
-    return data
 
+class StageTimer:
+    """Wall time and call counts per nested stage, keyed by 'outer/inner' paths."""
 
-def make_fg(event_id: str, visual: EventVisual) -> bytearray:
-    data = bytearray(W * H * 4)
+    def __init__(self) -> None:
+        self.stages: dict[str, list[float]] = {}
+        self.scope: list[str] = []
 
-    if visual.accent == 'embers':
-        for y in range(int(H * 0.58), H):
-            ny = (y - H * 0.78) / (H * 0.24)
-            for x in range(W):
-                nx = x / W
-                wave = math.sin(nx * 12 + ny * 5)
-                a = int(max(0.0, 62 * (1 - abs(ny)) + 18 * wave))
-                blend_at(data, x, y, (192, 104, 76), min(92, max(0, a)))
-        for y in range(0, H, 2):
-            for x in range(0, W, 2):
-                n = hash_noise(x * 3, y * 2, 711 + abs(hash(event_id)) % 400)
-                if n > 0.9972:
-                    blend_at(data, x, y, (236, 178, 122), 130)
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.stages.setdefault('/'.join([*self.scope, name]), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
 
-    elif visual.accent == 'dust':
-        for y in range(int(H * 0.48), H):
-            for x in range(W):
-                n = hash_noise(x, y, 433 + abs(hash(event_id)) % 170)
-                if n > 0.992:
-                    blend_at(data, x, y, (182, 145, 112), 70)
-        draw_soft_ellipse(data, W * 0.5, H * 0.76, 700, 170, (186, 132, 94), 42, 0.4)
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # Reserve the slot first so a stage is listed before the stages inside it.
+        self.stages.setdefault('/'.join([*self.scope, name]), [0, 0.0])
+        start = time.perf_counter()
+        self.scope.append(name)
+        try:
+            yield
+        finally:
+            self.scope.pop()
+            self.add(name, time.perf_counter() - start)
 
-    elif visual.accent == 'laurel':
-        cx, cy = W * 0.5, H * 0.2
-        for k in range(34):
-            a = -2.45 + k * (4.9 / 33)
-            x = cx + math.cos(a) * 180
-            y = cy + math.sin(a) * 88
-            draw_soft_ellipse(data, x, y, 14, 8, (188, 143, 61), 120, 0.35)
-        for x in range(220, 1380, 120):
-            blend_at(data, x, 150 + (x // 120) % 3 * 10, (228, 198, 145), 55)
+    def report(self, root: str = '') -> list[str]:
+        prefix = f'{root}/' if root else ''
+        lines = []
+        for path, (calls, seconds) in self.stages.items():
+            if not path.startswith(prefix) or path == root:
+                continue
+            depth = path[len(prefix):].count('/')
+            name = path.rsplit('/', 1)[-1]
+            lines.append(f'{"  " * (depth + 1)}{name:<{28 - 2 * depth}} {seconds:8.3f} s  x{int(calls)}')
+        return lines
 
-    elif visual.accent == 'steel-glint':
-        for i in range(7):
-            x0 = 180 + i * 210
-            y0 = 680 - i * 14
-            draw_soft_line(data, x0, y0, x0 + 220, y0 - 30, 2.4, (226, 201, 155), 95)
-        draw_soft_line(data, 520, 430, 1260, 430, 3.4, (232, 207, 161), 80)
 
-    else:  # none
-        for y in range(0, H, 2):
-            for x in range(0, W, 2):
-                n = hash_noise(x * 2, y * 2, 951)
-                if n > 0.9983:
-                    blend_at(data, x, y, (220, 184, 142), 45)
+# Set by --profile; primitives and pipeline stages record into it when present.
+PROFILER: StageTimer | None = None
 
-    return data
 
+def profile_stage(name: str) -> AbstractContextManager[None]:
+    return PROFILER.stage(name) if PROFILER is not None else contextlib.nullcontext()
 
-def find_cwebp() -> str:
-    env = os.environ.get('CWEBP')
-    if env and Path(env).exists():
-        return env
-    for candidate in ('/opt/homebrew/bin/cwebp', '/usr/local/bin/cwebp'):
-        if Path(candidate).exists():
-            return candidate
-    return 'cwebp'
 
+def profiled(method: Callable[..., None]) -> Callable[..., None]:
+    @functools.wraps(method)
+    def wrapper(self: Raster, *args: object, **kwargs: object) -> None:
+        if PROFILER is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            PROFILER.add(method.__name__, time.perf_counter() - start)
 
-def to_webp(cwebp_bin: str, rgba: bytearray, output_path: Path) -> None:
-    tmp_png = output_path.with_suffix('.tmp.png')
-    write_png_rgba(tmp_png, W, H, rgba)
-    try:
-        subprocess.run(
-            [cwebp_bin, '-q', '87', '-alpha_q', '92', str(tmp_png), '-o', str(output_path)],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+    return wrapper
+
+
+class FieldCache:
+    """Bounded LRU of full-frame planes that depend only on canvas size and parameters.
+
+    Gradient, glow and vignette passes read their per-pixel values from here, so
+    a run computes each plane once per (size, parameters) instead of once per
+    event. Planes are flat memoryviews evicted least recently used once their
+    total size passes limit bytes. With a directory, built planes are also
+    written there as raw files and later runs memory-map them instead.
+    """
+
+    def __init__(self, limit: int = FIELD_CACHE_LIMIT, directory: Path | None = None) -> None:
+        self.limit = limit
+        self.directory = directory
+        self.planes: OrderedDict[tuple[object, ...], memoryview] = OrderedDict()
+        self.size = 0
+
+    def get(self, key: tuple[object, ...], fmt: str, build: Callable[[], object]) -> memoryview:
+        plane = self.planes.get(key)
+        if plane is not None:
+            self.planes.move_to_end(key)
+            return plane
+        plane = self._load(key, fmt)
+        if plane is None:
+            with profile_stage(f'field {key[0]}'):
+                plane = memoryview(build()).cast('B').cast(fmt)
+            self._store(key, plane)
+        self.planes[key] = plane
+        self.size += plane.nbytes
+        while self.size > self.limit and self.planes:
+            _, old = self.planes.popitem(last=False)
+            self.size -= old.nbytes
+        return plane
+
+    def _path(self, key: tuple[object, ...], fmt: str) -> Path:
+        # Raw planes are only valid for the generator and byte order that wrote them.
+        ident = repr((FIELD_CACHE_VERSION, GENERATOR_VERSION, sys.byteorder, fmt, key)).encode('utf-8')
+        return self.directory / f'{key[0]}-{hashlib.sha256(ident).hexdigest()[:20]}.plane'
+
+    def _load(self, key: tuple[object, ...], fmt: str) -> memoryview | None:
+        if self.directory is None:
+            return None
+        try:
+            with self._path(key, fmt).open('rb') as fh:
+                return memoryview(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)).cast(fmt)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, key: tuple[object, ...], plane: memoryview) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key, plane.format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(plane)
+        os.replace(tmp, path)
+
+
+# Shared by every raster in the process; main() and pool workers reconfigure it from the CLI.
+FIELDS = FieldCache()
+
+
+def configure_fields(limit: int, directory: Path | None) -> None:
+    global FIELDS
+    FIELDS = FieldCache(limit, directory)
+
+
+def gradient_plane(w: int, h: int, top: tuple[int, int, int], bottom: tuple[int, int, int], rows: range) -> bytes:
+    lines = []
+    for y in rows:
+        t = y / (h - 1)
+        r = int(top[0] * (1 - t) + bottom[0] * t)
+        g = int(top[1] * (1 - t) + bottom[1] * t)
+        b = int(top[2] * (1 - t) + bottom[2] * t)
+        lines.append(bytes((r, g, b, 255)) * w)
+    return b''.join(lines)
+
+
+def glow_plane(w: int, h: int, rows: range) -> array:
+    # The add_glow falloff, evaluated with the same float steps as the reference loop.
+    gx = [((x / w - 0.5) / 0.3) ** 2 for x in range(w)]
+    plane = array('d')
+    for y in rows:
+        gy = ((y / h - 0.36) / 0.34) ** 2
+        plane.extend(map(math.exp, map(operator.neg, map(operator.add, gx, repeat(gy)))))
+    return plane
+
+
+def vignette_plane(w: int, h: int, strength: float, rows: range) -> array:
+    # The add_vignette darkening factor per pixel; exactly 1.0 inside the clear core.
+    cx = w * 0.5
+    cy = h * 0.52
+    max_d = math.sqrt((w * 0.62) ** 2 + (h * 0.62) ** 2)
+    dx2 = [(x - cx) * (x - cx) for x in range(w)]
+    plane = array('d')
+    for y in rows:
+        dy = y - cy
+        d = map(operator.truediv, map(math.sqrt, map(operator.add, dx2, repeat(dy * dy))), repeat(max_d))
+        f = map(operator.truediv, map(operator.sub, d, repeat(0.34)), repeat(0.66))
+        f = map(max, repeat(0.0), map(min, repeat(1.0), f))
+        plane.extend(map(operator.sub, repeat(1.0), map(operator.mul, repeat(strength), map(pow, f, repeat(1.4)))))
+    return plane
+
+
+class Raster:
+    """Drawing surface the scene builders target.
+
+    Scene code draws in W x H design coordinates; the public shape methods scale
+    them to this raster's pixel size. Full-frame passes work in pixel space.
+    Subclasses implement the pixel-space _ellipse/_rect/_blend/_scan/_specks hooks,
+    must produce byte-identical RGBA output for the same calls, and call mark()
+    with the canvas region each primitive may have written.
+
+    A band (top, bottom) makes the raster hold only those rows of the canvas.
+    Coordinates stay canvas-absolute and every primitive clips to the band, so
+    a band is byte-identical to the same rows of a full-canvas raster.
+    """
+
+    def __init__(
+        self,
+        width: int = W,
+        blend: str = 'over',
+        particles: str = 'sparse',
+        band: tuple[int, int] | None = None,
+    ) -> None:
+        if blend not in BLEND_MODES:
+            raise ValueError(f'Unknown blend mode: {blend}')
+        if particles not in PARTICLE_MODES:
+            raise ValueError(f'Unknown particle mode: {particles}')
+        self.w, self.h = canvas_size(width)
+        self.top, self.bottom = band if band is not None else (0, self.h)
+        if not 0 <= self.top < self.bottom <= self.h:
+            raise ValueError(f'Band {band} is outside the {self.h}-row canvas')
+        self.rows = range(self.top, self.bottom)
+        self.scale = width / W
+        self.blend_mode = blend
+        self.particles = particles
+        self.dirty: tuple[int, int, int, int] | None = None
+
+    def clip(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int]:
+        # A canvas-clipped box from the *_bounds helpers, narrowed to the band.
+        return x0, max(y0, self.top), x1, min(y1, self.bottom)
+
+    def mark(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        x0, y0, x1, y1 = max(0, x0), max(self.top, y0), min(self.w, x1), min(self.bottom, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self.dirty is None:
+            self.dirty = (x0, y0, x1, y1)
+        else:
+            dx0, dy0, dx1, dy1 = self.dirty
+            self.dirty = (min(dx0, x0), min(dy0, y0), max(dx1, x1), max(dy1, y1))
+
+    def frame(self) -> Frame:
+        """Crop to the pixels actually written (alpha > 0) inside the dirty region.
+
+        A banded raster returns a frame of just its rows, with the bbox relative to the band.
+        """
+        rows = self.bottom - self.top
+        if self.dirty is None:
+            return Frame(self.w, rows, (0, 0, 0, 0), b'')
+        x0, y0, x1, y1 = bbox = self._occupied(*self.dirty)
+        if x0 >= x1:
+            return Frame(self.w, rows, (0, 0, 0, 0), b'')
+        return Frame(self.w, rows, (x0, y0 - self.top, x1, y1 - self.top), self._crop(*bbox))
+
+    def _occupied(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int]:
+        raise NotImplementedError
+
+    def _crop(self, x0: int, y0: int, x1: int, y1: int) -> bytes:
+        raise NotImplementedError
+
+    @profiled
+    def soft_ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        s = self.scale
+        self._ellipse(cx * s, cy * s, rx * s, ry * s, color, alpha, feather)
+
+    @profiled
+    def soft_rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: int = 10,
+    ) -> None:
+        s = self.scale
+        self._rect(x0 * s, y0 * s, x1 * s, y1 * s, color, alpha, feather * s)
+
+    def soft_line(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(x0, y0, x1, y1)], thickness, color, alpha)
+
+    def soft_polyline(
+        self,
+        points: list[tuple[float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(*a, *b) for a, b in zip(points, points[1:])], thickness, color, alpha)
+
+    @profiled
+    def soft_segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        """Draw (x0, y0, x1, y1) strokes of one style in a single pass; overlaps do not darken."""
+        s = self.scale
+        scaled = [(x0 * s, y0 * s, x1 * s, y1 * s) for x0, y0, x1, y1 in segments]
+        self._segments(scaled, thickness * s, thickness * 0.75 * s, color, alpha, 0.32)
+
+    @profiled
+    def blend(self, x: float, y: float, color: tuple[int, int, int], alpha: int) -> None:
+        self._blend(int(x * self.scale), int(y * self.scale), color, alpha)
+
+    @profiled
+    def scatter_specks(
+        self,
+        y_start: float,
+        step: int,
+        scale: tuple[int, int],
+        seed: int,
+        threshold: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        size: int = 1,
+    ) -> None:
+        # Specks are a per-pixel density, so only the start row is design-space.
+        y_start = int(y_start * self.scale)
+        if self.particles == 'scan':
+            xs, ys = self._scan(y_start, step, scale, seed, threshold)
+        else:
+            xs, ys = emit_specks(self.w, self.h, y_start, step, seed, threshold)
+        self._specks(xs, ys, speck_sprite(size), color, alpha)
+
+
+class PythonRaster(Raster):
+    """Reference engine: a flat RGBA bytearray drawn pixel by pixel."""
+
+    def __init__(
+        self,
+        width: int = W,
+        blend: str = 'over',
+        particles: str = 'sparse',
+        band: tuple[int, int] | None = None,
+    ) -> None:
+        super().__init__(width, blend, particles, band)
+        self.data = bytearray(self.w * len(self.rows) * 4)
+        self.blend_pixel = BLENDERS[blend]
+
+    def _occupied(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int]:
+        left, right, top, bottom = x1, x0, None, y0
+        for y in range(y0, y1):
+            base = ((y - self.top) * self.w) * 4 + 3
+            alpha = self.data[base + x0 * 4:base + x1 * 4:4]
+            lead = len(alpha) - len(alpha.lstrip(b'\0'))
+            if lead == len(alpha):
+                continue
+            if top is None:
+                top = y
+            bottom = y + 1
+            left = min(left, x0 + lead)
+            right = max(right, x0 + len(alpha.rstrip(b'\0')))
+        if top is None:
+            return (0, 0, 0, 0)
+        return (left, top, right, bottom)
+
+    def _crop(self, x0: int, y0: int, x1: int, y1: int) -> bytes:
+        w, top = self.w, self.top
+        return b''.join(self.data[((y - top) * w + x0) * 4:((y - top) * w + x1) * 4] for y in range(y0, y1))
+
+    @profiled
+    def fill_gradient(self, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
+        self.mark(0, 0, self.w, self.h)
+        fill_gradient(self.data, self.w, self.h, top, bottom, self.rows)
+
+    @profiled
+    def add_glow(self, highlight: tuple[int, int, int]) -> None:
+        self.mark(0, 0, self.w, self.h)
+        add_glow(self.data, self.w, self.h, highlight, self.rows)
+
+    @profiled
+    def add_grain(self, amount: int, seed: int) -> None:
+        self.mark(0, 0, self.w, self.h)
+        add_grain(self.data, self.w, self.h, amount, seed, self.rows)
+
+    @profiled
+    def add_vignette(self, strength: float = 0.48) -> None:
+        self.mark(0, 0, self.w, self.h)
+        add_vignette(self.data, self.w, self.h, strength, self.rows)
+
+    @profiled
+    def add_ember_haze(self) -> None:
+        self.mark(0, int(self.h * 0.58), self.w, self.h)
+        add_ember_haze(self.data, self.w, self.h, self.blend_pixel, self.rows)
+
+    def _scan(
+        self, y_start: int, step: int, scale: tuple[int, int], seed: int, threshold: float
+    ) -> tuple[list[int], list[int]]:
+        return scan_specks(self.w, self.h, y_start, step, scale, seed, threshold, self.rows)
+
+    def _specks(
+        self,
+        xs: list[int],
+        ys: list[int],
+        sprite: tuple[tuple[int, int, float], ...],
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        if not xs:
+            return
+        reach = max(abs(d) for dx, dy, _ in sprite for d in (dx, dy))
+        self.mark(min(xs) - reach, min(ys) - reach, max(xs) + reach + 1, max(ys) + reach + 1)
+        # One sprite offset at a time, so overlapping specks composite in the same order on every engine.
+        for dx, dy, coverage in sprite:
+            a = int(alpha * coverage)
+            for x, y in zip(xs, ys):
+                self.blend_pixel(self.data, self.w, len(self.rows), x + dx, y + dy - self.top, color, a)
+
+    def _blend(self, x: int, y: int, color: tuple[int, int, int], alpha: int) -> None:
+        if alpha > 0:
+            self.mark(x, y, x + 1, y + 1)
+        self.blend_pixel(self.data, self.w, len(self.rows), x, y - self.top, color, alpha)
+
+    def _ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        self.mark(*ellipse_bounds(cx, cy, rx, ry, feather, self.w, self.h))
+        draw_soft_ellipse(self.data, self.w, self.h, cx, cy, rx, ry, color, alpha, feather, self.blend_pixel, self.rows)
+
+    def _segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float,
+    ) -> None:
+        for segment in segments:
+            self.mark(*segment_bounds(*segment, rx, ry, feather, self.w, self.h))
+        draw_soft_segments(
+            self.data, self.w, self.h, segments, rx, ry, color, alpha, feather, self.blend_pixel, self.rows
         )
-    finally:
-        if tmp_png.exists():
-            tmp_png.unlink()
 
+    def _rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 10,
+    ) -> None:
+        self.mark(*rect_bounds(x0, y0, x1, y1, feather, self.w, self.h))
+        draw_soft_rect(self.data, self.w, self.h, x0, y0, x1, y1, color, alpha, feather, self.blend_pixel, self.rows)
 
-def generate_event(event_id: str, cwebp_bin: str, overwrite: bool) -> None:
-    if event_id not in EVENTS:
-        raise ValueError(f'Unknown event id: {event_id}')
+    def tobytes(self) -> bytes:
+        return bytes(self.data)
 
-    visual = EVENTS[event_id]
-    event_dir = ROOT / event_id
-    event_dir.mkdir(parents=True, exist_ok=True)
 
-    targets = {
-        'bg': event_dir / 'bg.webp',
-        'mid': event_dir / 'mid.webp',
-        'fg': event_dir / 'fg.webp',
-    }
+@functools.lru_cache(maxsize=4096)
+def blend_tables(color: tuple[int, int, int], alpha: int) -> tuple[bytes, bytes, bytes, bytes]:
+    # blend_at with a fixed source: every output channel depends only on the same
+    # destination channel, so it reduces to four 256-entry translation tables.
+    inv = 255 - alpha
+    return (
+        bytes((color[0] * alpha + d * inv) // 255 for d in range(256)),
+        bytes((color[1] * alpha + d * inv) // 255 for d in range(256)),
+        bytes((color[2] * alpha + d * inv) // 255 for d in range(256)),
+        bytes(alpha + d * inv // 255 for d in range(256)),
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def over_tables(color: tuple[int, int, int], alpha: int) -> tuple[bytes, bytes, bytes]:
+    # blend_over onto opaque pixels: dw = 255 - alpha and out_a stays 255.
+    inv = 255 - alpha
+    return tuple(bytes((2 * (c * alpha + d * inv) + 255) // 510 for d in range(256)) for c in color)
+
+
+def over_pixels(data: bytearray, start: int, end: int, color: tuple[int, int, int], alphas: bytes) -> None:
+    """blend_over for pixels [start, end) with per-pixel alphas, one channel slice at a time."""
+    i, j = start * 4, end * 4
+    keep = map(operator.sub, repeat(255), alphas)
+    dw = list(map(MUL_TABLE.__getitem__, map(operator.or_, map(operator.lshift, data[i + 3:j:4], repeat(8)), keep)))
+    oa = list(map(operator.add, alphas, dw))
+    den = list(map(operator.mul, oa, repeat(2)))
+    for c in range(3):
+        num = map(operator.add, map(operator.mul, repeat(color[c]), alphas), map(operator.mul, data[i + c:j:4], dw))
+        data[i + c:j:4] = bytes(map(operator.floordiv, map(operator.add, map(operator.mul, num, repeat(2)), oa), den))
+    data[i + 3:j:4] = bytes(oa)
+
 
-    if not overwrite and all(p.exists() for p in targets.values()):
+def blend_run(
+    data: bytearray, start: int, end: int, color: tuple[int, int, int], alpha: int, over: bool = False
+) -> None:
+    """Composite a constant-alpha run of pixels [start, end) of a flat RGBA buffer."""
+    if alpha <= 0 or start >= end:
+        return
+    i, j = start * 4, end * 4
+    if over:
+        coverage = data[i + 3:j:4]
+        if coverage.count(0) == len(coverage):
+            data[i:j] = bytes((*color, alpha)) * len(coverage)
+        elif coverage.count(255) == len(coverage):
+            for c, table in enumerate(over_tables(color, alpha)):
+                data[i + c:j:4] = data[i + c:j:4].translate(table)
+        else:
+            over_pixels(data, start, end, color, bytes((alpha,)) * len(coverage))
         return
+    tables = blend_tables(color, alpha)
+    for c in range(4):
+        data[i + c:j:4] = data[i + c:j:4].translate(tables[c])
 
-    bg = make_background(event_id, visual)
-    mid = make_mid(event_id, visual)
-    fg = make_fg(event_id, visual)
 
-    to_webp(cwebp_bin, bg, targets['bg'])
-    to_webp(cwebp_bin, mid, targets['mid'])
-    to_webp(cwebp_bin, fg, targets['fg'])
+def blend_alphas(
+    data: bytearray, start: int, alphas: Iterable[int], color: tuple[int, int, int], over: bool = False
+) -> None:
+    """Composite consecutive pixels from start with per-pixel alphas.
 
+    Uncovered stretches are skipped, constant ones go through blend_run, and
+    varying ones are blended a channel slice at a time.
+    """
+    for covered, run in itertools.groupby(bytes(alphas), key=bool):
+        run = bytes(run)
+        end = start + len(run)
+        if covered and run.count(run[0]) == len(run):
+            blend_run(data, start, end, color, run[0], over)
+        elif covered and over:
+            over_pixels(data, start, end, color, run)
+        elif covered:
+            i, j = start * 4, end * 4
+            inv = [255 - a for a in run]
+            for c in range(3):
+                mixed = map(operator.add, map(operator.mul, repeat(color[c]), run), map(operator.mul, data[i + c:j:4], inv))
+                data[i + c:j:4] = bytes(map(operator.floordiv, mixed, repeat(255)))
+            kept = map(operator.floordiv, map(operator.mul, data[i + 3:j:4], inv), repeat(255))
+            data[i + 3:j:4] = bytes(map(operator.add, run, kept))
+        start = end
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description='Generate cinematic scene assets')
-    parser.add_argument(
-        '--events',
-        nargs='*',
-        help='Event ids to generate. Default: migration set of 15 events.',
-    )
-    parser.add_argument('--all', action='store_true', help='Generate all 18 events')
-    parser.add_argument('--overwrite', action='store_true', help='Overwrite existing assets')
-    return parser.parse_args()
 
+def convex_span(inside: Callable[[int], bool], center: float, half: float, lo: int, hi: int) -> tuple[int, int]:
+    """The [a, b) run of x in [lo, hi) where inside(x) holds, for a predicate true on one interval.
 
-def main() -> int:
-    args = parse_args()
+    center +/- half is the analytic estimate; the exact predicate then moves each
+    end by the pixel or two float rounding can shift it.
+    """
+    a = max(lo, math.ceil(center - half))
+    b = min(hi, math.floor(center + half) + 1)
+    while a < b and not inside(a):
+        a += 1
+    while a > lo and inside(a - 1):
+        a -= 1
+    while b > a and not inside(b - 1):
+        b -= 1
+    while b < hi and inside(b):
+        b += 1
+    return a, max(a, b)
 
-    if args.all:
-        event_ids = list(EVENTS.keys())
-    elif args.events:
-        event_ids = args.events
-    else:
-        event_ids = MIGRATION_EVENTS
 
-    cwebp_bin = find_cwebp()
-    try:
-        subprocess.run([cwebp_bin, '-version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as exc:
-        print(f'Unable to execute cwebp via {cwebp_bin}: {exc}', file=sys.stderr)
-        return 1
+class SpanRaster(PythonRaster):
+    """Stdlib engine: shapes split into per-scanline runs blended with bulk slice translation.
 
-    for event_id in event_ids:
-        generate_event(event_id, cwebp_bin, args.overwrite)
+    Constant-alpha runs go through blend_tables in one bytes.translate per
+    channel; only feather bands work per pixel. Full-frame passes evaluate the
+    reference per-pixel expressions a row at a time through operator/map
+    chains, which keeps the arithmetic identical while leaving the loop in C.
+    Output is byte-identical to PythonRaster.
+    """
+
+    def __init__(
+        self,
+        width: int = W,
+        blend: str = 'over',
+        particles: str = 'sparse',
+        band: tuple[int, int] | None = None,
+    ) -> None:
+        super().__init__(width, blend, particles, band)
+        self.over = blend == 'over'
+
+    def _plane(self, key: tuple[object, ...], fmt: str, build: Callable[[int, int, range], object]) -> memoryview:
+        # Planes cover just this raster's rows, so bands are cached (and evicted) independently.
+        w, h, rows = self.w, self.h, self.rows
+        return FIELDS.get((key[0], 'stdlib', w, h, rows.start, rows.stop, *key[1:]), fmt, lambda: build(w, h, rows))
+
+    @profiled
+    def fill_gradient(self, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
+        self.mark(0, 0, self.w, self.h)
+        self.data[:] = self._plane(
+            ('gradient', top, bottom), 'B', lambda w, h, rows: gradient_plane(w, h, top, bottom, rows)
+        )
+
+    @profiled
+    def add_glow(self, highlight: tuple[int, int, int]) -> None:
+        self.mark(0, 0, self.w, self.h)
+        w, data = self.w, self.data
+        plane = self._plane(('glow',), 'd', glow_plane)
+        for y in range(len(self.rows)):
+            glow = plane[y * w:(y + 1) * w].tolist()
+            i, j = y * w * 4, (y + 1) * w * 4
+            for c, k in enumerate((0.18, 0.12, 0.1)):
+                lift = map(operator.mul, map(operator.mul, repeat(highlight[c]), glow), repeat(k))
+                # Glow only adds, so clamp() reduces to the upper bound.
+                lit = map(int, map(operator.add, data[i + c:j:4], lift))
+                data[i + c:j:4] = bytes(map(min, repeat(255), lit))
+
+    @profiled
+    def add_grain(self, amount: int, seed: int) -> None:
+        self.mark(0, 0, self.w, self.h)
+        w, data = self.w, self.data
+        xterms = [x * 374761393 for x in range(w)]
+        # clamp(v + delta) as one translation table per delta value.
+        shifts = {d: bytes(clamp(v + d) for v in range(256)) for d in range(-amount, amount + 1)}
+        for y in self.rows:
+            # hash_noise, one step per map; the row term is shared by every pixel.
+            n = list(map(operator.add, xterms, repeat(y * 668265263 + seed * 2147483647)))
+            n = list(map(operator.mul, map(operator.xor, n, map(operator.rshift, n, repeat(13))), repeat(1274126177)))
+            n = map(operator.xor, n, map(operator.rshift, n, repeat(16)))
+            noise = map(operator.truediv, map(operator.and_, n, repeat(0xFFFFFFFF)), repeat(0xFFFFFFFF))
+            deltas = map(int, map(operator.mul, map(operator.sub, noise, repeat(0.5)), repeat(amount)))
+            tables = list(map(shifts.__getitem__, deltas))
+            i, j = (y - self.top) * w * 4, (y - self.top + 1) * w * 4
+            for c in range(3):
+                data[i + c:j:4] = bytes(map(operator.getitem, tables, data[i + c:j:4]))
+
+    @profiled
+    def add_vignette(self, strength: float = 0.48) -> None:
+        self.mark(0, 0, self.w, self.h)
+        w, h, top, data = self.w, self.h, self.top, self.data
+        plane = self._plane(('vignette', strength), 'd', lambda w, h, rows: vignette_plane(w, h, strength, rows))
+        cx = w * 0.5
+        cy = h * 0.52
+        max_d = math.sqrt((w * 0.62) ** 2 + (h * 0.62) ** 2)
+        for y in self.rows:
+            dy = y - cy
+            row = plane[(y - top) * w:(y - top + 1) * w]
+            # Inside 0.34 of the radius the factor is exactly 1.0; skip that run.
+            half = math.sqrt(max(0.0, (0.34 * max_d) ** 2 - dy * dy))
+            a, b = convex_span(lambda x: row[x] == 1.0, cx, half, 0, w)
+            for x0, x1 in ((0, a), (b, w)):
+                if x0 >= x1:
+                    continue
+                factors = row[x0:x1]
+                i, j = ((y - top) * w + x0) * 4, ((y - top) * w + x1) * 4
+                for c in range(3):
+                    data[i + c:j:4] = bytes(map(int, map(operator.mul, data[i + c:j:4], factors)))
+
+    @profiled
+    def add_ember_haze(self) -> None:
+        w, h = self.w, self.h
+        y_start = int(h * 0.58)
+        self.mark(0, y_start, w, h)
+        cols = [x / w * 12 for x in range(w)]
+        for y in range(max(y_start, self.top), self.bottom):
+            ny = (y - h * 0.78) / (h * 0.24)
+            wave = map(math.sin, map(operator.add, cols, repeat(ny * 5)))
+            a = map(operator.add, repeat(62 * (1 - abs(ny))), map(operator.mul, repeat(18), wave))
+            alphas = map(min, repeat(92), map(int, map(max, repeat(0.0), a)))
+            blend_alphas(self.data, (y - self.top) * w, alphas, (192, 104, 76), self.over)
+
+    def _ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        min_x, min_y, end_x, end_y = self.clip(*ellipse_bounds(cx, cy, rx, ry, feather, self.w, self.h))
+        self.mark(min_x, min_y, end_x, end_y)
+        edge = 1 + feather
+        for y in range(min_y, end_y):
+            ny = (y - cy) / ry
+
+            def dist(x: int) -> float:
+                nx = (x - cx) / rx
+                return nx * nx + ny * ny
+
+            ny2 = ny * ny
+            oa, ob = convex_span(lambda x: dist(x) <= edge, cx, rx * math.sqrt(max(0.0, edge - ny2)), min_x, end_x)
+            if oa >= ob:
+                continue
+            ia, ib = convex_span(lambda x: dist(x) <= 1, cx, rx * math.sqrt(max(0.0, 1 - ny2)), oa, ob)
+            if ia >= ib:
+                ia = ib = ob
+            row = (y - self.top) * self.w
+            for x0, x1 in ((oa, ia), (ib, ob)):
+                # Band pixels have d <= 1 + feather, so the falloff never drops below -1 / alpha
+                # and int() already truncates it to the 0 that max(0.0, ...) would give.
+                nxs = list(map(operator.truediv, map(operator.sub, range(x0, x1), repeat(cx)), repeat(rx)))
+                d = map(operator.add, map(operator.mul, nxs, nxs), repeat(ny2))
+                falloff = map(operator.truediv, map(operator.sub, d, repeat(1)), repeat(feather))
+                alphas = map(int, map(operator.mul, repeat(alpha), map(operator.sub, repeat(1.0), falloff)))
+                blend_alphas(self.data, row + x0, alphas, color, self.over)
+            blend_run(self.data, row + ia, row + ib, color, alpha, self.over)
+
+    def _rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 10,
+    ) -> None:
+        min_x, min_y, end_x, end_y = self.clip(*rect_bounds(x0, y0, x1, y1, feather, self.w, self.h))
+        self.mark(min_x, min_y, end_x, end_y)
+        scale = max(1, feather)
+        center, width = (x0 + x1) / 2, (x1 - x0) / 2
+        for y in range(min_y, end_y):
+            dy = max(y0 - y, 0, y - y1)
+            if dy > feather:
+                continue
+
+            def dx(x: int) -> float:
+                return max(x0 - x, 0, x - x1)
+
+            # Where dx <= dy the distance is dy, so the row's core run has one alpha.
+            oa, ob = convex_span(lambda x: dx(x) <= feather, center, width + feather, min_x, end_x)
+            ia, ib = convex_span(lambda x: dx(x) <= dy, center, width + dy, oa, ob)
+            if ia >= ib:
+                ia = ib = ob
+            row = (y - self.top) * self.w
+            for xa, xb in ((oa, ia), (ib, ob)):
+                alphas = (int(alpha * (1 - dx(x) / scale)) for x in range(xa, xb))
+                blend_alphas(self.data, row + xa, alphas, color, self.over)
+            blend_run(self.data, row + ia, row + ib, color, int(alpha * (1 - dy / scale)), self.over)
+
+    def _segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float,
+    ) -> None:
+        boxes = [self.clip(*segment_bounds(*segment, rx, ry, feather, self.w, self.h)) for segment in segments]
+        live = [(segment, box) for segment, box in zip(segments, boxes) if box[0] < box[2] and box[1] < box[3]]
+        if not live:
+            return
+        for _, box in live:
+            self.mark(*box)
+        min_x, min_y = min(b[0] for _, b in live), min(b[1] for _, b in live)
+        end_x, end_y = max(b[2] for _, b in live), max(b[3] for _, b in live)
+        reach = math.sqrt(1 + feather)
+        for y in range(min_y, end_y):
+            coverage = bytearray(end_x - min_x)
+            for (x0, y0, x1, y1), box in live:
+                if not box[1] <= y < box[3]:
+                    continue
+                # Same distance as draw_soft_segments, evaluated only along the feather band.
+                ux = (x1 - x0) / rx
+                uy = (y1 - y0) / ry
+                ll = ux * ux + uy * uy
+                py = (y - y0) / ry
+                if uy == 0:
+                    if abs(py) > reach:
+                        continue
+                    t_lo, t_hi = 0.0, 1.0
+                else:
+                    t_lo, t_hi = sorted(((py - reach) / uy, (py + reach) / uy))
+                    t_lo, t_hi = max(0.0, t_lo), min(1.0, t_hi)
+                    if t_lo > t_hi:
+                        continue
+                span_lo = x0 + (min(t_lo * ux, t_hi * ux) - reach) * rx
+                span_hi = x0 + (max(t_lo * ux, t_hi * ux) + reach) * rx
+                lo, hi = max(box[0], int(span_lo) - 1), min(box[2], int(span_hi) + 2)
+
+                def dist(x: int) -> float:
+                    px = (x - x0) / rx
+                    t = min(1.0, max(0.0, (px * ux + py * uy) / ll)) if ll else 0.0
+                    ex = px - t * ux
+                    ey = py - t * uy
+                    return ex * ex + ey * ey
+
+                oa, ob = convex_span(lambda x: dist(x) <= 1 + feather, (lo + hi) / 2, (hi - lo) / 2, lo, hi)
+                ia, ib = convex_span(lambda x: dist(x) <= 1, (oa + ob) / 2, (ob - oa) / 2, oa, ob)
+                if ia >= ib:
+                    ia = ib = ob
+                # The core already holds the highest coverage any segment can give.
+                coverage[ia - min_x:ib - min_x] = bytes((alpha,)) * (ib - ia)
+                for x in itertools.chain(range(oa, ia), range(ib, ob)):
+                    d = dist(x)
+                    a = alpha if d <= 1 else int(alpha * max(0.0, 1.0 - (d - 1) / feather))
+                    if a > coverage[x - min_x]:
+                        coverage[x - min_x] = a
+            blend_alphas(self.data, (y - self.top) * self.w + min_x, coverage, color, self.over)
+
+
+def hash_noise_array(xs, ys, seed: int):
+    # uint64 wraparound keeps the low 48 bits exact, which is all the final mask reads.
+    n = xs.astype(np.uint64) * np.uint64(374761393) + ys.astype(np.uint64) * np.uint64(668265263)
+    n += np.uint64(seed * 2147483647)
+    n = (n ^ (n >> np.uint64(13))) * np.uint64(1274126177)
+    n ^= n >> np.uint64(16)
+    return (n & np.uint64(0xFFFFFFFF)).astype(np.float64) / 0xFFFFFFFF
+
+
+class NumpyRaster(Raster):
+    """Array engine: an HxWx4 uint8 array composited one masked region at a time."""
+
+    def __init__(
+        self,
+        width: int = W,
+        blend: str = 'over',
+        particles: str = 'sparse',
+        band: tuple[int, int] | None = None,
+    ) -> None:
+        super().__init__(width, blend, particles, band)
+        self.data = np.zeros((len(self.rows), self.w, 4), dtype=np.uint8)
+
+    def _occupied(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int]:
+        alpha = self.data[y0 - self.top:y1 - self.top, x0:x1, 3]
+        rows = np.flatnonzero(alpha.any(axis=1))
+        if rows.size == 0:
+            return (0, 0, 0, 0)
+        cols = np.flatnonzero(alpha.any(axis=0))
+        return (x0 + int(cols[0]), y0 + int(rows[0]), x0 + int(cols[-1]) + 1, y0 + int(rows[-1]) + 1)
+
+    def _crop(self, x0: int, y0: int, x1: int, y1: int) -> bytes:
+        return self.data[y0 - self.top:y1 - self.top, x0:x1].tobytes()
+
+    def _composite(self, y0: int, x0: int, alpha, color: tuple[int, int, int]) -> None:
+        # Vectorized blend over a region; alpha is an int array shaped like the region.
+        h, w = alpha.shape
+        self.mark(x0, y0, x0 + w, y0 + h)
+        region = self.data[y0 - self.top:y0 - self.top + h, x0:x0 + w]
+        sa = alpha.astype(np.int32)
+        rgb = region[..., :3].astype(np.int32)
+        da = region[..., 3].astype(np.int32)
+        mixed, oa = self._mix(rgb, da, sa, color)
+        mask = sa > 0
+        region[..., :3] = np.where(mask[..., None], mixed, rgb)
+        region[..., 3] = np.where(mask, oa, da)
+
+    def _mix(self, rgb, da, sa, color: tuple[int, int, int]):
+        # blend_over or blend_at on int32 arrays; callers mask out sa == 0.
+        src = np.array(color, dtype=np.int32)
+        inv = 255 - sa
+        if self.blend_mode == 'over':
+            dw = (da * inv + 127) // 255
+            oa = sa + dw
+            den = np.maximum(2 * oa, 1)
+            return (2 * (src * sa[..., None] + rgb * dw[..., None]) + oa[..., None]) // den[..., None], oa
+        return (src * sa[..., None] + rgb * inv[..., None]) // 255, sa + da * inv // 255
+
+    def _apply_rgb(self, rgb) -> None:
+        self.mark(0, 0, self.w, self.h)
+        self.data[..., :3] = np.clip(np.trunc(rgb), 0, 255).astype(np.uint8)
+
+    def _ys(self):
+        return np.arange(self.top, self.bottom, dtype=np.float64)
+
+    def _field(self, key: tuple[object, ...], build: Callable[[], object]):
+        # Float planes are built with numpy here, so they are cached apart from the stdlib ones.
+        rows = len(self.rows)
+        key = (key[0], 'numpy', self.w, self.h, self.top, self.bottom, *key[1:])
+        return np.frombuffer(FIELDS.get(key, 'd', build)).reshape(rows, self.w)
+
+    def _glow_plane(self):
+        tx = np.arange(self.w, dtype=np.float64) / self.w
+        ty = self._ys() / self.h
+        return np.exp(-(((tx[None, :] - 0.5) / 0.3) ** 2 + ((ty[:, None] - 0.36) / 0.34) ** 2))
+
+    def _vignette_plane(self, strength: float):
+        dx = np.arange(self.w, dtype=np.float64) - self.w * 0.5
+        dy = self._ys() - self.h * 0.52
+        max_d = math.sqrt((self.w * 0.62) ** 2 + (self.h * 0.62) ** 2)
+        d = np.sqrt(dx[None, :] * dx[None, :] + dy[:, None] * dy[:, None]) / max_d
+        f = np.clip((d - 0.34) / 0.66, 0.0, 1.0)
+        return 1.0 - strength * (f ** 1.4)
+
+    @profiled
+    def fill_gradient(self, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
+        w, h, rows = self.w, self.h, self.rows
+        key = ('gradient', 'stdlib', w, h, rows.start, rows.stop, top, bottom)
+        plane = FIELDS.get(key, 'B', lambda: gradient_plane(w, h, top, bottom, rows))
+        self.mark(0, 0, w, h)
+        self.data[:] = np.frombuffer(plane, dtype=np.uint8).reshape(len(rows), w, 4)
+
+    @profiled
+    def add_glow(self, highlight: tuple[int, int, int]) -> None:
+        glow = self._field(('glow',), self._glow_plane)
+        rgb = self.data[..., :3].astype(np.float64)
+        for c, k in enumerate((0.18, 0.12, 0.1)):
+            rgb[..., c] += highlight[c] * glow * k
+        self._apply_rgb(rgb)
+
+    @profiled
+    def add_grain(self, amount: int, seed: int) -> None:
+        ys, xs = np.mgrid[self.top:self.bottom, 0:self.w]
+        delta = np.trunc((hash_noise_array(xs, ys, seed) - 0.5) * amount)
+        self._apply_rgb(self.data[..., :3] + delta[..., None])
+
+    @profiled
+    def add_vignette(self, strength: float = 0.48) -> None:
+        dark = self._field(('vignette', strength), lambda: self._vignette_plane(strength))
+        self._apply_rgb(self.data[..., :3] * dark[..., None])
+
+    @profiled
+    def add_ember_haze(self) -> None:
+        y_start = max(int(self.h * 0.58), self.top)
+        if y_start >= self.bottom:
+            return
+        ny = (np.arange(y_start, self.bottom, dtype=np.float64) - self.h * 0.78) / (self.h * 0.24)
+        nx = np.arange(self.w, dtype=np.float64) / self.w
+        wave = np.sin(nx[None, :] * 12 + ny[:, None] * 5)
+        a = np.trunc(np.maximum(0.0, 62 * (1 - np.abs(ny[:, None])) + 18 * wave))
+        self._composite(y_start, 0, np.minimum(92, a), (192, 104, 76))
+
+    def _scan(self, y_start: int, step: int, scale: tuple[int, int], seed: int, threshold: float):
+        rows = grid_rows(y_start, step, self.rows)
+        ys, xs = np.mgrid[rows.start:rows.stop:step, 0:self.w:step]
+        hit = hash_noise_array(xs * scale[0], ys * scale[1], seed) > threshold
+        return xs[hit], ys[hit]
+
+    def _specks(
+        self, xs, ys, sprite: tuple[tuple[int, int, float], ...], color: tuple[int, int, int], alpha: int
+    ) -> None:
+        xs = np.asarray(xs, dtype=np.intp)
+        ys = np.asarray(ys, dtype=np.intp)
+        # Specks sit on distinct cells, so within one sprite offset no pixel is written twice.
+        for dx, dy, coverage in sprite:
+            px, py = xs + dx, ys + dy
+            keep = (px >= 0) & (px < self.w) & (py >= self.top) & (py < self.bottom)
+            self._blend_points(px[keep], py[keep], color, int(alpha * coverage))
+
+    def _blend_points(self, xs, ys, color: tuple[int, int, int], alpha: int) -> None:
+        if alpha <= 0 or xs.size == 0:
+            return
+        self.mark(int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+        px = self.data[ys - self.top, xs].astype(np.int32)
+        px[:, :3], px[:, 3] = self._mix(px[:, :3], px[:, 3], np.full(len(px), alpha, dtype=np.int32), color)
+        self.data[ys - self.top, xs] = px
+
+    def _blend(self, x: int, y: int, color: tuple[int, int, int], alpha: int) -> None:
+        if 0 <= x < self.w and self.top <= y < self.bottom:
+            self._blend_points(np.array([x]), np.array([y]), color, alpha)
+
+    def _ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        min_x, min_y, end_x, end_y = self.clip(*ellipse_bounds(cx, cy, rx, ry, feather, self.w, self.h))
+        if min_x >= end_x or min_y >= end_y:
+            return
+
+        nx = (np.arange(min_x, end_x, dtype=np.float64) - cx) / rx
+        ny = (np.arange(min_y, end_y, dtype=np.float64) - cy) / ry
+        d = nx[None, :] * nx[None, :] + ny[:, None] * ny[:, None]
+        edge = np.trunc(alpha * np.maximum(0.0, 1.0 - (d - 1) / feather))
+        a = np.where(d <= 1, alpha, edge)
+        a[d > 1 + feather] = 0
+        self._composite(min_y, min_x, a, color)
+
+    def _segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float,
+    ) -> None:
+        boxes = [self.clip(*segment_bounds(*segment, rx, ry, feather, self.w, self.h)) for segment in segments]
+        live = [(segment, box) for segment, box in zip(segments, boxes) if box[0] < box[2] and box[1] < box[3]]
+        if not live:
+            return
+        min_x, min_y = min(b[0] for _, b in live), min(b[1] for _, b in live)
+        end_x, end_y = max(b[2] for _, b in live), max(b[3] for _, b in live)
+        coverage = np.zeros((end_y - min_y, end_x - min_x), dtype=np.float64)
+        for (x0, y0, x1, y1), (bx0, by0, bx1, by1) in live:
+            ux = (x1 - x0) / rx
+            uy = (y1 - y0) / ry
+            ll = ux * ux + uy * uy
+            px = (np.arange(bx0, bx1, dtype=np.float64) - x0) / rx
+            py = (np.arange(by0, by1, dtype=np.float64) - y0) / ry
+            if ll:
+                t = np.clip((px[None, :] * ux + py[:, None] * uy) / ll, 0.0, 1.0)
+            else:
+                t = np.zeros((py.size, px.size))
+            ex = px[None, :] - t * ux
+            ey = py[:, None] - t * uy
+            d = ex * ex + ey * ey
+            a = np.where(d <= 1, alpha, np.trunc(alpha * np.maximum(0.0, 1.0 - (d - 1) / feather)))
+            a[d > 1 + feather] = 0
+            region = coverage[by0 - min_y:by1 - min_y, bx0 - min_x:bx1 - min_x]
+            np.maximum(region, a, out=region)
+        self._composite(min_y, min_x, coverage, color)
+
+    def _rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 10,
+    ) -> None:
+        min_x, min_y, end_x, end_y = self.clip(*rect_bounds(x0, y0, x1, y1, feather, self.w, self.h))
+        if min_x >= end_x or min_y >= end_y:
+            return
+
+        xs = np.arange(min_x, end_x, dtype=np.float64)
+        ys = np.arange(min_y, end_y, dtype=np.float64)
+        dx = np.maximum(np.maximum(x0 - xs, 0), xs - x1)
+        dy = np.maximum(np.maximum(y0 - ys, 0), ys - y1)
+        d = np.maximum(dx[None, :], dy[:, None])
+        a = np.trunc(alpha * (1 - d / max(1, feather)))
+        a[d > feather] = 0
+        self._composite(min_y, min_x, a, color)
+
+    def tobytes(self) -> bytes:
+        return self.data.tobytes()
+
+
+ENGINES: dict[str, type[Raster]] = {'python': PythonRaster, 'span': SpanRaster}
+if np is not None:
+    ENGINES['numpy'] = NumpyRaster
+
+
+Box = tuple[int, int, int, int]
+
+
+def boxes_meet(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def box_within(inner: Box, outer: Box) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[2] <= outer[2] and inner[3] <= outer[3]
+
+
+@dataclass(frozen=True)
+class Primitive:
+    """One recorded Raster call.
+
+    boxes are the exclusive pixel boxes the call may write: one per stroke for
+    soft_segments, the whole canvas for full-frame passes, none if it cannot
+    change a pixel. core is the region it overwrites with opaque colour, if any.
+    """
+
+    method: str
+    args: tuple[object, ...]
+    boxes: tuple[Box, ...]
+    core: Box | None = None
+
+    def meets(self, other: Primitive) -> bool:
+        return any(boxes_meet(a, b) for a in self.boxes for b in other.boxes)
+
+    def pixels(self) -> int:
+        return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.boxes)
+
+
+class DisplayList:
+    """Scene drawing calls recorded against the Raster API instead of drawn.
+
+    The layer builders take DisplayList as their engine, so a scene is captured
+    once as data, scaled() to any width and replayed onto any engine, blend
+    mode or band. optimize() drops primitives that cannot show (off-canvas,
+    zero alpha, or under a later opaque fill) and merges soft_segments batches
+    of one style that share no pixels; cost() estimates the pixels a replay
+    touches. Every rewrite keeps the replayed bytes identical to drawing the
+    calls directly.
+    """
+
+    def __init__(self, width: int = W) -> None:
+        self.width = width
+        self.w, self.h = canvas_size(width)
+        self.scale = width / W
+        self.ops: list[Primitive] = []
+
+    def _record(self, method: str, args: tuple[object, ...], boxes: Iterable[Box], core: Box | None = None) -> None:
+        boxes = tuple(box for box in boxes if box[0] < box[2] and box[1] < box[3])
+        self.ops.append(Primitive(method, args, boxes, core))
+
+    def _full(self, method: str, *args: object, core: Box | None = None) -> None:
+        self._record(method, args, [(0, 0, self.w, self.h)], core)
+
+    def fill_gradient(self, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
+        self._full('fill_gradient', top, bottom, core=(0, 0, self.w, self.h))
+
+    def add_glow(self, highlight: tuple[int, int, int]) -> None:
+        self._full('add_glow', highlight)
+
+    def add_grain(self, amount: int, seed: int) -> None:
+        self._full('add_grain', amount, seed)
+
+    def add_vignette(self, strength: float = 0.48) -> None:
+        self._full('add_vignette', strength)
+
+    def add_ember_haze(self) -> None:
+        self._full('add_ember_haze')
+
+    def scatter_specks(
+        self,
+        y_start: float,
+        step: int,
+        scale: tuple[int, int],
+        seed: int,
+        threshold: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        size: int = 1,
+    ) -> None:
+        self._full('scatter_specks', y_start, step, scale, seed, threshold, color, alpha, size)
+
+    def soft_ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        s = self.scale
+        box = ellipse_bounds(cx * s, cy * s, rx * s, ry * s, feather, self.w, self.h)
+        self._record('soft_ellipse', (cx, cy, rx, ry, color, alpha, feather), [box] if alpha > 0 else [])
+
+    def soft_rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: int = 10,
+    ) -> None:
+        s = self.scale
+        box = rect_bounds(x0 * s, y0 * s, x1 * s, y1 * s, feather * s, self.w, self.h)
+        core = None
+        if alpha == 255:
+            # Pixels inside the rectangle itself get the full alpha, which replaces what was there.
+            core = (
+                max(0, math.ceil(x0 * s)),
+                max(0, math.ceil(y0 * s)),
+                min(self.w, math.floor(x1 * s) + 1),
+                min(self.h, math.floor(y1 * s) + 1),
+            )
+        self._record('soft_rect', (x0, y0, x1, y1, color, alpha, feather), [box] if alpha > 0 else [], core)
+
+    def soft_line(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(x0, y0, x1, y1)], thickness, color, alpha)
+
+    def soft_polyline(
+        self,
+        points: list[tuple[float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(*a, *b) for a, b in zip(points, points[1:])], thickness, color, alpha)
+
+    def soft_segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        # Keep one box per stroke, in step with the stroke list, so strokes can be culled one at a time.
+        s = self.scale
+        rx, ry = thickness * s, thickness * 0.75 * s
+        strokes = []
+        boxes = []
+        for x0, y0, x1, y1 in segments if alpha > 0 else ():
+            box = segment_bounds(x0 * s, y0 * s, x1 * s, y1 * s, rx, ry, 0.32, self.w, self.h)
+            if box[0] < box[2] and box[1] < box[3]:
+                strokes.append((x0, y0, x1, y1))
+                boxes.append(box)
+        self._record('soft_segments', (strokes, thickness, color, alpha), boxes)
+
+    def blend(self, x: float, y: float, color: tuple[int, int, int], alpha: int) -> None:
+        px, py = int(x * self.scale), int(y * self.scale)
+        visible = alpha > 0 and 0 <= px < self.w and 0 <= py < self.h
+        self._record('blend', (x, y, color, alpha), [(px, py, px + 1, py + 1)] if visible else [])
+
+    def optimize(self) -> DisplayList:
+        """Return an equivalent list with hidden primitives culled and disjoint same-style strokes batched."""
+        kept: list[Primitive] = []
+        cores: list[Box] = []
+        # Walking backwards, a primitive is hidden once a later opaque core covers all it can write.
+        # Every pass is per-pixel, so nothing drawn in between can carry its pixels out from under the core.
+        for op in reversed(self.ops):
+            shown = [i for i, box in enumerate(op.boxes) if not any(box_within(box, core) for core in cores)]
+            if not shown:
+                continue
+            if op.method == 'soft_segments' and len(shown) < len(op.boxes):
+                # A stroke writes only inside its own box, so a batch sheds just the strokes a core hides.
+                strokes = [op.args[0][i] for i in shown]
+                op = Primitive(op.method, (strokes, *op.args[1:]), tuple(op.boxes[i] for i in shown))
+            kept.append(op)
+            if op.core is not None:
+                cores.append(op.core)
+        kept.reverse()
+
+        merged: list[Primitive] = []
+        for op in kept:
+            if op.method == 'soft_segments':
+                for i in range(len(merged) - 1, -1, -1):
+                    other = merged[i]
+                    if other.method == 'soft_segments' and other.args[1:] == op.args[1:] and not other.meets(op):
+                        # No pixel in both batches, so one max-coverage pass blends each pixel exactly once as before.
+                        strokes = other.args[0] + op.args[0]
+                        merged[i] = Primitive('soft_segments', (strokes, *op.args[1:]), other.boxes + op.boxes)
+                        break
+                    if other.meets(op):
+                        # Drawing order is only free between primitives that share no pixels.
+                        merged.append(op)
+                        break
+                else:
+                    merged.append(op)
+            else:
+                merged.append(op)
+
+        optimized = DisplayList(self.width)
+        optimized.ops = merged
+        return optimized
+
+    def scaled(self, width: int) -> DisplayList:
+        """Return the same calls recorded at another width.
+
+        Arguments are in design coordinates, so only the boxes change; the
+        calls are issued again rather than rescaled, to round exactly as a
+        recording made at that width does.
+        """
+        if width == self.width:
+            return self
+        scaled = DisplayList(width)
+        for op in self.ops:
+            getattr(scaled, op.method)(*op.args)
+        return scaled
+
+    def without(self, methods: Iterable[str]) -> DisplayList:
+        """Return a copy with every call to the given methods dropped."""
+        methods = set(methods)
+        stripped = DisplayList(self.width)
+        stripped.ops = [op for op in self.ops if op.method not in methods]
+        return stripped
+
+    def cost(self) -> int:
+        """Pixels the primitives may write: the scheduling weight of a layer."""
+        return sum(op.pixels() for op in self.ops)
+
+    def replay(self, canvas: Raster) -> Raster:
+        """Issue the recorded calls on canvas, skipping strokes and shapes outside its band."""
+        top, bottom = canvas.top, canvas.bottom
+        for op in self.ops:
+            if not any(y0 < bottom and top < y1 for _, y0, _, y1 in op.boxes):
+                continue
+            args = op.args
+            if op.method == 'soft_segments':
+                strokes = [s for s, (_, y0, _, y1) in zip(args[0], op.boxes) if y0 < bottom and top < y1]
+                args = (strokes, *args[1:])
+            getattr(canvas, op.method)(*args)
+        return canvas
+
+
+def svg_number(v: float) -> str:
+    # Tenths of a pixel are below what a browser's antialiasing can show.
+    text = f'{v:.1f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def svg_color(color: tuple[int, int, int]) -> str:
+    return '#{:02x}{:02x}{:02x}'.format(*(clamp(c) for c in color))
+
+
+def svg_fraction(v: float) -> str:
+    text = f'{v:.3f}'.rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def svg_opacity(alpha: float) -> str:
+    return svg_fraction(min(1.0, max(0.0, alpha / 255)))
+
+
+class SvgCanvas:
+    """Replay target that writes a layer as SVG elements instead of pixels.
+
+    Takes the same calls as a Raster, in W x H design coordinates, so a
+    layer's display list replays onto it unchanged. Feathered shapes become
+    radial gradients, linear ramps and blur filters, and the full-frame passes
+    become gradient overlays. Grain and the ember haze's ripple are per-pixel
+    noise with no vector form: grain is drawn from feTurbulence instead, the
+    ripple is dropped, and both are listed in `approximated` so a report can
+    say which layers only resemble their raster. Specks keep the raster's
+    positions, as one path of dots.
+    """
+
+    def __init__(self, particles: str = 'sparse') -> None:
+        if particles not in PARTICLE_MODES:
+            raise ValueError(f'Unknown particle mode: {particles}')
+        self.w, self.h = W, H
+        self.top, self.bottom = 0, H
+        self.particles = particles
+        self.defs: dict[str, tuple[str, str]] = {}
+        self.elements: list[str] = []
+        self.approximated: set[str] = set()
+
+    def _define(self, kind: str, body: str, **attrs: str) -> str:
+        # Identical definitions are shared; ids are short because every use repeats one.
+        key = f'{kind} {sorted(attrs.items())} {body}'
+        if key not in self.defs:
+            ref = f'{kind[0]}{len(self.defs)}'
+            opening = ' '.join(f'{name.replace("_", "-")}="{value}"' for name, value in {'id': ref, **attrs}.items())
+            self.defs[key] = (ref, f'<{kind} {opening}>{body}</{kind}>')
+        return self.defs[key][0]
+
+    def _gradient(self, kind: str, stops: Iterable[tuple[float, tuple[int, int, int], float]], **attrs: str) -> str:
+        body = ''.join(
+            f'<stop offset="{svg_fraction(offset)}" stop-color="{svg_color(color)}" '
+            f'stop-opacity="{svg_opacity(alpha)}"/>'
+            for offset, color, alpha in stops
+        )
+        return f'url(#{self._define(kind, body, **attrs)})'
+
+    def _blur(self, deviation: float) -> str:
+        # One filter region over the whole canvas serves every shape, whatever its size.
+        body = f'<feGaussianBlur stdDeviation="{svg_number(deviation)}"/>'
+        region = {'x': '-10%', 'y': '-10%', 'width': '120%', 'height': '120%'}
+        ref = self._define('filter', body, filterUnits='userSpaceOnUse', **region)
+        return f'url(#{ref})'
+
+    def _full(self, fill: str, extra: str = '') -> None:
+        self.elements.append(f'<rect width="{self.w}" height="{self.h}" fill="{fill}"{extra}/>')
+
+    def fill_gradient(self, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> None:
+        self._full(self._gradient('linearGradient', [(0, top, 255), (1, bottom, 255)], x2='0', y2='1'))
+
+    def add_glow(self, highlight: tuple[int, int, int]) -> None:
+        # A Gaussian added per channel: plus-lighter adds the stop colour scaled by exp(-t^2), out to t = 3.
+        color = (highlight[0] * 0.18, highlight[1] * 0.12, highlight[2] * 0.1)
+        stops = [(t / 3, color, 255 * math.exp(-t * t)) for t in (0, 0.5, 1, 1.5, 2, 3)]
+        sx, sy, cx, cy = (svg_number(v) for v in (self.w * 0.9, self.h * 1.02, self.w * 0.5, self.h * 0.36))
+        transform = f'matrix({sx} 0 0 {sy} {cx} {cy})'
+        fill = self._gradient(
+            'radialGradient', stops, gradientUnits='userSpaceOnUse', cx='0', cy='0', r='1', gradientTransform=transform
+        )
+        self._full(fill, ' style="mix-blend-mode:plus-lighter"')
+
+    def add_grain(self, amount: int, seed: int) -> None:
+        # Grey turbulence centred on zero, added to everything drawn so far.
+        k = amount / 255
+        body = (
+            f'<feTurbulence type="fractalNoise" baseFrequency=".9" seed="{seed}"/>'
+            '<feColorMatrix values="1 0 0 0 0 1 0 0 0 0 1 0 0 0 0 0 0 0 0 1"/>'
+            '<feComposite in="SourceGraphic" operator="arithmetic" '
+            f'k2="1" k3="{svg_fraction(k)}" k4="{svg_fraction(-k / 2)}"/>'
+        )
+        region = {'x': '0', 'y': '0', 'width': str(self.w), 'height': str(self.h)}
+        grain = self._define('filter', body, filterUnits='userSpaceOnUse', color_interpolation_filters='sRGB', **region)
+        self.elements = [f'<g filter="url(#{grain})">', *self.elements, '</g>']
+        self.approximated.add('grain')
+
+    def add_vignette(self, strength: float = 0.48) -> None:
+        # Darkening by 1 - strength * f^1.4 is black drawn over at that alpha.
+        reach = math.sqrt((self.w * 0.62) ** 2 + (self.h * 0.62) ** 2)
+        stops = [(0.34 + 0.66 * f, (0, 0, 0), 255 * strength * f ** 1.4) for f in (0, 0.2, 0.4, 0.6, 0.8, 1)]
+        cx, cy, r = svg_number(self.w * 0.5), svg_number(self.h * 0.52), svg_number(reach)
+        fill = self._gradient('radialGradient', stops, gradientUnits='userSpaceOnUse', cx=cx, cy=cy, r=r)
+        self._full(fill)
+
+    def add_ember_haze(self) -> None:
+        # The haze peaks at 0.78 h and fades linearly either side; its ripple has no vector form.
+        color = (192, 104, 76)
+        stops = [(0, color, 62 * (1 - 0.2 / 0.24)), (0.2 / 0.42, color, 62), (1, color, 62 * (1 - 0.22 / 0.24))]
+        fill = self._gradient('linearGradient', stops, x2='0', y2='1')
+        y = int(self.h * 0.58)
+        self.elements.append(f'<rect y="{y}" width="{self.w}" height="{self.h - y}" fill="{fill}"/>')
+        self.approximated.add('ember haze')
+
+    def scatter_specks(
+        self,
+        y_start: float,
+        step: int,
+        scale: tuple[int, int],
+        seed: int,
+        threshold: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        size: int = 1,
+    ) -> None:
+        if self.particles == 'scan':
+            xs, ys = scan_specks(self.w, self.h, int(y_start), step, scale, seed, threshold)
+        else:
+            xs, ys = emit_specks(self.w, self.h, int(y_start), step, seed, threshold)
+        if not xs:
+            return
+        # Zero-length subpaths drawn with a cap: a square one pixel wide, or a round speck of the sprite's size.
+        moves = [f'M{xs[0]}.5 {ys[0]}.5h0']
+        moves += [f'm{x - px} {y - py}h0' for px, py, x, y in zip(xs, ys, xs[1:], ys[1:])]
+        cap = 'square' if size <= 1 else 'round'
+        self.elements.append(
+            f'<path d="{"".join(moves)}" stroke="{svg_color(color)}" stroke-width="{size}" '
+            f'stroke-linecap="{cap}" opacity="{svg_opacity(alpha)}"/>'
+        )
+
+    def soft_ellipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: float = 0.24,
+    ) -> None:
+        if alpha <= 0:
+            return
+        # Full alpha out to the ellipse, then fading linearly in squared distance up to 1 + feather.
+        reach = math.sqrt(1 + feather)
+        stops = [(0, color, alpha)]
+        for i in range(5):
+            d = 1 + feather * i / 4
+            stops.append((math.sqrt(d) / reach, color, alpha * (1 - (d - 1) / feather)))
+        fill = self._gradient('radialGradient', stops)
+        self.elements.append(
+            f'<ellipse cx="{svg_number(cx)}" cy="{svg_number(cy)}" rx="{svg_number(rx * reach)}" '
+            f'ry="{svg_number(ry * reach)}" fill="{fill}"/>'
+        )
+
+    def soft_rect(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        color: tuple[int, int, int],
+        alpha: int,
+        feather: int = 10,
+    ) -> None:
+        if alpha <= 0:
+            return
+        # The raster ramps over feather px outside the edges, half alpha at feather / 2; a blur of
+        # deviation feather / sqrt(2 pi) on that midline rectangle has the same slope there.
+        half = feather / 2
+        filter_attr = f' filter="{self._blur(feather / math.sqrt(2 * math.pi))}"' if feather > 0 else ''
+        self.elements.append(
+            f'<rect x="{svg_number(x0 - half)}" y="{svg_number(y0 - half)}" width="{svg_number(x1 - x0 + feather)}" '
+            f'height="{svg_number(y1 - y0 + feather)}" fill="{svg_color(color)}" '
+            f'opacity="{svg_opacity(alpha)}"{filter_attr}/>'
+        )
+
+    def soft_line(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(x0, y0, x1, y1)], thickness, color, alpha)
+
+    def soft_polyline(
+        self,
+        points: list[tuple[float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        self.soft_segments([(*a, *b) for a, b in zip(points, points[1:])], thickness, color, alpha)
+
+    def soft_segments(
+        self,
+        segments: list[tuple[float, float, float, float]],
+        thickness: float,
+        color: tuple[int, int, int],
+        alpha: int,
+    ) -> None:
+        if alpha <= 0 or not segments:
+            return
+        # The raster's pen is a thickness x 0.75 thickness ellipse whose falloff reaches half alpha at
+        # about 1.08 radii; a round pen of that mean width, and strokes joined into one path drawn
+        # at the batch opacity, so overlaps keep the strongest coverage just as the raster does.
+        d = []
+        end = None
+        for x0, y0, x1, y1 in segments:
+            if (x0, y0) != end:
+                d.append(f'M{svg_number(x0)} {svg_number(y0)}')
+            d.append(f'L{svg_number(x1)} {svg_number(y1)}')
+            end = (x1, y1)
+        width = 2 * thickness * math.sqrt(0.75) * 1.08
+        self.elements.append(
+            f'<path d="{"".join(d)}" fill="none" stroke="{svg_color(color)}" stroke-width="{svg_number(width)}" '
+            f'stroke-linecap="round" stroke-linejoin="round" opacity="{svg_opacity(alpha)}"/>'
+        )
+
+    def blend(self, x: float, y: float, color: tuple[int, int, int], alpha: int) -> None:
+        if alpha > 0:
+            self.elements.append(
+                f'<rect x="{int(x)}" y="{int(y)}" width="1" height="1" fill="{svg_color(color)}" '
+                f'opacity="{svg_opacity(alpha)}"/>'
+            )
+
+    def document(self) -> str:
+        defs = f'<defs>{"".join(markup for _, markup in self.defs.values())}</defs>\n' if self.defs else ''
+        body = '\n'.join(self.elements)
+        return f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {self.w} {self.h}">\n{defs}{body}\n</svg>\n'
+
+
+def raster_factory(engine_name: str, blend: str, particles: str = 'sparse') -> Callable[[int], Raster]:
+    return functools.partial(resolve_engine(engine_name), blend=blend, particles=particles)
+
+
+def resolve_engine(name: str) -> type[Raster]:
+    if name == 'auto':
+        return ENGINES.get('numpy', SpanRaster)
+    if name not in ENGINES:
+        raise ValueError(f'Raster engine unavailable: {name}')
+    return ENGINES[name]
+
+
+def stable_seed(*parts: str) -> int:
+    # hash() is salted per process (PYTHONHASHSEED); derive seeds from a digest instead.
+    digest = hashlib.sha256(':'.join(parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def layer_rng(event_id: str, layer: str) -> random.Random:
+    return random.Random(stable_seed(event_id, layer))
+
+
+def make_background(
+    event_id: str, visual: EventVisual, engine: Callable[[int], Raster] = PythonRaster, width: int = W
+) -> Raster:
+    palette = PALETTES[visual.profile]
+    rng = layer_rng(event_id, 'bg')
+    canvas = engine(width)
+    canvas.fill_gradient(palette['top'], palette['bottom'])
+
+    # Atmosphere glow
+    canvas.add_glow(palette['highlight'])
+
+    if visual.profile == PROFILE_BATTLE:
+        # Horizon + smoke layers
+        for band in range(4):
+            y0 = H * (0.58 + band * 0.07)
+            canvas.soft_line(0, y0, W, y0 + rng.uniform(-25, 25), 7 + band * 2, palette['shadow'], 95 - band * 10)
+        # Subtle fire glows
+        for x in (180, 500, 920, 1320):
+            canvas.soft_ellipse(x, H * 0.74, 200, 70, palette['highlight'], 45, 0.42)
+
+    elif visual.profile == PROFILE_CEREMONY:
+        # Column shafts
+        for cx in (220, 520, 820, 1120, 1420):
+            canvas.soft_rect(cx - 36, 0, cx + 36, H, palette['shadow'], 80, feather=30)
+            canvas.soft_rect(cx - 16, 0, cx + 16, H, palette['highlight'], 35, feather=20)
+        canvas.soft_ellipse(W * 0.5, H * 0.24, 360, 180, palette['highlight'], 60, 0.35)
+
+    elif visual.profile == PROFILE_COLLAPSE:
+        # fractured walls
+        for i in range(7):
+            x = 100 + i * 220
+            canvas.soft_rect(x, H * 0.56 + (i % 2) * 30, x + 120, H * 0.85, palette['shadow'], 90, 18)
+        # cracks
+        cracks = []
+        for i in range(8):
+            x0 = rng.randint(120, W - 120)
+            y0 = rng.randint(int(H * 0.55), int(H * 0.85))
+            cracks.append((x0, y0, x0 + rng.randint(-90, 90), y0 + rng.randint(60, 130)))
+        canvas.soft_segments(cracks, 2.2, (125, 84, 66), 110)
+
+    elif visual.profile == PROFILE_MAP:
+        # parchment bands + cartography lines
+        bands = [(80, y, W - 80, y + rng.randint(-24, 24)) for y in range(140, H, 110)]
+        canvas.soft_segments(bands, 2.2, (180, 122, 86), 65)
+        routes = []
+        for _ in range(10):
+            x0 = rng.randint(140, W - 140)
+            y0 = rng.randint(120, H - 120)
+            x1 = x0 + rng.randint(-240, 240)
+            y1 = y0 + rng.randint(-160, 160)
+            routes.append((x0, y0, x1, y1))
+        canvas.soft_segments(routes, 1.8, (160, 110, 78), 70)
+
+    canvas.add_grain(10, stable_seed(event_id) % 2000 + 17)
+    canvas.add_vignette(0.5)
+    return canvas
+
+
+def motif_shape(canvas: Raster, motif: str, rng: random.Random) -> None:
+    clay = (188, 162, 136)
+    dark = (92, 70, 56)
+    warm = (206, 147, 99)
+
+    if motif == 'senate-oath':
+        for i in range(6):
+            x = 300 + i * 170
+            canvas.soft_rect(x, 260, x + 74, 760, dark, 210, 16)
+        canvas.soft_rect(560, 560, 1040, 760, clay, 220, 16)
+        canvas.soft_ellipse(800, 460, 72, 92, clay, 230, 0.2)
+        canvas.soft_line(850, 505, 980, 430, 5, clay, 220)
+
+    elif motif == 'burning-city':
+        for i in range(7):
+            x = 130 + i * 190
+            h = rng.randint(180, 280)
+            canvas.soft_rect(x, 720 - h, x + 120, 720, dark, 215, 14)
+        for x in (280, 620, 980, 1280):
+            canvas.soft_ellipse(x, 520, 90, 160, warm, 80, 0.45)
+
+    elif motif == 'elephant-line':
+        canvas.soft_ellipse(710, 560, 250, 110, clay, 220, 0.2)
+        canvas.soft_ellipse(500, 520, 92, 72, clay, 215, 0.2)
+        canvas.soft_rect(900, 520, 1180, 590, clay, 200, 12)
+        for lx in (620, 740, 850, 970):
+            canvas.soft_rect(lx, 620, lx + 36, 790, dark, 215, 10)
+        canvas.soft_segments([(sx, 540, sx + 140, 520) for sx in range(1020, 1450, 70)], 2.8, clay, 185)
+
+    elif motif == 'alpine-march':
+        canvas.soft_line(80, 700, 520, 320, 22, dark, 180)
+        canvas.soft_line(460, 760, 980, 260, 30, dark, 190)
+        canvas.soft_line(920, 760, 1520, 360, 24, dark, 185)
+        for i in range(9):
+            x = 520 + i * 90
+            y = 650 - i * 30
+            canvas.soft_rect(x, y, x + 26, y + 88, clay, 205, 8)
+
+    elif motif == 'encirclement':
+        canvas.soft_ellipse(780, 560, 200, 120, dark, 210, 0.22)
+        canvas.soft_ellipse(820, 560, 320, 200, clay, 120, 0.26)
+        canvas.soft_ellipse(820, 560, 420, 280, clay, 70, 0.28)
+        for a in range(0, 360, 18):
+            x = 820 + math.cos(math.radians(a)) * 420
+            y = 560 + math.sin(math.radians(a)) * 280
+            canvas.soft_ellipse(x, y, 10, 10, warm, 120, 0.2)
+
+    elif motif == 'carthage-ruin':
+        for i in range(6):
+            x = 180 + i * 210
+            canvas.soft_rect(x, 420 + (i % 2) * 30, x + 130, 760, dark, 210, 14)
+        canvas.soft_line(180, 760, 1420, 760, 6, dark, 180)
+        for x in (300, 520, 760, 1040, 1300):
+            canvas.soft_ellipse(x, 560, 95, 145, warm, 85, 0.44)
+
+    elif motif == 'rebel-camp':
+        spears = []
+        for i in range(10):
+            x = 260 + i * 110
+            y = 600 + (i % 3) * 12
+            canvas.soft_ellipse(x, y, 28, 44, dark, 220, 0.2)
+            spears.append((x + 12, y - 22, x + 42, y - 90))
+        canvas.soft_segments(spears, 3, clay, 185)
+        canvas.soft_line(200, 760, 1420, 740, 7, dark, 170)
+
+    elif motif == 'river-crossing':
+        canvas.soft_line(0, 700, 1600, 640, 18, dark, 175)
+        canvas.soft_line(0, 730, 1600, 670, 12, clay, 85)
+        canvas.soft_ellipse(740, 560, 120, 90, clay, 210, 0.2)
+        canvas.soft_rect(700, 620, 900, 670, dark, 200, 10)
+        canvas.soft_line(860, 560, 980, 520, 5, clay, 210)
+
+    elif motif == 'amphitheatre':
+        canvas.soft_ellipse(800, 610, 520, 220, dark, 200, 0.2)
+        canvas.soft_ellipse(800, 610, 410, 150, clay, 150, 0.25)
+        for i in range(16):
+            x = 370 + i * 55
+            canvas.soft_rect(x, 470, x + 34, 690, clay, 180, 8)
+
+    elif motif == 'imperial-map':
+        canvas.soft_rect(320, 500, 1280, 760, dark, 185, 16)
+        canvas.soft_rect(380, 530, 1220, 720, clay, 210, 12)
+        routes = []
+        for _ in range(16):
+            x0 = rng.randint(420, 1160)
+            y0 = rng.randint(560, 690)
+            x1 = x0 + rng.randint(-140, 140)
+            y1 = y0 + rng.randint(-90, 90)
+            routes.append((x0, y0, x1, y1))
+        canvas.soft_segments(routes, 1.8, warm, 130)
+
+    elif motif == 'statue-frontier':
+        canvas.soft_rect(650, 360, 940, 760, clay, 225, 16)
+        canvas.soft_ellipse(790, 300, 84, 98, clay, 235, 0.22)
+        canvas.soft_line(930, 460, 1080, 420, 5, clay, 210)
+        canvas.soft_line(160, 760, 1440, 730, 8, dark, 165)
+
+    elif motif == 'fractured-city':
+        for i in range(7):
+            x = 140 + i * 200
+            h = rng.randint(220, 350)
+            canvas.soft_rect(x, 760 - h, x + 120, 760, dark, 210, 12)
+        cracks = []
+        for _ in range(10):
+            x = rng.randint(180, 1420)
+            y = rng.randint(430, 760)
+            cracks.append((x, y, x + rng.randint(-120, 120), y + rng.randint(40, 130)))
+        canvas.soft_segments(cracks, 2.2, warm, 145)
+
+    elif motif == 'bridge-battle':
+        canvas.soft_line(220, 700, 1380, 700, 16, dark, 185)
+        for i in range(8):
+            x = 280 + i * 140
+            canvas.soft_rect(x, 700, x + 26, 810, dark, 195, 8)
+        for i in range(10):
+            x = 340 + i * 100
+            canvas.soft_ellipse(x, 610 + (i % 2) * 20, 24, 40, clay, 210, 0.2)
+
+    elif motif == 'breach-gates':
+        canvas.soft_rect(420, 360, 1180, 760, dark, 205, 14)
+        canvas.soft_rect(730, 500, 880, 760, (20, 12, 9), 255, 8)
+        for x in (540, 660, 980, 1080):
+            canvas.soft_ellipse(x, 520, 85, 130, warm, 85, 0.4)
+
+    elif motif == 'throne-decline':
+        canvas.soft_rect(520, 560, 1080, 770, dark, 205, 14)
+        canvas.soft_rect(650, 400, 950, 610, clay, 210, 12)
+        canvas.soft_line(980, 440, 1120, 690, 8, dark, 190)
+        canvas.soft_line(640, 760, 1040, 760, 7, clay, 140)
+
+    elif motif == 'senate-fall':
+        for i in range(6):
+            x = 260 + i * 180
+            canvas.soft_rect(x, 230, x + 80, 760, dark, 180, 16)
+        canvas.soft_ellipse(760, 630, 220, 90, clay, 185, 0.24)
+
+    elif motif == 'imperial-statue':
+        canvas.soft_rect(640, 320, 960, 770, clay, 220, 16)
+        canvas.soft_ellipse(800, 260, 84, 100, clay, 230, 0.2)
+
+    elif motif == 'founding':
+        canvas.soft_ellipse(840, 565, 240, 95, dark, 220, 0.2)
+        canvas.soft_ellipse(640, 525, 95, 74, dark, 210, 0.2)
+        for lx in (760, 840, 930, 1010):
+            canvas.soft_rect(lx, 630, lx + 32, 800, dark, 220, 10)
+
+
+def make_mid(
+    event_id: str, visual: EventVisual, engine: Callable[[int], Raster] = PythonRaster, width: int = W
+) -> Raster:
+    canvas = engine(width)
+    motif_shape(canvas, visual.motif, layer_rng(event_id, 'mid'))
+    # Universal relief pass for legibility
+    canvas.soft_ellipse(W * 0.5, H * 0.58, 420, 230, (230, 205, 180), 28, 0.36)
+    return canvas
+
+
+def make_fg(
+    event_id: str, visual: EventVisual, engine: Callable[[int], Raster] = PythonRaster, width: int = W
+) -> Raster:
+    canvas = engine(width)
+
+    if visual.accent == 'embers':
+        canvas.add_ember_haze()
+        canvas.scatter_specks(0, 2, (3, 2), 711 + stable_seed(event_id) % 400, 0.9972, (236, 178, 122), 130)
+
+    elif visual.accent == 'dust':
+        canvas.scatter_specks(int(H * 0.48), 1, (1, 1), 433 + stable_seed(event_id) % 170, 0.992, (182, 145, 112), 70)
+        canvas.soft_ellipse(W * 0.5, H * 0.76, 700, 170, (186, 132, 94), 42, 0.4)
+
+    elif visual.accent == 'laurel':
+        cx, cy = W * 0.5, H * 0.2
+        for k in range(34):
+            a = -2.45 + k * (4.9 / 33)
+            x = cx + math.cos(a) * 180
+            y = cy + math.sin(a) * 88
+            canvas.soft_ellipse(x, y, 14, 8, (188, 143, 61), 120, 0.35)
+        for x in range(220, 1380, 120):
+            canvas.blend(x, 150 + (x // 120) % 3 * 10, (228, 198, 145), 55)
+
+    elif visual.accent == 'steel-glint':
+        for i in range(7):
+            x0 = 180 + i * 210
+            y0 = 680 - i * 14
+            canvas.soft_line(x0, y0, x0 + 220, y0 - 30, 2.4, (226, 201, 155), 95)
+        canvas.soft_line(520, 430, 1260, 430, 3.4, (232, 207, 161), 80)
+
+    else:  # none
+        canvas.scatter_specks(0, 2, (2, 2), 951, 0.9983, (220, 184, 142), 45)
+
+    return canvas
+
+
+def find_cwebp() -> str:
+    env = os.environ.get('CWEBP')
+    if env and Path(env).exists():
+        return env
+    for candidate in ('/opt/homebrew/bin/cwebp', '/usr/local/bin/cwebp'):
+        if Path(candidate).exists():
+            return candidate
+    return 'cwebp'
+
+
+WEBP_QUALITY = 87
+WEBP_ALPHA_QUALITY = 92
+
+
+@dataclass(frozen=True)
+class WebpSettings:
+    """Encoder settings for one layer; the defaults are the fixed settings every layer used to get."""
+
+    quality: int = WEBP_QUALITY
+    alpha_quality: int = WEBP_ALPHA_QUALITY
+    lossless: bool = False
+
+    @classmethod
+    def lossy(cls, quality: int) -> WebpSettings:
+        # Alpha keeps the default's margin over colour quality.
+        return cls(quality, min(100, quality + WEBP_ALPHA_QUALITY - WEBP_QUALITY))
+
+    def cwebp_args(self) -> tuple[str, ...]:
+        if self.lossless:
+            return ('-lossless',)
+        return ('-q', str(self.quality), '-alpha_q', str(self.alpha_quality))
+
+    def pillow_args(self) -> dict[str, object]:
+        if self.lossless:
+            return {'lossless': True}
+        return {'quality': self.quality, 'alpha_quality': self.alpha_quality}
+
+
+DEFAULT_WEBP = WebpSettings()
+CWEBP_ARGS = DEFAULT_WEBP.cwebp_args()
+
+
+def encode_png(cwebp_bin: str, input_path: Path, output_path: Path, settings: WebpSettings = DEFAULT_WEBP) -> None:
+    try:
+        subprocess.run(
+            [cwebp_bin, *settings.cwebp_args(), str(input_path), '-o', str(output_path)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    finally:
+        if input_path.exists():
+            input_path.unlink()
+
+
+def pam_header(w: int, h: int) -> bytes:
+    return f'P7\nWIDTH {w}\nHEIGHT {h}\nDEPTH 4\nMAXVAL 255\nTUPLTYPE RGB_ALPHA\nENDHDR\n'.encode('ascii')
+
+
+class LayerEncoder:
+    """Turns a layer frame into one image file.
+
+    `codec` identifies the encoder implementation for build fingerprints;
+    backends that share it must produce identical bytes. `format` is the
+    file suffix, shared by every backend for that format.
+    """
+
+    name = ''
+    codec = ''
+    format = ''
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path) -> None:
+        raise NotImplementedError
+
+
+class WebpEncoder(LayerEncoder):
+    """The WebP backends every layer is built with; select_encoder picks one."""
+
+    format = 'webp'
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path, settings: WebpSettings = DEFAULT_WEBP) -> None:
+        raise NotImplementedError
+
+
+INTERMEDIATE_FORMATS = ('png', 'pam')
+
+
+class CwebpFileEncoder(WebpEncoder):
+    """Writes a temporary PNG or PAM next to the output and runs cwebp on it."""
+
+    name = 'cwebp-file'
+    codec = 'cwebp'
+
+    def __init__(
+        self,
+        cwebp_bin: str,
+        intermediate: str = 'png',
+        png_level: int = 1,
+        png_filter: str = 'none',
+    ) -> None:
+        self.cwebp_bin = cwebp_bin
+        self.intermediate = intermediate
+        self.png_level = png_level
+        self.png_filter = png_filter
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path, settings: WebpSettings = DEFAULT_WEBP) -> None:
+        tmp = output_path.with_suffix(f'.tmp.{self.intermediate}')
+        if self.intermediate == 'pam':
+            with tmp.open('wb') as f:
+                f.write(pam_header(frame.w, frame.h))
+                f.writelines(frame.rows())
+        else:
+            # cwebp decodes this straight back, so deflate effort is wasted time.
+            write_png_rows(tmp, frame.w, frame.h, frame.rows(), self.png_level, self.png_filter)
+        encode_png(self.cwebp_bin, tmp, output_path, settings)
+
+
+class CwebpPipeEncoder(WebpEncoder):
+    """Streams an uncompressed PAM frame to cwebp on stdin; nothing touches disk but the WebP."""
+
+    name = 'cwebp-pipe'
+    codec = 'cwebp'
+
+    def __init__(self, cwebp_bin: str) -> None:
+        self.cwebp_bin = cwebp_bin
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path, settings: WebpSettings = DEFAULT_WEBP) -> None:
+        cmd = [self.cwebp_bin, *settings.cwebp_args(), '-o', str(output_path), '--', '-']
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            proc.stdin.write(pam_header(frame.w, frame.h))
+            proc.stdin.writelines(frame.rows())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        finally:
+            returncode = proc.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+
+class PillowEncoder(WebpEncoder):
+    """In-process libwebp via Pillow; no subprocess and no intermediate file."""
+
+    name = 'pillow'
+
+    def __init__(self) -> None:
+        self.codec = f'pillow-libwebp-{pil_features.version("webp")}'
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path, settings: WebpSettings = DEFAULT_WEBP) -> None:
+        frame_image(frame).save(output_path, 'WEBP', method=4, **settings.pillow_args())
+
+
+def frame_image(frame: Frame | BandedFrame) -> Image.Image:
+    # libwebp needs the whole picture, so bands are pasted into one image here.
+    image = Image.new('RGBA', (frame.w, frame.h), (0, 0, 0, 0))
+    for top, band in frame.bands():
+        x0, y0, x1, y1 = band.bbox
+        if band.pixels:
+            region = Image.frombuffer('RGBA', (x1 - x0, y1 - y0), band.pixels, 'raw', 'RGBA', 0, 1)
+            image.paste(region, (x0, top + y0))
+    return image
+
+
+AVIF_QUALITY = 60
+
+
+class PillowAvifEncoder(LayerEncoder):
+    """AVIF through Pillow's libavif plugin."""
+
+    name = 'pillow-avif'
+    format = 'avif'
+
+    def __init__(self) -> None:
+        self.codec = f'pillow-libavif-{pil_features.version("avif")}-q{AVIF_QUALITY}'
+
+    @staticmethod
+    def available() -> bool:
+        return pil_features is not None and bool(pil_features.check('avif'))
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path) -> None:
+        frame_image(frame).save(output_path, 'AVIF', quality=AVIF_QUALITY)
+
+
+class AvifencEncoder(LayerEncoder):
+    """libavif's avifenc on a temporary PNG, for machines whose Pillow lacks AVIF."""
+
+    name = 'avifenc'
+    format = 'avif'
+
+    def __init__(self) -> None:
+        self.binary = shutil.which('avifenc')
+        proc = subprocess.run([self.binary, '--version'], capture_output=True, text=True)
+        lines = (proc.stdout or proc.stderr).strip().splitlines()
+        self.codec = f'avifenc-{lines[0] if lines else "unknown"}-q{AVIF_QUALITY}'
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which('avifenc') is not None
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path) -> None:
+        tmp = output_path.with_suffix('.tmp.png')
+        try:
+            write_png_rows(tmp, frame.w, frame.h, frame.rows(), 1, 'none')
+            cmd = [self.binary, '-q', str(AVIF_QUALITY), str(tmp), str(output_path)]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+
+class PngEncoder(LayerEncoder):
+    """Lossless PNG through write_png_rows: the fallback every browser decodes."""
+
+    name = 'png'
+    format = 'png'
+    codec = f'png-zlib-{zlib.ZLIB_VERSION}-9-adaptive'
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def encode(self, frame: Frame | BandedFrame, output_path: Path) -> None:
+        write_png_rows(output_path, frame.w, frame.h, frame.rows(), 9, 'adaptive')
+
+
+# Formats written beside each layer's WebP, with their backends in order of preference.
+FORMAT_ENCODERS: dict[str, tuple[type[LayerEncoder], ...]] = {
+    'avif': (PillowAvifEncoder, AvifencEncoder),
+    'png': (PngEncoder,),
+}
+
+# Every output format by MIME type, in the order a <picture> should offer them.
+FORMAT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png'}
+
+
+def detect_encoders(formats: Iterable[str]) -> list[LayerEncoder]:
+    """One encoder per requested extra format, probed once; formats with no usable backend are skipped."""
+    encoders = []
+    for fmt in dict.fromkeys(formats):
+        if fmt == 'webp':
+            continue
+        backends = FORMAT_ENCODERS[fmt]
+        backend = next((cls for cls in backends if cls.available()), None)
+        if backend is None:
+            tried = ', '.join(cls.name for cls in backends)
+            print(f'Skipping {fmt}: no encoder available (tried {tried})', file=sys.stderr)
+            continue
+        encoders.append(backend())
+    return encoders
+
+
+def prune_formats(target: Path, encoders: Iterable[LayerEncoder]) -> None:
+    # Siblings in formats this build no longer writes would otherwise outlive the layer they were made from.
+    written = {encoder.format for encoder in encoders}
+    for fmt in FORMAT_ENCODERS:
+        if fmt not in written:
+            target.with_suffix(f'.{fmt}').unlink(missing_ok=True)
+
+
+ENCODER_NAMES = ('auto', 'cwebp-pipe', 'cwebp-file', 'pillow')
+
+
+def pillow_webp_available() -> bool:
+    return pil_features is not None and bool(pil_features.check('webp'))
+
+
+def cwebp_reads_stdin(cwebp_bin: str) -> bool:
+    # Older cwebp builds lack stdin or PAM input; probe with a 1x1 frame.
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            CwebpPipeEncoder(cwebp_bin).encode(Frame(1, 1, (0, 0, 0, 0), b''), Path(tmp) / 'probe.webp')
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        return (Path(tmp) / 'probe.webp').exists()
+
+
+def select_encoder(name: str, intermediate: str = 'png', png_level: int = 1, png_filter: str = 'none') -> WebpEncoder:
+    if name == 'pillow' or (name == 'auto' and pillow_webp_available() and shutil.which(find_cwebp()) is None):
+        if not pillow_webp_available():
+            raise RuntimeError('Pillow with WebP support is not installed')
+        return PillowEncoder()
+
+    cwebp_bin = find_cwebp()
+    try:
+        subprocess.run([cwebp_bin, '-version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as exc:
+        raise RuntimeError(f'Unable to execute cwebp via {cwebp_bin}: {exc}') from exc
+
+    if name == 'cwebp-file' or (name == 'auto' and not cwebp_reads_stdin(cwebp_bin)):
+        return CwebpFileEncoder(cwebp_bin, intermediate, png_level, png_filter)
+    return CwebpPipeEncoder(cwebp_bin)
+
+
+def to_webp(encoder: WebpEncoder, canvas: Raster, output_path: Path) -> None:
+    encoder.encode(canvas.frame(), output_path)
+
+
+LAYERS = ('bg', 'mid', 'fg')
+# --flatten's single opaque composite of LAYERS, built and tracked like another layer.
+FLAT_LAYER = 'scene'
+# CSS blend mode and opacity the app stacks each profile's layers with (layersByProfile in sceneSpecs.ts),
+# so a flattened scene looks like the layered one it stands in for. Keep the two in step.
+SCENE_BLENDS: dict[str, dict[str, tuple[str, float]]] = {
+    PROFILE_BATTLE: {'bg': ('normal', 1.0), 'mid': ('normal', 0.97), 'fg': ('screen', 0.72)},
+    PROFILE_CEREMONY: {'bg': ('normal', 1.0), 'mid': ('normal', 0.96), 'fg': ('screen', 0.64)},
+    PROFILE_COLLAPSE: {'bg': ('normal', 1.0), 'mid': ('normal', 0.95), 'fg': ('screen', 0.78)},
+    PROFILE_MAP: {'bg': ('normal', 1.0), 'mid': ('normal', 0.92), 'fg': ('soft-light', 0.56)},
+}
+
+LAYER_BUILDERS = {
+    'bg': make_background,
+    'mid': make_mid,
+    'fg': make_fg,
+}
+
+
+def _selector_value(node: ast.expr) -> object:
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return globals().get(node.id)
+    return None
+
+
+def _selects(test: ast.expr, selector: str) -> bool:
+    if not (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], ast.Eq)):
+        return False
+    left = test.left
+    return (isinstance(left, ast.Name) and left.id == selector) or (
+        isinstance(left, ast.Attribute) and left.attr == selector
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def scoped_source(func: Callable[..., object], selector: str, value: str) -> str:
+    """Source of func with every branch of its top-level `selector == ...` chains
+    other than `value` stubbed out, so unrelated motifs don't share a fingerprint."""
+    tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    for stmt in tree.body[0].body:
+        node = stmt
+        matched = False
+        while isinstance(node, ast.If) and _selects(node.test, selector):
+            if _selector_value(node.test.comparators[0]) == value:
+                matched = True
+            else:
+                node.body = [ast.Pass()]
+            if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If) and _selects(node.orelse[0].test, selector):
+                node = node.orelse[0]
+                continue
+            if matched and node.orelse:
+                node.orelse = [ast.Pass()]
+            break
+    return ast.unparse(tree)
+
+
+def layer_fingerprint(
+    event_id: str,
+    layer: str,
+    codec: str,
+    width: int = W,
+    blend: str = 'over',
+    particles: str = 'sparse',
+    search: EncodeTarget | None = None,
+    formats: tuple[str, ...] = (),
+    tiled: bool = False,
+) -> str:
+    if layer == FLAT_LAYER:
+        parts = [
+            layer_fingerprint(event_id, part, codec, width, blend, particles, search, formats, tiled) for part in LAYERS
+        ]
+        code = [inspect.getsource(func) for func in (flatten_frames, over_region, mix_region, blend_table)]
+        inputs = {'layers': parts, 'blends': scene_blends(event_id), 'code': code}
+        return hashlib.sha256(json.dumps(inputs).encode('utf-8')).hexdigest()
+    visual = EVENTS[event_id]
+    inputs: dict[str, object] = {
+        'generator': GENERATOR_VERSION,
+        'size': list(canvas_size(width)),
+        'blend': blend,
+        'encoder': [codec, *CWEBP_ARGS],
+        'event': event_id,
+        'layer': layer,
+    }
+    if layer == 'bg':
+        inputs['profile'] = visual.profile
+        inputs['palette'] = PALETTES[visual.profile]
+        inputs['code'] = scoped_source(make_background, 'profile', visual.profile)
+    elif layer == 'mid':
+        inputs['motif'] = visual.motif
+        inputs['code'] = [inspect.getsource(make_mid), scoped_source(motif_shape, 'motif', visual.motif)]
+    else:
+        inputs['accent'] = visual.accent
+        # Only the foreground scatters specks, so only it depends on how they are placed.
+        inputs['particles'] = particles
+        inputs['code'] = scoped_source(make_fg, 'accent', visual.accent)
+    if search is not None:
+        # The searched settings follow from the target, so the target is what the output depends on.
+        inputs['search'] = search.spec()
+    if formats:
+        # Codec ids of the extra formats written beside the WebP.
+        inputs['formats'] = list(formats)
+    if tiled:
+        # Textures are fingerprinted with their tiles; the layer only depends on being drawn without them.
+        inputs['textures'] = 'tiled'
+    payload = json.dumps(inputs, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class BuildCache:
+    """Fingerprint manifest recording which inputs produced each committed layer.
+
+    With a search target it also keeps the settings each layer's encode search
+    settled on, and hands them back while the layer's fingerprint is unchanged
+    so a rebuilt layer is encoded once instead of searched again (unless
+    fresh_search). A layer
+    written in extra formats is only fresh while all of its siblings exist.
+    A tiled build also records the texture tiles it wrote and which of them
+    each layer overlays.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        codec: str,
+        blend: str = 'over',
+        particles: str = 'sparse',
+        search: EncodeTarget | None = None,
+        fresh_search: bool = False,
+        extras: Sequence[LayerEncoder] = (),
+        tiled: bool = False,
+    ) -> None:
+        self.path = path
+        self.codec = codec
+        self.blend = blend
+        self.particles = particles
+        self.search = search
+        self.fresh_search = fresh_search
+        self.extras = tuple(extras)
+        self.tiled = tiled
+        self.layers: dict[str, str] = {}
+        self.previews: dict[str, dict[str, object]] = {}
+        self.encodings: dict[str, dict[str, object]] = {}
+        self.tiles: dict[str, str] = {}
+        self.overlays: dict[str, list[dict[str, object]]] = {}
+        if path.exists():
+            manifest = json.loads(path.read_text())
+            if manifest.get('version') == CACHE_VERSION:
+                self.layers = manifest.get('layers', {})
+                self.previews = manifest.get('previews', {})
+                self.encodings = manifest.get('encodings', {})
+                self.tiles = manifest.get('tiles', {})
+                self.overlays = manifest.get('overlays', {})
+
+    def fingerprint(self, event_id: str, layer: str, width: int) -> str:
+        formats = tuple(extra.codec for extra in self.extras)
+        return layer_fingerprint(
+            event_id, layer, self.codec, width, self.blend, self.particles, self.search, formats, self.tiled
+        )
+
+    def is_fresh(self, event_id: str, layer: str, width: int, target: Path) -> bool:
+        key = f'{event_id}/{variant_name(layer, width)}'
+        targets = [target, *(target.with_suffix(f'.{extra.format}') for extra in self.extras)]
+        if not all(path.exists() for path in targets):
+            return False
+        return self.layers.get(key) == self.fingerprint(event_id, layer, width)
+
+    def settings(self, event_id: str, layer: str, width: int) -> WebpSettings | None:
+        """Settings an earlier search chose for this layer and target, if any.
+
+        Only a search on the same pixels counts: the fingerprint covers the
+        target too, and settings searched on other pixels can miss it.
+        """
+        entry = self.encodings.get(f'{event_id}/{variant_name(layer, width)}')
+        if self.search is None or self.fresh_search or entry is None:
+            return None
+        if entry.get('fingerprint') != self.fingerprint(event_id, layer, width):
+            return None
+        return WebpSettings(**entry['settings'])
+
+    def record(
+        self,
+        event_id: str,
+        layer: str,
+        width: int,
+        preview: dict[str, object] | None = None,
+        settings: WebpSettings | None = None,
+    ) -> None:
+        key = f'{event_id}/{variant_name(layer, width)}'
+        fingerprint = self.layers[key] = self.fingerprint(event_id, layer, width)
+        if preview is not None:
+            self.previews[key] = preview
+        if self.search is not None and settings is not None:
+            self.encodings[key] = {
+                'search': self.search.spec(),
+                'fingerprint': fingerprint,
+                'settings': asdict(settings),
+            }
+        else:
+            self.encodings.pop(key, None)
+        textures = layer_textures(event_id, layer) if self.tiled else ()
+        if textures:
+            self.overlays[key] = [{'texture': texture.name, 'top': texture.top} for texture in textures]
+        else:
+            self.overlays.pop(key, None)
+
+    def save(self) -> None:
+        manifest = {
+            'version': CACHE_VERSION,
+            'layers': dict(sorted(self.layers.items())),
+            'previews': dict(sorted(self.previews.items())),
+            'encodings': dict(sorted(self.encodings.items())),
+            'tiles': dict(sorted(self.tiles.items())),
+            'overlays': dict(sorted(self.overlays.items())),
+        }
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(manifest, indent=2) + '\n')
+        os.replace(tmp, self.path)
+
+
+def variant_name(layer: str, width: int) -> str:
+    # The design width keeps the bare name the app already imports.
+    return layer if width == W else f'{layer}-{width}'
+
+
+def layer_targets(event_id: str, widths: Iterable[int] = (W,), flatten: bool = False) -> dict[tuple[str, int], Path]:
+    # The flattened scene comes last, after the layers it is composited from.
+    event_dir = ROOT / event_id
+    layers = (*LAYERS, FLAT_LAYER) if flatten else LAYERS
+    return {(layer, width): event_dir / f'{variant_name(layer, width)}.webp' for layer in layers for width in widths}
+
+
+def stale_layers(
+    event_id: str, overwrite: bool, cache: BuildCache, widths: Iterable[int] = (W,), flatten: bool = False
+) -> list[tuple[str, int]]:
+    if event_id not in EVENTS:
+        raise ValueError(f'Unknown event id: {event_id}')
+    targets = layer_targets(event_id, widths, flatten)
+    return [unit for unit, target in targets.items() if overwrite or not cache.is_fresh(event_id, *unit, target)]
+
+
+@functools.lru_cache(maxsize=None)
+def layer_recording(event_id: str, layer: str) -> DisplayList:
+    # Scenes don't depend on engine, blend, particle mode or width, so one recording serves them all.
+    return LAYER_BUILDERS[layer](event_id, EVENTS[event_id], DisplayList, W)
+
+
+# Room for every layer of every event at eight widths, a full --widths srcset with room to spare.
+@functools.lru_cache(maxsize=8 * len(EVENTS) * len(LAYERS))
+def layer_display_list(event_id: str, layer: str, width: int = W, tiled: bool = False) -> DisplayList:
+    # Culling is decided in pixels, so the recording is optimized at each width it is drawn at.
+    display = layer_recording(event_id, layer).scaled(width).optimize()
+    # Tiled builds ship grain and specks as shared textures, so the layer itself is drawn without them.
+    return display.without(TEXTURE_PASSES) if tiled else display
+
+
+# Per-pixel passes that --tiles takes out of the layers and ships as shared repeating tiles.
+TEXTURE_PASSES = ('add_grain', 'scatter_specks')
+TEXTURE_TILE = 256
+TEXTURE_DIR = ROOT / 'textures'
+# Noise is the worst case for lossy WebP, and a tile is small enough to keep exact.
+TEXTURE_WEBP = WebpSettings(lossless=True)
+# The scene field a layer's specks vary with, which names the tile they share.
+TEXTURE_KEYS = {'bg': 'profile', 'mid': 'motif', 'fg': 'accent'}
+
+
+@dataclass(frozen=True)
+class Texture:
+    """A shared tile standing in for one texture pass of a layer.
+
+    Tiles are drawn in pixel space, like the passes they replace, so one tile
+    serves every width. args are the pass's arguments without its per-event
+    seed (and the scan-only hash scale), so events whose passes differ only in
+    those share a tile. top is the canvas row the pass starts at, as a fraction
+    of the canvas height.
+    """
+
+    name: str
+    method: str
+    args: tuple[object, ...]
+    top: float = 0.0
+
+
+@functools.lru_cache(maxsize=None)
+def layer_textures(event_id: str, layer: str) -> tuple[Texture, ...]:
+    """Textures a tiled build overlays on this layer, in drawing order."""
+    if layer == FLAT_LAYER:
+        return tuple(texture for part in LAYERS for texture in layer_textures(event_id, part))
+    textures = []
+    for op in layer_display_list(event_id, layer).ops:
+        if op.method == 'add_grain':
+            amount, _seed = op.args
+            textures.append(Texture(f'grain-{amount}', op.method, (amount,)))
+        elif op.method == 'scatter_specks':
+            y_start, step, _scale, _seed, threshold, color, alpha, size = op.args
+            name = f'specks-{getattr(EVENTS[event_id], TEXTURE_KEYS[layer])}'
+            textures.append(Texture(name, op.method, (step, threshold, color, alpha, size), round(y_start / H, 4)))
+    return tuple(textures)
+
+
+def required_textures(event_ids: Iterable[str]) -> dict[str, Texture]:
+    textures: dict[str, Texture] = {}
+    for event_id in dict.fromkeys(event_ids):
+        for layer in LAYERS:
+            for texture in layer_textures(event_id, layer):
+                if textures.setdefault(texture.name, texture) != texture:
+                    raise ValueError(f'Texture {texture.name} is drawn two different ways and cannot be shared')
+    return textures
+
+
+def render_texture(texture: Texture) -> Frame:
+    """Draw a texture's seamless tile, about TEXTURE_TILE px square.
+
+    Grain is black or white at the alpha that moves mid-grey by the raster's
+    delta, so the tile composites with plain source-over. Specks get the
+    raster's density on a tile that is a whole number of grid steps, and
+    sprites wrap around its edges.
+    """
+    seed = stable_seed('texture', texture.name) % 2000
+    if texture.method == 'add_grain':
+        (amount,) = texture.args
+        n = TEXTURE_TILE
+        data = bytearray(n * n * 4)
+        for y in range(n):
+            for x in range(n):
+                delta = int((hash_noise(x, y, seed) - 0.5) * amount)
+                i = (y * n + x) * 4
+                if delta > 0:
+                    data[i:i + 4] = bytes((255, 255, 255, min(255, round(delta * 255 / 127))))
+                elif delta < 0:
+                    data[i + 3] = min(255, round(-delta * 255 / 128))
+    else:
+        step, threshold, color, alpha, size = texture.args
+        n = TEXTURE_TILE - TEXTURE_TILE % step
+        data = bytearray(n * n * 4)
+        xs, ys = emit_specks(n, n, 0, step, seed, threshold)
+        for dx, dy, coverage in speck_sprite(size):
+            a = int(alpha * coverage)
+            for x, y in zip(xs, ys):
+                blend_over(data, n, n, (x + dx) % n, (y + dy) % n, color, a)
+    return Frame(n, n, (0, 0, n, n), bytes(data))
+
+
+def texture_fingerprint(texture: Texture, codec: str) -> str:
+    inputs = {
+        'generator': GENERATOR_VERSION,
+        'texture': asdict(texture),
+        'encoder': [codec, *TEXTURE_WEBP.cwebp_args()],
+        'code': inspect.getsource(render_texture),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def stale_textures(event_ids: Iterable[str], cache: BuildCache) -> dict[str, Texture]:
+    # Tiles are fingerprinted in the build cache like layers; a missing file is stale whatever the cache says.
+    return {
+        name: texture
+        for name, texture in required_textures(event_ids).items()
+        if not (TEXTURE_DIR / f'{name}.webp').exists()
+        or cache.tiles.get(name) != texture_fingerprint(texture, cache.codec)
+    }
+
+
+def export_textures(event_ids: Iterable[str], encoder: WebpEncoder, cache: BuildCache) -> list[str]:
+    """Write the tiles the layers of event_ids overlay under TEXTURE_DIR; return the names rebuilt.
+
+    Only stale tiles are redrawn, those whose texture, encoder or drawing code
+    changed since the cached build.
+    """
+    built = []
+    for name, texture in stale_textures(event_ids, cache).items():
+        path = TEXTURE_DIR / f'{name}.webp'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        encoder.encode(render_texture(texture), path, TEXTURE_WEBP)
+        cache.tiles[name] = texture_fingerprint(texture, encoder.codec)
+        built.append(name)
+    cache.save()
+    return built
+
+
+def unit_cost(event_id: str, layer: str, width: int) -> int:
+    parts = LAYERS if layer == FLAT_LAYER else (layer,)
+    return sum(layer_display_list(event_id, part, width).cost() for part in parts)
+
+
+def by_cost(units: Iterable[tuple[str, str, int]]) -> list[tuple[str, str, int]]:
+    # Costliest (event, layer, width) first, so a pool doesn't finish on one long layer started last.
+    return sorted(units, key=lambda unit: unit_cost(*unit), reverse=True)
+
+
+def rasterize_layer(
+    event_id: str,
+    layer: str,
+    engine_name: str,
+    width: int = W,
+    blend: str = 'over',
+    particles: str = 'sparse',
+    tiled: bool = False,
+) -> Frame:
+    # Process-pool entry point: only names go in, and only the occupied region comes back.
+    canvas = raster_factory(engine_name, blend, particles)(width)
+    return layer_display_list(event_id, layer, width, tiled).replay(canvas).frame()
+
+
+@dataclass(frozen=True)
+class BandedFrame:
+    """A layer rasterized only as its rows are read, band_rows rows at a time.
+
+    Each band replays the layer's display list onto a raster holding just that
+    band, so at most one band of pixels is alive while rows stream into an
+    encoder or PNG writer. The rows are byte-identical to a full-frame render.
+    """
+
+    event_id: str
+    layer: str
+    engine: Callable[..., Raster]
+    width: int
+    band_rows: int
+    tiled: bool = False
+
+    @property
+    def w(self) -> int:
+        return canvas_size(self.width)[0]
+
+    @property
+    def h(self) -> int:
+        return canvas_size(self.width)[1]
+
+    def bands(self) -> Iterator[tuple[int, Frame]]:
+        display = layer_display_list(self.event_id, self.layer, self.width, self.tiled)
+        for top in range(0, self.h, self.band_rows):
+            canvas = self.engine(self.width, band=(top, min(self.h, top + self.band_rows)))
+            yield top, display.replay(canvas).frame()
+
+    def rows(self) -> Iterator[bytes]:
+        for _, band in self.bands():
+            yield from band.rows()
+
+
+PREVIEW_WIDTH = 16
+PREVIEW_SAMPLES = 4
+
+
+class PreviewSampler:
+    """Placeholder thumbnail, dominant colour and occupied box of one layer.
+
+    Each of the PREVIEW_WIDTH-wide thumbnail's pixels averages a fixed
+    PREVIEW_SAMPLES x PREVIEW_SAMPLES grid of canvas pixels weighted by alpha,
+    which box-blurs the layer at a cost independent of its size. Frames are
+    added band by band, so a streamed layer is sampled without being whole.
+    """
+
+    def __init__(self, w: int, h: int) -> None:
+        self.w, self.h = w, h
+        self.pw = PREVIEW_WIDTH
+        self.ph = max(1, round(PREVIEW_WIDTH * h / w))
+        n = PREVIEW_SAMPLES
+        self.xs = [int((i + 0.5) * w / (self.pw * n)) for i in range(self.pw * n)]
+        self.ys = [int((j + 0.5) * h / (self.ph * n)) for j in range(self.ph * n)]
+        # Alpha-weighted (r, g, b) sums and alpha per thumbnail pixel, and per 4-bit colour bucket.
+        self.cells = [[0, 0, 0, 0] for _ in range(self.pw * self.ph)]
+        self.buckets: dict[int, list[int]] = {}
+        self.bbox: tuple[int, int, int, int] | None = None
+
+    def add(self, top: int, frame: Frame) -> None:
+        x0, y0, x1, y1 = frame.bbox
+        if x0 >= x1:
+            return
+        if self.bbox is None:
+            self.bbox = (x0, top + y0, x1, top + y1)
+        else:
+            bx0, by0, bx1, by1 = self.bbox
+            self.bbox = (min(bx0, x0), min(by0, top + y0), max(bx1, x1), max(by1, top + y1))
+        n = PREVIEW_SAMPLES
+        span = (x1 - x0) * 4
+        # Samples outside the bbox are transparent and add nothing.
+        columns = [(i // n, (x - x0) * 4) for i, x in enumerate(self.xs) if x0 <= x < x1]
+        for j, y in enumerate(self.ys):
+            if not top + y0 <= y < top + y1:
+                continue
+            row = (y - top - y0) * span
+            base = j // n * self.pw
+            for cell, offset in columns:
+                r, g, b, a = frame.pixels[row + offset:row + offset + 4]
+                if not a:
+                    continue
+                bucket = self.buckets.setdefault((r >> 4) << 8 | (g >> 4) << 4 | b >> 4, [0, 0, 0, 0])
+                for sums in (self.cells[base + cell], bucket):
+                    sums[0] += r * a
+                    sums[1] += g * a
+                    sums[2] += b * a
+                    sums[3] += a
+
+    def preview(self) -> dict[str, object]:
+        """The manifest fields: occupied bbox, dominant colour and a PNG data URI placeholder."""
+        samples = PREVIEW_SAMPLES * PREVIEW_SAMPLES
+        thumb = bytearray()
+        for r, g, b, a in self.cells:
+            if a:
+                thumb += bytes(((r + a // 2) // a, (g + a // 2) // a, (b + a // 2) // a, (a + samples // 2) // samples))
+            else:
+                thumb += bytes(4)
+        color = None
+        if self.buckets:
+            r, g, b, a = max(self.buckets.values(), key=lambda sums: sums[3])
+            color = f'#{(r + a // 2) // a:02x}{(g + a // 2) // a:02x}{(b + a // 2) // a:02x}'
+        png = base64.b64encode(png_bytes(self.pw, self.ph, thumb)).decode('ascii')
+        return {'bbox': list(self.bbox or (0, 0, 0, 0)), 'color': color, 'placeholder': f'data:image/png;base64,{png}'}
+
+
+class PreviewTap:
+    """Frame view that feeds each band an encoder reads to a PreviewSampler on the way through."""
+
+    def __init__(self, frame: Frame | BandedFrame) -> None:
+        self.frame = frame
+        self.w, self.h = frame.w, frame.h
+        self.sampler = PreviewSampler(frame.w, frame.h)
+
+    def bands(self) -> Iterator[tuple[int, Frame]]:
+        for top, band in self.frame.bands():
+            self.sampler.add(top, band)
+            yield top, band
+
+    def rows(self) -> Iterator[bytes]:
+        for _, band in self.bands():
+            yield from band.rows()
+
+    def whole(self) -> Frame:
+        # The picture as one sampled Frame, for searches that encode it more than once.
+        if isinstance(self.frame, Frame):
+            self.sampler.add(0, self.frame)
+            return self.frame
+        return Frame(self.w, self.h, (0, 0, self.w, self.h), b''.join(self.rows()))
+
+
+@dataclass(frozen=True)
+class EncodeTarget:
+    """Per-layer goals for the encode search: a byte budget, a minimum PSNR, or both.
+
+    jobs is how many trial encodes run at once; it doesn't change the result.
+    """
+
+    max_bytes: int | None = None
+    min_psnr: float | None = None
+    jobs: int = field(default=4, compare=False)
+
+    def spec(self) -> dict[str, object]:
+        return {'max_bytes': self.max_bytes, 'min_psnr': self.min_psnr}
+
+    def met(self, size: int, score: float | None) -> bool:
+        return (self.max_bytes is None or size <= self.max_bytes) and (
+            self.min_psnr is None or (score is not None and score >= self.min_psnr)
+        )
+
+
+# Layers covering less than this fraction of the canvas also try lossless, which suits sparse specks and strokes.
+LOSSLESS_COVERAGE = 0.2
+
+
+def webp_psnr(reference: Image.Image, path: Path) -> float:
+    """PSNR in dB of a WebP against the premultiplied ('RGBa') source it was encoded from.
+
+    Premultiplying ignores colour under transparent pixels, which lossy WebP
+    is free to change.
+    """
+    with Image.open(path) as decoded:
+        diff = ImageChops.difference(reference, decoded.convert('RGBA').convert('RGBa'))
+    mse = sum(ImageStat.Stat(diff).sum2) / (reference.width * reference.height * 4)
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def first_passing(candidates: list[int], passes: Callable[[list[int]], list[bool]], width: int) -> int | None:
+    """First candidate that passes a monotone (False... True...) test, checking width candidates per round."""
+    lo, hi = 0, len(candidates) - 1
+    found = None
+    while lo <= hi:
+        n = hi - lo + 1
+        picks = sorted({lo + n * (i + 1) // (width + 1) for i in range(min(width, n))})
+        results = passes([candidates[i] for i in picks])
+        hit = next((k for k, ok in enumerate(results) if ok), None)
+        if hit is None:
+            lo = picks[-1] + 1
+        else:
+            found = candidates[picks[hit]]
+            lo = picks[hit - 1] + 1 if hit else lo
+            hi = picks[hit] - 1
+    return found
+
+
+def search_encode(encoder: WebpEncoder, frame: Frame, output_path: Path, target: EncodeTarget) -> WebpSettings:
+    """Encode frame with the smallest settings that meet target, and return them.
+
+    Lossy quality is searched target.jobs trials at a time: upward for the lowest
+    quality that reaches min_psnr (capped by max_bytes), or downward for the
+    highest that fits max_bytes. Sparse layers also try lossless. With a
+    min_psnr the smallest trial meeting the target wins; with only a budget,
+    the best quality that fits, lossless first. If no trial meets the target,
+    the smallest one is kept under a budget, else the highest-scoring one.
+    """
+    reference = frame_image(frame).convert('RGBa') if target.min_psnr is not None else None
+    alpha = frame.pixels[3::4]
+    sparse = len(alpha) - alpha.count(0) < LOSSLESS_COVERAGE * frame.w * frame.h
+    lossless = [WebpSettings(lossless=True)] if sparse else []
+    trials: dict[WebpSettings, tuple[Path, int, float | None]] = {}
+
+    def trial(settings: WebpSettings) -> tuple[Path, int, float | None]:
+        tag = 'lossless' if settings.lossless else f'q{settings.quality}'
+        path = output_path.with_name(f'.{output_path.stem}.{tag}.tmp')
+        encoder.encode(frame, path, settings)
+        return path, path.stat().st_size, webp_psnr(reference, path) if reference is not None else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=target.jobs) as pool:
+
+            def run(batch: list[WebpSettings]) -> None:
+                batch = [settings for settings in batch if settings not in trials]
+                trials.update(zip(batch, pool.map(trial, batch)))
+
+            def passes(qualities: list[int]) -> list[bool]:
+                batch = [WebpSettings.lossy(q) for q in qualities]
+                # The lossless trial rides along with the first round.
+                run(batch + [settings for settings in lossless if settings not in trials])
+                if target.min_psnr is not None:
+                    return [trials[settings][2] >= target.min_psnr for settings in batch]
+                return [trials[settings][1] <= target.max_bytes for settings in batch]
+
+            qualities = list(range(0, 101))
+            if target.min_psnr is None:
+                qualities.reverse()
+            first_passing(qualities, passes, target.jobs)
+            run(lossless)
+
+        met = [settings for settings, (_, size, score) in trials.items() if target.met(size, score)]
+        if met and target.min_psnr is not None:
+            best = min(met, key=lambda settings: trials[settings][1])
+        elif met:
+            best = max(met, key=lambda settings: (settings.lossless, settings.quality))
+        elif target.max_bytes is not None:
+            best = min(trials, key=lambda settings: trials[settings][1])
+        else:
+            best = max(trials, key=lambda settings: trials[settings][2])
+        os.replace(trials[best][0], output_path)
+        return best
+    finally:
+        for path, _, _ in trials.values():
+            path.unlink(missing_ok=True)
+
+
+def encode_layer(
+    encoder: WebpEncoder,
+    frame: Frame | BandedFrame,
+    output_path: Path,
+    target: EncodeTarget | None = None,
+    settings: WebpSettings | None = None,
+    extras: Sequence[LayerEncoder] = (),
+) -> tuple[dict[str, object], WebpSettings]:
+    """Encode one layer; return its preview and the WebP settings used.
+
+    Pool entry point too. The preview is sampled from the same rows the
+    encoder reads. With a target and no settings recorded by an earlier
+    search, the settings are searched for. extras write the same frame in
+    their own formats next to output_path, concurrently with the WebP.
+    """
+    tap = PreviewTap(frame)
+    search = target is not None and settings is None
+    settings = settings or DEFAULT_WEBP
+    if not search and not extras:
+        encoder.encode(tap, output_path, settings)
+        return tap.sampler.preview(), settings
+    # Several encodes of one frame: render it once rather than once per encode.
+    whole = tap.whole()
+    with ThreadPoolExecutor(max_workers=max(1, len(extras))) as pool:
+        others = [pool.submit(extra.encode, whole, output_path.with_suffix(f'.{extra.format}')) for extra in extras]
+        if search:
+            with profile_stage('search'):
+                settings = search_encode(encoder, whole, output_path, target)
+        else:
+            encoder.encode(whole, output_path, settings)
+        for other in others:
+            other.result()
+    return tap.sampler.preview(), settings
+
+
+def over_region(dst: bytearray, at: int, stride: int, src: bytes, span: int) -> None:
+    # Composite src rows (span bytes each) onto dst at byte offset at, with blend_over's rounding per pixel.
+    for row in range(len(src) // span):
+        line = src[row * span:(row + 1) * span]
+        alpha = line[3::4]
+        i = at + row * stride
+        if alpha.count(0) == len(alpha):
+            continue
+        if alpha.count(255) == len(alpha):
+            dst[i:i + span] = line
+            continue
+        for k in range(0, span, 4):
+            sa = line[k + 3]
+            if not sa:
+                continue
+            j = i + k
+            da = dst[j + 3]
+            if sa == 255 or not da:
+                dst[j:j + 4] = line[k:k + 4]
+                continue
+            dw = MUL_TABLE[da << 8 | (255 - sa)]
+            oa = sa + dw
+            den = 2 * oa
+            dst[j] = (2 * (line[k] * sa + dst[j] * dw) + oa) // den
+            dst[j + 1] = (2 * (line[k + 1] * sa + dst[j + 1] * dw) + oa) // den
+            dst[j + 2] = (2 * (line[k + 2] * sa + dst[j + 2] * dw) + oa) // den
+            dst[j + 3] = oa
+
+
+def over_region_numpy(dst: bytearray, at: int, stride: int, src: bytes, span: int) -> None:
+    rows = len(src) // span
+    region = np.frombuffer(dst, np.uint8, rows * stride - stride + span, at)
+    region = np.lib.stride_tricks.as_strided(region, (rows, span // 4, 4), (stride, 4, 1), writeable=True)
+    top = np.frombuffer(src, np.uint8).reshape(rows, span // 4, 4)
+    if (top[..., 3] == 255).all():
+        region[...] = top
+        return
+    top = top.astype(np.int32)
+    sa = top[..., 3]
+    da = region[..., 3].astype(np.int32)
+    dw = np.frombuffer(MUL_TABLE, np.uint8)[da << 8 | (255 - sa)].astype(np.int32)
+    oa = sa + dw
+    rgb = (2 * (top[..., :3] * sa[..., None] + region[..., :3] * dw[..., None]) + oa[..., None]) // np.maximum(
+        2 * oa, 1
+    )[..., None]
+    # Transparent source pixels leave the destination untouched, as blend_over does.
+    keep = sa == 0
+    region[..., :3] = np.where(keep[..., None], region[..., :3], rgb)
+    region[..., 3] = np.where(keep, da, oa)
+
+
+def scene_blends(event_id: str) -> tuple[tuple[str, float], ...]:
+    # Blend mode and opacity of each of LAYERS in the event's flattened scene.
+    blends = SCENE_BLENDS[EVENTS[event_id].profile]
+    return tuple(blends[layer] for layer in LAYERS)
+
+
+@functools.lru_cache(maxsize=None)
+def blend_table(mode: str) -> bytes:
+    """A CSS separable blend function B(backdrop, source) for every pair of bytes, at backdrop << 8 | source."""
+    table = bytearray(65536)
+    for cb in range(256):
+        b = cb / 255
+        d = ((16 * b - 12) * b + 4) * b if b <= 0.25 else math.sqrt(b)
+        for cs in range(256):
+            s = cs / 255
+            if mode == 'screen':
+                v = b + s - b * s
+            elif mode == 'soft-light':
+                v = b - (1 - 2 * s) * b * (1 - b) if s <= 0.5 else b + (2 * s - 1) * (d - b)
+            else:
+                v = s
+            table[cb << 8 | cs] = round(v * 255)
+    return bytes(table)
+
+
+def mix_region(dst: bytearray, at: int, stride: int, src: bytes, span: int, mode: str, level: int) -> bytes:
+    # src rows as the blend mode and an opacity of level/255 would paint them over dst, ready for over_region.
+    # Per the compositing spec the colour is (1 - ab) * Cs + ab * B(Cb, Cs), against the backdrop's alpha ab.
+    table = blend_table(mode)
+    out = bytearray(src)
+    for k in range(0, len(src), 4):
+        sa = src[k + 3]
+        if not sa:
+            continue
+        out[k + 3] = (sa * level + 127) // 255
+        j = at + k // span * stride + k % span
+        ba = dst[j + 3]
+        if mode == 'normal' or not ba:
+            continue
+        for c in range(3):
+            cs = src[k + c]
+            out[k + c] = ((255 - ba) * cs + ba * table[dst[j + c] << 8 | cs] + 127) // 255
+    return bytes(out)
+
+
+def mix_region_numpy(dst: bytearray, at: int, stride: int, src: bytes, span: int, mode: str, level: int) -> bytes:
+    rows = len(src) // span
+    region = np.frombuffer(dst, np.uint8, rows * stride - stride + span, at)
+    region = np.lib.stride_tricks.as_strided(region, (rows, span // 4, 4), (stride, 4, 1), writeable=False)
+    top = np.frombuffer(src, np.uint8).reshape(rows, span // 4, 4).astype(np.int32)
+    out = top.copy()
+    out[..., 3] = (top[..., 3] * level + 127) // 255
+    if mode != 'normal':
+        ba = region[..., 3:].astype(np.int32)
+        mixed = np.frombuffer(blend_table(mode), np.uint8)[region[..., :3].astype(np.int32) << 8 | top[..., :3]]
+        out[..., :3] = ((255 - ba) * top[..., :3] + ba * mixed + 127) // 255
+    # Transparent source pixels are skipped by over_region, so their colour doesn't matter.
+    return out.astype(np.uint8).tobytes()
+
+
+def flatten_frames(frames: Iterable[Frame], blends: Sequence[tuple[str, float]] = ()) -> Frame:
+    """Composite same-size layer frames, first at the bottom, each with its blend mode and opacity.
+
+    blends pairs each frame with a CSS blend mode ('normal', 'screen' or
+    'soft-light') and opacity, as the app stacks the layers; frames without
+    one are drawn normal at full opacity. Blending is folded into the source
+    colour and opacity into its alpha, then the frame goes down with
+    Porter-Duff over in straight alpha with blend_over's rounding, so a normal
+    opaque layer composites exactly as if its pixels had been blended onto the
+    ones below one at a time. Over never clears alpha, so the result is
+    cropped to the union of the bboxes.
+    """
+    frames = list(frames)
+    w, h = frames[0].w, frames[0].h
+    boxes = [frame.bbox for frame in frames if frame.bbox[0] < frame.bbox[2]]
+    if not boxes:
+        return Frame(w, h, (0, 0, 0, 0), b'')
+    x0, y0 = min(box[0] for box in boxes), min(box[1] for box in boxes)
+    x1, y1 = max(box[2] for box in boxes), max(box[3] for box in boxes)
+    stride = (x1 - x0) * 4
+    out = bytearray(stride * (y1 - y0))
+    over = over_region_numpy if np is not None else over_region
+    mix = mix_region_numpy if np is not None else mix_region
+    for i, frame in enumerate(frames):
+        fx0, fy0, fx1, fy1 = frame.bbox
+        if fx0 >= fx1:
+            continue
+        at, span = (fy0 - y0) * stride + (fx0 - x0) * 4, (fx1 - fx0) * 4
+        mode, opacity = blends[i] if i < len(blends) else ('normal', 1.0)
+        level = round(opacity * 255)
+        pixels = frame.pixels
+        if mode != 'normal' or level != 255:
+            pixels = mix(out, at, stride, pixels, span, mode, level)
+        over(out, at, stride, pixels, span)
+    return Frame(w, h, (x0, y0, x1, y1), bytes(out))
+
+
+@dataclass(frozen=True)
+class FlatFrame:
+    """LAYERS composited into one picture as an encoder reads it.
+
+    Full frames flatten in one piece. Banded layers are read in lockstep and
+    flattened band by band, so only one band of each layer is alive at a time.
+    """
+
+    layers: tuple[Frame | BandedFrame, ...]
+    blends: tuple[tuple[str, float], ...] = ()
+
+    @property
+    def w(self) -> int:
+        return self.layers[0].w
+
+    @property
+    def h(self) -> int:
+        return self.layers[0].h
+
+    def bands(self) -> Iterator[tuple[int, Frame]]:
+        for parts in zip(*(layer.bands() for layer in self.layers)):
+            yield parts[0][0], flatten_frames((band for _, band in parts), self.blends)
+
+    def rows(self) -> Iterator[bytes]:
+        for _, band in self.bands():
+            yield from band.rows()
+
+
+def webp_dimensions(path: Path) -> tuple[int, int]:
+    with path.open('rb') as f:
+        head = f.read(30)
+    if head[:4] != b'RIFF' or head[8:12] != b'WEBP':
+        raise ValueError(f'Not a WebP file: {path}')
+    chunk = head[12:16]
+    if chunk == b'VP8X':
+        return 1 + int.from_bytes(head[24:27], 'little'), 1 + int.from_bytes(head[27:30], 'little')
+    if chunk == b'VP8L':
+        bits = int.from_bytes(head[21:25], 'little')
+        return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+    if chunk == b'VP8 ':
+        return int.from_bytes(head[26:28], 'little') & 0x3FFF, int.from_bytes(head[28:30], 'little') & 0x3FFF
+    raise ValueError(f'Unknown WebP chunk {chunk!r}: {path}')
+
+
+def write_srcset_manifest(
+    path: Path,
+    previews: dict[str, dict[str, object]] | None = None,
+    overlays: dict[str, list[dict[str, object]]] | None = None,
+) -> None:
+    """Record every layer variant on disk as event -> layer -> variants -> width -> file, size and bytes.
+
+    Built from the files rather than the current run, so a partial rebuild
+    (--events, a narrower --widths) never drops variants built earlier.
+    previews (BuildCache.previews) add each variant's occupied bbox, and the
+    layer's dominant colour and inline placeholder from its widest variant,
+    so the app can paint and plan preloads before any WebP arrives. Each
+    variant's formats list every encoding on disk, most preferred first, with
+    its MIME type for <picture> sources. overlays (BuildCache.overlays) list
+    the texture tiles a tiled layer is shown with, to be repeated over it from
+    `top` down; the tiles themselves are listed under `textures`.
+    """
+    previews = previews or {}
+    overlays = overlays or {}
+    used: set[str] = set()
+    events: dict[str, dict[str, dict[str, object]]] = {}
+    for event_id in EVENTS:
+        event_dir = ROOT / event_id
+        if not event_dir.is_dir():
+            continue
+        for layer in (*LAYERS, FLAT_LAYER):
+            variants: dict[int, Path] = {}
+            for file in event_dir.glob(f'{layer}*.webp'):
+                suffix = file.stem[len(layer):]
+                if suffix == '':
+                    variants[W] = file
+                elif suffix[0] == '-' and suffix[1:].isdigit():
+                    variants[int(suffix[1:])] = file
+            if not variants:
+                continue
+            entry: dict[str, object] = {'color': None, 'placeholder': None, 'variants': {}}
+            for width, file in sorted(variants.items()):
+                w, h = webp_dimensions(file)
+                preview = previews.get(f'{event_id}/{variant_name(layer, width)}')
+                entry['variants'][str(width)] = {
+                    'file': file.relative_to(path.parent).as_posix(),
+                    'width': w,
+                    'height': h,
+                    'bytes': file.stat().st_size,
+                    'bbox': preview['bbox'] if preview else None,
+                    'formats': {
+                        fmt: {
+                            'file': sibling.relative_to(path.parent).as_posix(),
+                            'bytes': sibling.stat().st_size,
+                            'type': mime,
+                        }
+                        for fmt, mime in FORMAT_TYPES.items()
+                        if (sibling := file.with_suffix(f'.{fmt}')).exists()
+                    },
+                }
+                if preview:
+                    entry['color'] = preview['color']
+                    entry['placeholder'] = preview['placeholder']
+                refs = overlays.get(f'{event_id}/{variant_name(layer, width)}')
+                if refs is not None:
+                    entry['textures'] = refs
+                    used.update(ref['texture'] for ref in refs)
+            events.setdefault(event_id, {})[layer] = entry
+    manifest: dict[str, object] = {'version': 2, 'events': events}
+    textures: dict[str, dict[str, object]] = {}
+    for name in sorted(used):
+        file = TEXTURE_DIR / f'{name}.webp'
+        if file.exists():
+            w, h = webp_dimensions(file)
+            textures[name] = {
+                'file': file.relative_to(path.parent).as_posix(),
+                'width': w,
+                'height': h,
+                'bytes': file.stat().st_size,
+            }
+    if textures:
+        manifest['textures'] = textures
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2) + '\n')
+    os.replace(tmp, path)
+
+
+def report_coverage(
+    event_ids: list[str],
+    engine_name: str,
+    widths: Iterable[int] = (W,),
+    blend: str = 'over',
+    particles: str = 'sparse',
+) -> None:
+    for event_id in dict.fromkeys(event_ids):
+        for layer in LAYERS:
+            for width in widths:
+                stats = rasterize_layer(event_id, layer, engine_name, width, blend, particles).coverage()
+                x0, y0, x1, y1 = stats['bbox']
+                print(
+                    f'{event_id}/{variant_name(layer, width)}: bbox {x0},{y0}-{x1},{y1} '
+                    f'({stats["bbox_fraction"]:.1%} of canvas), '
+                    f'covered {stats["coverage"]:.2%}, '
+                    f'tiles {stats["tiles"]}/{stats["tiles_total"]}'
+                )
+
+
+BENCH_REPEAT = 3
+BENCH_VERSION = 1
+# Cases under this in both runs are timer noise, not regressions.
+BENCH_NOISE_FLOOR = 0.005
+
+BENCH_PRIMITIVES: dict[str, Callable[[Raster], None]] = {
+    'fill_gradient': lambda c: c.fill_gradient((42, 30, 24), (196, 150, 112)),
+    'add_glow': lambda c: c.add_glow((236, 184, 122)),
+    'add_grain': lambda c: c.add_grain(10, 17),
+    'add_vignette': lambda c: c.add_vignette(0.5),
+    'add_ember_haze': lambda c: c.add_ember_haze(),
+    'scatter_specks': lambda c: c.scatter_specks(0, 2, (3, 2), 711, 0.9972, (236, 178, 122), 130),
+    'soft_ellipse': lambda c: c.soft_ellipse(W * 0.5, H * 0.58, 420, 230, (230, 205, 180), 200, 0.36),
+    'soft_rect': lambda c: c.soft_rect(420, 360, 1180, 760, (92, 70, 56), 205, 14),
+    'soft_line': lambda c: c.soft_line(0, 700, W, 640, 18, (92, 70, 56), 175),
+}
+
+
+def bench_stages() -> Iterator[tuple[str, str, str]]:
+    """One (case, event, layer) per distinct profile, motif and accent."""
+    for layer, field in (('bg', 'profile'), ('mid', 'motif'), ('fg', 'accent')):
+        first: dict[str, str] = {}
+        for event_id, visual in EVENTS.items():
+            first.setdefault(getattr(visual, field), event_id)
+        for value, event_id in first.items():
+            yield f'{layer}/{value}', event_id, layer
+
+
+def best_time(run: Callable[[], object], setup: Callable[[], object] | None = None) -> tuple[float, object]:
+    best, result = math.inf, None
+    for _ in range(BENCH_REPEAT):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        result = run(arg) if setup else run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(
+    engine_name: str,
+    widths: Iterable[int],
+    encoder: WebpEncoder | None,
+    blend: str = 'over',
+    particles: str = 'sparse',
+) -> dict[str, object]:
+    """Time primitives, layer builders, PNG writes and encodes; return the JSON-ready report.
+
+    Each case keeps the best of BENCH_REPEAT runs. Throughput is counted over
+    the pixels a case touched (its dirty region), not the whole canvas.
+    """
+    engine_cls = resolve_engine(engine_name)
+    engine_name = next(name for name, cls in ENGINES.items() if cls is engine_cls)
+    engine = functools.partial(engine_cls, blend=blend, particles=particles)
+    results: dict[str, dict[str, float]] = {}
+
+    def record(case: str, seconds: float, pixels: int) -> None:
+        results[case] = {'seconds': seconds, 'pixels': pixels, 'mpx_per_s': pixels / seconds / 1e6 if seconds else 0.0}
+        print(f'{case:<44} {seconds * 1000:10.2f} ms {results[case]["mpx_per_s"]:10.2f} Mpx/s')
+
+    def touched(canvas: Raster) -> int:
+        if canvas.dirty is None:
+            return 0
+        x0, y0, x1, y1 = canvas.dirty
+        return (x1 - x0) * (y1 - y0)
+
+    with tempfile.TemporaryDirectory(prefix='scene-bench-') as tmp:
+        for width in widths:
+            w, h = canvas_size(width)
+            prefix = f'{engine_name}/{width}'
+            for name, draw in BENCH_PRIMITIVES.items():
+                seconds, canvas = best_time(lambda c: draw(c) or c, lambda: engine(width))
+                record(f'{prefix}/primitive/{name}', seconds, touched(canvas))
+            frames: dict[str, Frame] = {}
+            for case, event_id, layer in bench_stages():
+                seconds, canvas = best_time(lambda: LAYER_BUILDERS[layer](event_id, EVENTS[event_id], engine, width))
+                record(f'{prefix}/{case}', seconds, touched(canvas))
+                frames.setdefault(layer, canvas.frame())
+            frame = frames['bg']
+            for level, filter_mode in ((1, 'none'), (9, 'adaptive')):
+                path = Path(tmp) / 'bench.png'
+                seconds, _ = best_time(lambda: write_png_rows(path, w, h, frame.rows(), level, filter_mode))
+                record(f'{prefix}/png/level{level}-{filter_mode}', seconds, w * h)
+            if encoder is not None:
+                path = Path(tmp) / 'bench.webp'
+                seconds, _ = best_time(lambda: encoder.encode(frame, path))
+                record(f'{prefix}/encode/{encoder.name}', seconds, w * h)
+
+    return {
+        'version': BENCH_VERSION,
+        'generator': GENERATOR_VERSION,
+        'engine': engine_name,
+        'blend': blend,
+        'particles': particles,
+        'encoder': encoder.codec if encoder else None,
+        'repeat': BENCH_REPEAT,
+        'python': platform.python_version(),
+        'numpy': np.__version__ if np is not None else None,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+
+def compare_benchmark(report: dict[str, object], baseline: dict[str, object], tolerance: float) -> int:
+    """Print per-case ratios against a baseline report; return the number of regressions."""
+    regressions = 0
+    before = baseline.get('results', {})
+    for case, now in report['results'].items():
+        if case not in before:
+            print(f'{case:<44} new')
+            continue
+        ratio = now['seconds'] / before[case]['seconds'] if before[case]['seconds'] else math.inf
+        verdict = ''
+        if max(now['seconds'], before[case]['seconds']) < BENCH_NOISE_FLOOR:
+            verdict = '  (below noise floor)'
+        elif ratio > 1 + tolerance:
+            verdict = '  SLOWER'
+            regressions += 1
+        elif ratio < 1 / (1 + tolerance):
+            verdict = '  faster'
+        print(f'{case:<44} {ratio:6.2f}x baseline{verdict}')
+    return regressions
+
+
+GOLDEN_VERSION = 1
+# A reduced size catches scaling mistakes the design width alone would hide.
+GOLDEN_WIDTHS = (W // 4, W)
+
+
+def pixel_error(w: int, actual: bytes, reference: bytes) -> dict[str, object]:
+    """Max and mean absolute per-channel error of two w-wide RGBA canvases, and the box they differ in."""
+    stride = w * 4
+    peak = total = 0
+    x0, y0, x1, y1 = w, len(actual) // stride, 0, 0
+    for y in range(len(actual) // stride):
+        row, ref = actual[y * stride:(y + 1) * stride], reference[y * stride:(y + 1) * stride]
+        if row == ref:
+            continue
+        diffs = [abs(a - b) for a, b in zip(row, ref)]
+        peak = max(peak, max(diffs))
+        total += sum(diffs)
+        changed = [i // 4 for i, d in enumerate(diffs) if d]
+        x0, x1 = min(x0, changed[0]), max(x1, changed[-1] + 1)
+        y0, y1 = min(y0, y), y + 1
+    return {'max_error': peak, 'mean_error': total / len(actual), 'bbox': [x0, y0, x1, y1]}
+
+
+def check_golden_layer(
+    event_id: str,
+    layer: str,
+    width: int,
+    digest: str | None,
+    engine_name: str,
+    directory: Path,
+    blend: str = 'over',
+    particles: str = 'sparse',
+    update: bool = False,
+) -> dict[str, object]:
+    """Render one raw layer and compare it with its reference; with update, make it the reference.
+
+    Pool entry point. A matching digest settles it without touching the
+    stored pixels; otherwise the error is measured against them, when they are
+    still the pixels that digest was taken from.
+    """
+    pixels = rasterize_layer(event_id, layer, engine_name, width, blend, particles).tobytes()
+    actual = hashlib.sha256(pixels).hexdigest()
+    path = directory / 'pixels' / f'{event_id}.{variant_name(layer, width)}.rgba.z'
+    if update:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(zlib.compress(pixels, 1))
+        os.replace(tmp, path)
+        return {'digest': actual}
+    if actual == digest:
+        return {'digest': actual, 'exact': True}
+    result: dict[str, object] = {'digest': actual, 'exact': False}
+    try:
+        reference = zlib.decompress(path.read_bytes())
+    except (OSError, zlib.error):
+        return result
+    if hashlib.sha256(reference).hexdigest() == digest and len(reference) == len(pixels):
+        result.update(pixel_error(canvas_size(width)[0], pixels, reference))
+    return result
+
+
+def optimize_cases(width: int = W // 4) -> dict[str, DisplayList]:
+    """Small display lists whose culling and batching optimize() must not change the look of."""
+    cases = {}
+    partly = DisplayList(width)
+    partly.soft_segments([(100, 100, 200, 100), (1000, 500, 1200, 500)], 6, (240, 200, 150), 180)
+    partly.soft_rect(50, 50, 300, 200, (30, 20, 10), 255)
+    cases['batch partly under an opaque rect'] = partly
+    hidden = DisplayList(width)
+    hidden.soft_ellipse(400, 300, 60, 40, (200, 80, 40), 200)
+    hidden.soft_segments([(350, 300, 450, 300)], 4, (250, 230, 200), 160)
+    hidden.soft_segments([(900, 600, 1100, 620)], 4, (250, 230, 200), 160)
+    hidden.soft_rect(200, 150, 700, 450, (10, 10, 20), 255)
+    cases['shapes fully under an opaque rect'] = hidden
+    return cases
+
+
+def check_optimize(engine_name: str) -> int:
+    """Replay each optimize case raw and optimized on the engine; return how many differ."""
+    engine = resolve_engine(engine_name)
+    failed = 0
+    for name, display in optimize_cases().items():
+        raw = display.replay(engine(display.width)).tobytes()
+        optimized = display.optimize().replay(engine(display.width)).tobytes()
+        if raw != optimized:
+            failed += 1
+            error = pixel_error(canvas_size(display.width)[0], optimized, raw)
+            print(f'optimize: {name}: max error {error["max_error"]}, mean {error["mean_error"]:.4g}')
+    return failed
+
+
+def golden_tolerance(value: str) -> tuple[str, int, float]:
+    # ENGINE=MAX or ENGINE=MAX,MEAN: the largest per-channel error, and the mean, that still pass.
+    engine, _, limits = value.partition('=')
+    peak, _, mean = limits.partition(',')
+    if engine not in ('python', 'span', 'numpy') or not peak:
+        raise argparse.ArgumentTypeError(f'expected ENGINE=MAX[,MEAN] for python, span or numpy: {value}')
+    try:
+        return engine, int(peak), float(mean) if mean else float(peak)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected ENGINE=MAX[,MEAN] with numeric limits: {value}') from None
+
+
+def run_golden(
+    event_ids: list[str],
+    directory: Path,
+    engine_name: str,
+    jobs: int,
+    blend: str = 'over',
+    particles: str = 'sparse',
+    update: bool = False,
+    tolerances: dict[str, tuple[int, float]] | None = None,
+) -> int:
+    """Check every event's raw layers at GOLDEN_WIDTHS against directory's references; return the failures.
+
+    directory/digests.json holds one SHA-256 per layer and width and is meant
+    to be committed; directory/pixels/ keeps the reference canvases the error
+    report is measured against and can be regenerated. Layers are rendered
+    across a process pool, costliest first. An engine passes a layer when it is
+    byte-identical, or when its error is within that engine's tolerance.
+    The optimize_cases() display lists are also checked to replay the same
+    optimized as raw.
+    """
+    engine = next(name for name, cls in ENGINES.items() if cls is resolve_engine(engine_name))
+    peak_limit, mean_limit = (tolerances or {}).get(engine, (0, 0.0))
+    manifest_path = directory / 'digests.json'
+    manifest: dict[str, object] = {}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+    if not update:
+        if manifest.get('version') != GOLDEN_VERSION:
+            print(f'No references in {manifest_path}; create them with --update-golden', file=sys.stderr)
+            return 1
+        if (manifest['blend'], manifest['particles']) != (blend, particles):
+            print(
+                f'References are for --blend {manifest["blend"]} --particles {manifest["particles"]}',
+                file=sys.stderr,
+            )
+            return 1
+    digests: dict[str, str] = manifest.get('layers', {}) if manifest.get('version') == GOLDEN_VERSION else {}
+
+    units = [(e, layer, width) for e in dict.fromkeys(event_ids) for layer in LAYERS for width in GOLDEN_WIDTHS]
+    check = functools.partial(
+        check_golden_layer,
+        engine_name=engine,
+        directory=directory,
+        blend=blend,
+        particles=particles,
+        update=update,
+    )
+    keys = {unit: f'{unit[0]}/{variant_name(*unit[1:])}' for unit in units}
+    ordered = by_cost(units)
+    args = [(*unit, digests.get(keys[unit])) for unit in ordered]
+    if jobs > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=configure_fields, initargs=(FIELDS.limit, FIELDS.directory)
+        ) as pool:
+            results = dict(zip(ordered, pool.map(check, *zip(*args))))
+    else:
+        results = dict(zip(ordered, (check(*arg) for arg in args)))
+
+    if update:
+        digests.update((keys[unit], results[unit]['digest']) for unit in units)
+        manifest = {
+            'version': GOLDEN_VERSION,
+            'engine': engine,
+            'blend': blend,
+            'particles': particles,
+            'widths': list(GOLDEN_WIDTHS),
+            'layers': dict(sorted(digests.items())),
+        }
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest, indent=2) + '\n')
+        print(f'Wrote {len(units)} reference(s) from the {engine} engine to {directory}')
+        return 0
+
+    regressions = check_optimize(engine)
+    failed = within = 0
+    for unit in units:
+        result, key = results[unit], keys[unit]
+        if result['exact']:
+            continue
+        if key not in digests:
+            failed += 1
+            print(f'{key}: no reference')
+        elif 'max_error' not in result:
+            failed += 1
+            print(f'{key}: differs; reference pixels missing or stale, run --update-golden from a known-good tree')
+        else:
+            x0, y0, x1, y1 = result['bbox']
+            ok = result['max_error'] <= peak_limit and result['mean_error'] <= mean_limit
+            within += ok
+            failed += not ok
+            print(
+                f'{key}: max error {result["max_error"]}, mean {result["mean_error"]:.4g}, '
+                f'in {x0},{y0}-{x1},{y1}{"  (within tolerance)" if ok else ""}'
+            )
+    exact = len(units) - failed - within
+    print(f'{engine}: {exact} exact, {within} within tolerance, {failed} failed of {len(units)} layer(s).')
+    return failed + regressions
+
+
+def report_profile(profiler: StageTimer) -> None:
+    totals = StageTimer()
+    for path, (calls, seconds) in profiler.stages.items():
+        _, _, rest = path.partition('/')
+        if rest:
+            entry = totals.stages.setdefault(rest, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+    print('all events')
+    print('\n'.join(totals.report()))
+
+
+def export_layer_png(
+    event_id: str,
+    layer: str,
+    width: int,
+    engine_name: str,
+    out_dir: Path,
+    level: int,
+    filter_mode: str,
+    blend: str = 'over',
+    particles: str = 'sparse',
+    band_rows: int | None = None,
+) -> Path:
+    path = out_dir / event_id / f'{variant_name(layer, width)}.png'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.png.tmp')
+    if band_rows:
+        frame = BandedFrame(event_id, layer, raster_factory(engine_name, blend, particles), width, band_rows)
+    else:
+        frame = rasterize_layer(event_id, layer, engine_name, width, blend, particles)
+    write_png_rows(tmp, frame.w, frame.h, frame.rows(), level, filter_mode)
+    os.replace(tmp, path)
+    return path
+
+
+def export_pngs(
+    event_ids: list[str],
+    out_dir: Path,
+    engine_name: str,
+    level: int,
+    filter_mode: str,
+    jobs: int,
+    widths: Iterable[int] = (W,),
+    blend: str = 'over',
+    particles: str = 'sparse',
+    band_rows: int | None = None,
+) -> None:
+    units = [(event_id, layer, width) for event_id in dict.fromkeys(event_ids) for layer in LAYERS for width in widths]
+    export = functools.partial(
+        export_layer_png,
+        engine_name=engine_name,
+        out_dir=out_dir,
+        level=level,
+        filter_mode=filter_mode,
+        blend=blend,
+        particles=particles,
+        band_rows=band_rows,
+    )
+    if jobs > 1:
+        ordered = by_cost(units)
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=configure_fields, initargs=(FIELDS.limit, FIELDS.directory)
+        ) as pool:
+            done = dict(zip(ordered, pool.map(export, *zip(*ordered))))
+        paths = [done[unit] for unit in units]
+    else:
+        paths = [export(*unit) for unit in units]
+    for path in paths:
+        print(f'Exported {path}')
+
+
+def export_svgs(event_ids: list[str], out_dir: Path, particles: str = 'sparse') -> None:
+    """Write <out_dir>/<event-id>/{bg,mid,fg}.svg and report each against its design-width WebP.
+
+    Each layer's display list is replayed onto an SvgCanvas, so the SVG shows
+    the same scene the rasters draw, at any width. The report gives raw and
+    deflated SVG bytes (what a server sends with compression on), the WebP
+    bytes when that layer has been built, and the passes the SVG approximates.
+    """
+    svg_total = webp_total = 0
+    for event_id in dict.fromkeys(event_ids):
+        for layer in LAYERS:
+            canvas = layer_display_list(event_id, layer).replay(SvgCanvas(particles))
+            document = canvas.document().encode('utf-8')
+            path = out_dir / event_id / f'{layer}.svg'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(document)
+            line = f'{event_id}/{layer}: svg {len(document):,} B ({len(zlib.compress(document, 9)):,} B deflated)'
+            webp = ROOT / event_id / f'{layer}.webp'
+            if webp.exists():
+                size = webp.stat().st_size
+                svg_total += len(document)
+                webp_total += size
+                line += f', webp {size:,} B ({size / len(document):.1f}x)'
+            if canvas.approximated:
+                line += f'; approximates {", ".join(sorted(canvas.approximated))}'
+            print(line)
+    if webp_total:
+        print(f'Layers with a WebP: svg {svg_total:,} B against webp {webp_total:,} B ({webp_total / svg_total:.1f}x).')
+
+
+def generate_event(
+    event_id: str,
+    encoder: WebpEncoder,
+    overwrite: bool,
+    cache: BuildCache,
+    engine: Callable[[int], Raster] = PythonRaster,
+    widths: Iterable[int] = (W,),
+    band_rows: int | None = None,
+    flatten: bool = False,
+) -> None:
+    stale = stale_layers(event_id, overwrite, cache, widths, flatten)
+    if not stale:
+        return
+
+    targets = layer_targets(event_id, widths, flatten)
+    (ROOT / event_id).mkdir(parents=True, exist_ok=True)
+    # Layers rebuilt in this call, kept for the flattened scene that follows them.
+    frames: dict[tuple[str, int], Frame] = {}
+
+    def rasterize(layer: str, width: int) -> Frame:
+        with profile_stage('record'):
+            display = layer_display_list(event_id, layer, width, cache.tiled)
+        with profile_stage('rasterize'):
+            canvas = display.replay(engine(width))
+        with profile_stage('crop'):
+            return canvas.frame()
+
+    for layer, width in stale:
+        known = cache.settings(event_id, layer, width)
+        with profile_stage(variant_name(layer, width)):
+            if band_rows:
+                if layer == FLAT_LAYER:
+                    parts = tuple(BandedFrame(event_id, part, engine, width, band_rows, cache.tiled) for part in LAYERS)
+                    frame = FlatFrame(parts, scene_blends(event_id))
+                else:
+                    frame = BandedFrame(event_id, layer, engine, width, band_rows, cache.tiled)
+                # Bands are rasterized as the encoder pulls rows, so both share one stage.
+                with profile_stage(f'banded encode ({encoder.name})'):
+                    preview, settings = encode_layer(
+                        encoder, frame, targets[(layer, width)], cache.search, known, cache.extras
+                    )
+            else:
+                if layer == FLAT_LAYER:
+                    # Up-to-date layers are rasterized again rather than decoded from their lossy WebP.
+                    parts = [
+                        frames.pop((part, width)) if (part, width) in frames else rasterize(part, width)
+                        for part in LAYERS
+                    ]
+                    with profile_stage('flatten'):
+                        frame = flatten_frames(parts, scene_blends(event_id))
+                else:
+                    frame = rasterize(layer, width)
+                    if flatten:
+                        frames[(layer, width)] = frame
+                with profile_stage(f'encode ({encoder.name})'):
+                    preview, settings = encode_layer(
+                        encoder, frame, targets[(layer, width)], cache.search, known, cache.extras
+                    )
+        prune_formats(targets[(layer, width)], cache.extras)
+        cache.record(event_id, layer, width, preview, settings)
+    cache.save()
+
+
+def generate_parallel(
+    event_ids: list[str],
+    encoder: WebpEncoder,
+    overwrite: bool,
+    cache: BuildCache,
+    engine_name: str,
+    jobs: int,
+    widths: Iterable[int] = (W,),
+    blend: str = 'over',
+    particles: str = 'sparse',
+    band_rows: int | None = None,
+    flatten: bool = False,
+) -> int:
+    """Fan stale (event, layer, width) units out to a process pool; return the number of failed events.
+
+    Workers rasterize while a thread pool encodes finished layers into a staging
+    directory, so encodes overlap with rasterization. With band_rows a layer is
+    never whole in any process, so workers stream their bands straight into the
+    encoder instead. An event's layers are moved into ROOT/<event-id>/ only once
+    all of them encoded, and progress is reported in input order regardless of
+    completion order. Units are submitted costliest first by display-list estimate.
+    A flattened scene is composited in the encode pool from its layers' frames
+    as soon as all three are back, rasterizing any up-to-date layer for it.
+    """
+    event_ids = list(dict.fromkeys(event_ids))
+    widths = list(widths)
+    scheduled = {event_id: stale_layers(event_id, overwrite, cache, widths, flatten) for event_id in event_ids}
+    units = by_cost((event_id, layer, width) for event_id, stale in scheduled.items() for layer, width in stale)
+    encoded = set(units)
+    # (event, width) -> layer frames collected so far, for scenes still waiting on their layers.
+    flat: dict[tuple[str, int], dict[str, Frame]] = {
+        (event_id, width): {} for event_id, layer, width in units if layer == FLAT_LAYER and not band_rows
+    }
+
+    ROOT.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix='.staging-', dir=ROOT))
+    errors: dict[tuple[str, str, int], BaseException | None] = {}
+    results: dict[tuple[str, str, int], tuple[dict[str, object], WebpSettings]] = {}
+    failed = 0
+    reported = 0
+
+    def report_ready() -> None:
+        nonlocal failed, reported
+        while reported < len(event_ids):
+            event_id = event_ids[reported]
+            units = scheduled[event_id]
+            prefix = f'[{reported + 1}/{len(event_ids)}] {event_id}'
+            if not units:
+                print(f'{prefix}: up to date')
+            elif all((event_id, *unit) in errors for unit in units):
+                problems = [(unit, errors[(event_id, *unit)]) for unit in units if errors[(event_id, *unit)]]
+                if problems:
+                    failed += 1
+                    for unit, exc in problems:
+                        print(f'{prefix}/{variant_name(*unit)}: {exc}', file=sys.stderr)
+                else:
+                    targets = layer_targets(event_id, widths, flatten)
+                    (ROOT / event_id).mkdir(parents=True, exist_ok=True)
+                    for unit in units:
+                        staged = staging / f'{event_id}.{variant_name(*unit)}.webp'
+                        os.replace(staged, targets[unit])
+                        for extra in cache.extras:
+                            suffix = f'.{extra.format}'
+                            os.replace(staged.with_suffix(suffix), targets[unit].with_suffix(suffix))
+                        prune_formats(targets[unit], cache.extras)
+                        cache.record(event_id, *unit, *results[(event_id, *unit)])
+                    cache.save()
+                    print(f'{prefix}: generated {", ".join(variant_name(*unit) for unit in units)}')
+            else:
+                return
+            reported += 1
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=configure_fields, initargs=(FIELDS.limit, FIELDS.directory)
+        ) as raster_pool, ThreadPoolExecutor(max_workers=jobs) as encode_pool:
+            jobs_by_future: dict[Future, tuple[str, str, str, int]] = {}
+            engine = raster_factory(engine_name, blend, particles)
+            for event_id, layer, width in units:
+                if band_rows:
+                    if layer == FLAT_LAYER:
+                        parts = tuple(
+                            BandedFrame(event_id, part, engine, width, band_rows, cache.tiled) for part in LAYERS
+                        )
+                        frame = FlatFrame(parts, scene_blends(event_id))
+                    else:
+                        frame = BandedFrame(event_id, layer, engine, width, band_rows, cache.tiled)
+                    webp_path = staging / f'{event_id}.{variant_name(layer, width)}.webp'
+                    known = cache.settings(event_id, layer, width)
+                    fut = raster_pool.submit(encode_layer, encoder, frame, webp_path, cache.search, known, cache.extras)
+                    jobs_by_future[fut] = ('encode', event_id, layer, width)
+                    continue
+                if layer == FLAT_LAYER:
+                    # A scene rasterizes nothing itself, only whichever of its layers aren't being rebuilt anyway.
+                    todo = [part for part in LAYERS if (event_id, part, width) not in encoded]
+                else:
+                    todo = [layer]
+                for part in todo:
+                    fut = raster_pool.submit(
+                        rasterize_layer, event_id, part, engine_name, width, blend, particles, cache.tiled
+                    )
+                    jobs_by_future[fut] = ('raster', event_id, part, width)
+
+            def encode(event_id: str, layer: str, width: int, frame: Frame | FlatFrame) -> None:
+                webp_path = staging / f'{event_id}.{variant_name(layer, width)}.webp'
+                known = cache.settings(event_id, layer, width)
+                enc = encode_pool.submit(encode_layer, encoder, frame, webp_path, cache.search, known, cache.extras)
+                jobs_by_future[enc] = ('encode', event_id, layer, width)
+                pending.add(enc)
+
+            report_ready()
+            pending = set(jobs_by_future)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    stage, event_id, layer, width = jobs_by_future.pop(fut)
+                    exc = fut.exception()
+                    if stage == 'encode':
+                        if exc is None:
+                            results[(event_id, layer, width)] = fut.result()
+                        errors[(event_id, layer, width)] = exc
+                        continue
+                    if (event_id, layer, width) in encoded:
+                        if exc is None:
+                            encode(event_id, layer, width, fut.result())
+                        else:
+                            errors[(event_id, layer, width)] = exc
+                    parts = flat.get((event_id, width))
+                    if parts is None:
+                        continue
+                    if exc is not None:
+                        del flat[(event_id, width)]
+                        errors[(event_id, FLAT_LAYER, width)] = exc
+                        continue
+                    parts[layer] = fut.result()
+                    if len(parts) == len(LAYERS):
+                        del flat[(event_id, width)]
+                        scene = FlatFrame(tuple(parts[part] for part in LAYERS), scene_blends(event_id))
+                        encode(event_id, FLAT_LAYER, width, scene)
+                report_ready()
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return failed
+
+
+SERVE_CACHE_LIMIT = 512 << 20
+
+
+class FrameCache:
+    """Bounded LRU of rasterized layer frames for the render worker.
+
+    Frames are cropped to their occupied box, so the budget counts the pixels
+    actually held; they are evicted least recently used once their total size
+    passes limit bytes.
+    """
+
+    def __init__(self, limit: int = SERVE_CACHE_LIMIT) -> None:
+        self.limit = limit
+        self.frames: OrderedDict[tuple[object, ...], Frame] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[object, ...], build: Callable[[], Frame]) -> tuple[Frame, bool]:
+        """Return the frame for key, building it on a miss, and whether it was cached."""
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame, True
+        self.misses += 1
+        frame = build()
+        self.frames[key] = frame
+        self.size += len(frame.pixels)
+        while self.size > self.limit and self.frames:
+            _, old = self.frames.popitem(last=False)
+            self.size -= len(old.pixels)
+        return frame, False
+
+
+class RenderWorker:
+    """Long-lived process answering JSON-lines render requests.
+
+    Each request is one line holding an object such as
+    {"id": 1, "op": "render", "event": "battle-cannae", "layer": "bg", "width": 960, "format": "webp"}
+    and gets exactly one reply line carrying the same id: {"ok": true, "path",
+    "bytes", "cached", "timings"} for a render, or {"ok": false, "error"}. An
+    optional "out" overrides the output path, which otherwise mirrors the
+    asset tree under out_dir. {"op": "stats"} reports the frame cache.
+
+    Encoders are probed once at startup. Rasterized frames stay in a FrameCache
+    and display lists and field planes in their own caches, so rendering a
+    layer again only pays the encode. The worker renders the scene code it was
+    started with; restart it after editing this script.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        engine: Callable[[int], Raster],
+        encoder: WebpEncoder,
+        extras: Iterable[LayerEncoder] = (),
+        cache_limit: int = SERVE_CACHE_LIMIT,
+        tiled: bool = False,
+    ) -> None:
+        self.out_dir = out_dir
+        self.engine = engine
+        self.encoders: dict[str, LayerEncoder] = {'webp': encoder, **{extra.format: extra for extra in extras}}
+        self.frames = FrameCache(cache_limit)
+        self.tiled = tiled
+
+    def frame(self, event_id: str, layer: str, width: int) -> tuple[Frame, bool]:
+        def build() -> Frame:
+            if layer == FLAT_LAYER:
+                return flatten_frames((self.frame(event_id, part, width)[0] for part in LAYERS), scene_blends(event_id))
+            return layer_display_list(event_id, layer, width, self.tiled).replay(self.engine(width)).frame()
+
+        return self.frames.get((event_id, layer, width), build)
+
+    def render(self, request: dict[str, object]) -> dict[str, object]:
+        event_id = request.get('event')
+        layer = request.get('layer', 'bg')
+        width = request.get('width', W)
+        fmt = request.get('format', 'webp')
+        if event_id not in EVENTS:
+            raise ValueError(f'Unknown event id: {event_id}')
+        if layer not in (*LAYERS, FLAT_LAYER):
+            raise ValueError(f'Unknown layer: {layer}')
+        if not isinstance(width, int) or width < 16:
+            raise ValueError(f'width must be an integer of at least 16 px: {width}')
+        if fmt not in self.encoders:
+            raise ValueError(f'No encoder for format {fmt}; available: {", ".join(self.encoders)}')
+
+        start = time.perf_counter()
+        frame, cached = self.frame(event_id, layer, width)
+        rasterized = time.perf_counter()
+        out = request.get('out')
+        path = Path(out) if out else self.out_dir / event_id / f'{variant_name(layer, width)}.{fmt}'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Readers polling the path never see a half-written file.
+        tmp = path.with_name(f'.{path.stem}.tmp{path.suffix}')
+        self.encoders[fmt].encode(frame, tmp)
+        os.replace(tmp, path)
+        encoded = time.perf_counter()
+        return {
+            'path': str(path),
+            'bytes': path.stat().st_size,
+            'cached': cached,
+            'timings': {
+                'rasterize_ms': round((rasterized - start) * 1000, 3),
+                'encode_ms': round((encoded - rasterized) * 1000, 3),
+            },
+        }
+
+    def stats(self) -> dict[str, object]:
+        cache = self.frames
+        return {'frames': len(cache.frames), 'bytes': cache.size, 'hits': cache.hits, 'misses': cache.misses}
+
+    def handle(self, line: str) -> dict[str, object]:
+        request: object = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+            op = request.get('op', 'render')
+            if op == 'render':
+                reply = self.render(request)
+            elif op == 'stats':
+                reply = self.stats()
+            else:
+                raise ValueError(f'Unknown op: {op}')
+            reply = {'ok': True, **reply}
+        except Exception as exc:  # One bad request must not take the worker down with it.
+            reply = {'ok': False, 'error': f'{type(exc).__name__}: {exc}'}
+        return {'id': request.get('id') if isinstance(request, dict) else None, **reply}
+
+    def serve(self, requests: Iterable[str], replies: TextIO) -> None:
+        replies.write(json.dumps({'ready': True, 'formats': list(self.encoders)}) + '\n')
+        replies.flush()
+        for line in requests:
+            if line.strip():
+                replies.write(json.dumps(self.handle(line)) + '\n')
+                replies.flush()
+
+
+def positive_rows(value: str) -> int:
+    rows = int(value)
+    if rows < 1:
+        raise argparse.ArgumentTypeError(f'band must be at least 1 row: {value}')
+    return rows
+
+
+def positive_width(value: str) -> int:
+    width = int(value)
+    if width < 16:
+        raise argparse.ArgumentTypeError(f'width must be at least 16 px: {value}')
+    return width
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Generate cinematic scene assets')
+    parser.add_argument(
+        '--events',
+        nargs='*',
+        help='Event ids to generate. Default: migration set of 15 events.',
+    )
+    parser.add_argument('--all', action='store_true', help='Generate all 18 events')
+    parser.add_argument('--overwrite', action='store_true', help='Rebuild layers even when their fingerprint is current')
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help=(
+            'Report layers whose fingerprint is stale without building, and with --tiles the texture tiles too. '
+            'Exits 1 if any are stale.'
+        ),
+    )
+    parser.add_argument(
+        '--coverage',
+        action='store_true',
+        help='Rasterize and report each layer\'s occupied bounding box and coverage without encoding.',
+    )
+    parser.add_argument(
+        '--engine',
+        choices=('auto', 'numpy', 'span', 'python'),
+        default='auto',
+        help=(
+            'Raster engine. Default: numpy when installed, otherwise the stdlib span engine. '
+            'python is the per-pixel reference.'
+        ),
+    )
+    parser.add_argument(
+        '--blend',
+        choices=BLEND_MODES,
+        default='over',
+        help=(
+            'Compositing rule. over is Porter-Duff source-over; legacy is the original blend, '
+            'which ignores destination alpha and darkens soft edges on transparent layers. Default: over.'
+        ),
+    )
+    parser.add_argument(
+        '--particles',
+        choices=PARTICLE_MODES,
+        default='sparse',
+        help=(
+            'Speck placement. sparse samples the speck density directly, in time proportional to the speck count; '
+            'scan reproduces the original per-pixel noise threshold scan exactly. Default: sparse.'
+        ),
+    )
+    parser.add_argument(
+        '--encoder',
+        choices=ENCODER_NAMES,
+        default='auto',
+        help=(
+            'WebP encoder backend. Default: cwebp fed raw frames over a pipe, '
+            'a temporary intermediate file for cwebp builds without stdin support, '
+            'or Pillow when cwebp is missing.'
+        ),
+    )
+    parser.add_argument(
+        '--intermediate-format',
+        choices=INTERMEDIATE_FORMATS,
+        default='png',
+        help='Temporary file handed to cwebp by the cwebp-file encoder. pam skips deflate entirely.',
+    )
+    parser.add_argument(
+        '--png-level',
+        type=int,
+        choices=range(10),
+        metavar='0-9',
+        help='zlib level for PNG output. Default: 1 for intermediates, 9 for --png-export.',
+    )
+    parser.add_argument(
+        '--png-filter',
+        choices=PNG_FILTER_MODES,
+        help='PNG row filter. Default: none for intermediates, adaptive for --png-export.',
+    )
+    parser.add_argument(
+        '--png-export',
+        type=Path,
+        metavar='DIR',
+        help='Write lossless <DIR>/<event-id>/{bg,mid,fg}.png instead of building WebP assets.',
+    )
+    parser.add_argument(
+        '--svg-export',
+        type=Path,
+        metavar='DIR',
+        help=(
+            'Write <DIR>/<event-id>/{bg,mid,fg}.svg drawn from the same scenes, and report their size against '
+            'the built WebPs, instead of building WebP assets.'
+        ),
+    )
+    parser.add_argument(
+        '--serve',
+        type=Path,
+        metavar='DIR',
+        help=(
+            'Run as a render worker: read JSON-lines render requests on stdin, write the layers under DIR and '
+            'reply on stdout, keeping rasterized frames cached between requests.'
+        ),
+    )
+    parser.add_argument(
+        '--serve-cache-mb',
+        type=int,
+        default=SERVE_CACHE_LIMIT >> 20,
+        metavar='MB',
+        help=(
+            'Budget for the render worker\'s cached frames, evicted least recently used. '
+            f'Default: {SERVE_CACHE_LIMIT >> 20}.'
+        ),
+    )
+    parser.add_argument(
+        '--widths',
+        type=positive_width,
+        nargs='+',
+        default=[W],
+        metavar='PX',
+        help=(
+            f'Pixel widths to render each layer at, e.g. 640 960 1280 1600 3200. '
+            f'{W} writes <layer>.webp, other widths <layer>-<width>.webp. Default: {W}.'
+        ),
+    )
+    parser.add_argument(
+        '--band-rows',
+        type=positive_rows,
+        metavar='N',
+        help=(
+            'Rasterize each layer in horizontal bands of N rows that stream straight into the encoder or '
+            '--png-export, so peak memory follows the band rather than the frame. Output is identical. '
+            'cwebp and the pillow encoder still hold the whole picture for libwebp.'
+        ),
+    )
+    parser.add_argument(
+        '--target-bytes',
+        type=int,
+        metavar='BYTES',
+        help=(
+            'Search each layer\'s encoder settings for the highest quality within BYTES, keeping the smallest '
+            'result that fits. Sparse layers also try lossless. Chosen settings are recorded in the build cache '
+            'and reused by later builds with the same targets.'
+        ),
+    )
+    parser.add_argument(
+        '--min-psnr',
+        type=float,
+        metavar='DB',
+        help=(
+            'Search each layer\'s encoder settings for the smallest file whose PSNR against the rendered RGBA '
+            '(premultiplied) is at least DB. Combines with --target-bytes. Requires Pillow to decode trials.'
+        ),
+    )
+    parser.add_argument(
+        '--search-jobs',
+        type=int,
+        default=4,
+        metavar='N',
+        help='Trial encodes run at once per layer during an encode search. Default: 4.',
+    )
+    parser.add_argument(
+        '--fresh-search',
+        action='store_true',
+        help='Search again even where the build cache has settings recorded for the current targets.',
+    )
+    parser.add_argument(
+        '--formats',
+        nargs='+',
+        choices=('webp', *FORMAT_ENCODERS),
+        default=['webp'],
+        metavar='FORMAT',
+        help=(
+            f'Formats to write each layer in: webp plus any of {", ".join(FORMAT_ENCODERS)}. WebP is always '
+            'written; the others are encoded from the same rasterization, and skipped when no encoder for them '
+            'is installed. Default: webp.'
+        ),
+    )
+    parser.add_argument(
+        '--tiles',
+        action='store_true',
+        help=(
+            f'Leave grain and specks out of the layers and write them once as seamless {TEXTURE_TILE} px tiles '
+            f'under {TEXTURE_DIR}/, shared by every event with the same texture. The scenes manifest lists '
+            'the tiles each layer is overlaid with.'
+        ),
+    )
+    parser.add_argument(
+        '--flatten',
+        action='store_true',
+        help=(
+            f'Also composite bg, mid and fg into one opaque {FLAT_LAYER}.webp per event and width, from the '
+            'rasterized layers rather than their WebPs, for clients that cannot afford three decodes. Layers '
+            "are stacked with the app's per-profile blend modes and opacities, so the scene looks layered."
+        ),
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Worker processes for (event, layer) units. 0 uses every core. Default: 1 (serial).',
+    )
+    parser.add_argument(
+        '--field-cache',
+        type=Path,
+        metavar='DIR',
+        help='Also keep gradient, glow and vignette planes in DIR and memory-map them on later runs.',
+    )
+    parser.add_argument(
+        '--field-cache-mb',
+        type=int,
+        default=FIELD_CACHE_LIMIT >> 20,
+        metavar='MB',
+        help=(
+            'In-memory budget for cached planes per process, evicted least recently used. '
+            f'Default: {FIELD_CACHE_LIMIT >> 20}.'
+        ),
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Build serially and print time per event, layer, stage and raster primitive.',
+    )
+    parser.add_argument(
+        '--benchmark',
+        type=Path,
+        metavar='JSON',
+        help=(
+            'Time each primitive, layer builder, PNG write and encode at --widths with --engine, '
+            'write the results to JSON and exit.'
+        ),
+    )
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        metavar='JSON',
+        help='With --benchmark, compare against an earlier results file. Exits 1 on any regression.',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='With --baseline, the slowdown ratio above which a case counts as a regression. Default: 0.25.',
+    )
+    parser.add_argument(
+        '--golden',
+        type=Path,
+        metavar='DIR',
+        help=(
+            f'Render every event\'s raw RGBA layers at {" and ".join(map(str, GOLDEN_WIDTHS))} px with --engine and '
+            'compare them with the references in DIR, reporting max and mean per-channel error and the '
+            'differing box. Exits 1 if any layer fails.'
+        ),
+    )
+    parser.add_argument(
+        '--update-golden',
+        action='store_true',
+        help='With --golden, store the rendered layers as the new references instead of comparing.',
+    )
+    parser.add_argument(
+        '--golden-tolerance',
+        type=golden_tolerance,
+        action='append',
+        default=[],
+        metavar='ENGINE=MAX[,MEAN]',
+        help=(
+            'With --golden, let ENGINE pass a layer whose largest per-channel error is at most MAX and whose '
+            'mean error is at most MEAN (default MAX). Repeat per engine. Default: exact for every engine.'
+        ),
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    global PROFILER
+    args = parse_args()
+
+    if args.all:
+        event_ids = list(EVENTS.keys())
+    elif args.events:
+        event_ids = args.events
+    else:
+        event_ids = MIGRATION_EVENTS
+
+    try:
+        engine = raster_factory(args.engine, args.blend, args.particles)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    for event_id in event_ids:
+        if event_id not in EVENTS:
+            print(f'Unknown event id: {event_id}', file=sys.stderr)
+            return 1
+
+    widths = sorted(set(args.widths))
+    configure_fields(max(0, args.field_cache_mb) << 20, args.field_cache)
+    if args.benchmark:
+        try:
+            encoder = select_encoder(args.encoder, args.intermediate_format)
+        except RuntimeError as exc:
+            print(f'Skipping encode cases: {exc}', file=sys.stderr)
+            encoder = None
+        report = run_benchmark(args.engine, widths, encoder, args.blend, args.particles)
+        args.benchmark.parent.mkdir(parents=True, exist_ok=True)
+        args.benchmark.write_text(json.dumps(report, indent=2) + '\n')
+        print(f'Wrote {args.benchmark}')
+        if args.baseline:
+            regressions = compare_benchmark(report, json.loads(args.baseline.read_text()), args.tolerance)
+            print(f'{regressions} regression(s) against {args.baseline}.')
+            return 1 if regressions else 0
+        return 0
+
+    if args.golden:
+        # Every event unless some were named: the point is to catch art changing where nobody looked.
+        golden_events = event_ids if args.events else list(EVENTS)
+        tolerances = {engine: (peak, mean) for engine, peak, mean in args.golden_tolerance}
+        jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+        failed = run_golden(
+            golden_events, args.golden, args.engine, jobs, args.blend, args.particles, args.update_golden, tolerances
+        )
+        return 1 if failed else 0
+
+    if args.coverage:
+        report_coverage(event_ids, args.engine, widths, args.blend, args.particles)
+        return 0
+
+    if args.svg_export:
+        export_svgs(event_ids, args.svg_export, args.particles)
+        return 0
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if args.png_export:
+        level = 9 if args.png_level is None else args.png_level
+        export_pngs(
+            event_ids,
+            args.png_export,
+            args.engine,
+            level,
+            args.png_filter or 'adaptive',
+            jobs,
+            widths,
+            args.blend,
+            args.particles,
+            args.band_rows,
+        )
+        return 0
+
+    try:
+        encoder = select_encoder(
+            args.encoder,
+            args.intermediate_format,
+            1 if args.png_level is None else args.png_level,
+            args.png_filter or 'none',
+        )
+    except RuntimeError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    search = None
+    if args.target_bytes is not None or args.min_psnr is not None:
+        if args.min_psnr is not None and Image is None:
+            print('--min-psnr needs Pillow to decode trial encodes', file=sys.stderr)
+            return 1
+        search = EncodeTarget(args.target_bytes, args.min_psnr, max(1, args.search_jobs))
+    if args.serve:
+        worker = RenderWorker(
+            args.serve,
+            engine,
+            encoder,
+            detect_encoders(FORMAT_ENCODERS),
+            max(0, args.serve_cache_mb) << 20,
+            args.tiles,
+        )
+        worker.serve(sys.stdin, sys.stdout)
+        return 0
+
+    extras = detect_encoders(args.formats)
+    cache = BuildCache(
+        CACHE_MANIFEST, encoder.codec, args.blend, args.particles, search, args.fresh_search, extras, args.tiles
+    )
+    if args.check:
+        stale = [
+            f'{event_id}/{variant_name(*unit)}'
+            for event_id in event_ids
+            for unit in stale_layers(event_id, False, cache, widths, args.flatten)
+        ]
+        try:
+            textures = list(stale_textures(event_ids, cache)) if args.tiles else []
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        for name in stale:
+            print(f'stale: {name}')
+        for name in textures:
+            print(f'stale: textures/{name}')
+        tiles = f' and {len(textures)} stale texture tile(s)' if args.tiles else ''
+        print(f'{len(stale)} stale layer(s){tiles} across {len(event_ids)} event(s).')
+        return 1 if stale or textures else 0
+
+    if args.tiles:
+        try:
+            for name in export_textures(event_ids, encoder, cache):
+                print(f'Generated texture {name}')
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+
+    if args.profile:
+        PROFILER = StageTimer()
+        for event_id in dict.fromkeys(event_ids):
+            visual = EVENTS[event_id]
+            with PROFILER.stage(event_id):
+                generate_event(event_id, encoder, args.overwrite, cache, engine, widths, args.band_rows, args.flatten)
+            lines = PROFILER.report(event_id)
+            seconds = PROFILER.stages[event_id][1]
+            print(f'{event_id} ({visual.profile}, {visual.motif}, {visual.accent}): {seconds:.3f} s')
+            print('\n'.join(lines) if lines else '  up to date')
+        write_srcset_manifest(SRCSET_MANIFEST, cache.previews, cache.overlays)
+        report_profile(PROFILER)
+    elif jobs > 1:
+        failed = generate_parallel(
+            event_ids,
+            encoder,
+            args.overwrite,
+            cache,
+            args.engine,
+            jobs,
+            widths,
+            args.blend,
+            args.particles,
+            args.band_rows,
+            args.flatten,
+        )
+        write_srcset_manifest(SRCSET_MANIFEST, cache.previews, cache.overlays)
+        if failed:
+            print(f'Failed to generate {failed} of {len(event_ids)} event(s).', file=sys.stderr)
+            return 1
+    else:
+        for event_id in event_ids:
+            generate_event(event_id, encoder, args.overwrite, cache, engine, widths, args.band_rows, args.flatten)
+        write_srcset_manifest(SRCSET_MANIFEST, cache.previews, cache.overlays)
 
     print(f'Generated assets for {len(event_ids)} event(s).')
     return 0